@@ -1,117 +1,122 @@
 """
   Produce files containing CPI and M{1, 3} from the raw OECD data.
 """
+import argparse
+import json
 import pandas as pd
 import numpy as np
 import scipy
-import statsmodels.formula.api as smf
 import os
 
 import qtm
+from qtm.preprocess import (read_df, df_to_ser, money_cpi_df, money_cpi_regs, money_cpi_reg_df, rank_reg_df,
+                            series_hashes, select_locations)
 
 # %%
 cpi_path = "data/oecd/CPI.csv"
 m1_path = "data/oecd/M1.csv"
 m3_path = "data/oecd/M3.csv"
+preprocess_path = "data/preprocess"
+manifest_path = os.path.join(preprocess_path, "manifest.json")
 
-# %%
-# Create output path
-os.makedirs("data/preprocess/", exist_ok=True)
+# With --incremental, only the series whose inputs changed since the last run are recomputed
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("--incremental", action="store_true",
+                    help="only recompute the locations whose raw series changed")
+parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                    help="add 95%% bootstrap intervals of r2 and slope from N resamples to the regression files")
+args, _ = parser.parse_known_args()
 
+# The resamples are blocks of 5 years, to keep the autocorrelation of the growth rates
+bootstrap_block_sizes = {"A": 5, "M": 60}
 
 # %%
-def read_df(path):
-    df = pd.read_csv(path)
-    df['TIME'] = pd.to_datetime(df['TIME'])
-    return df
-
-
-def df_to_ser(df, name, freq):
-    tdf = df[df['FREQUENCY'] == freq].set_index(["LOCATION", "TIME"])
-    tdf = tdf.sort_index()
-    ser = tdf['Value']
-    ser.name = name
-    return ser
-
-
-def read_ser(path, name, freq):
-    df = read_df(path)
-    return df_to_ser(df, name, freq)
-
-
-def money_cpi_df(m_ser, cpi_ser, col, freq):
-    m_df = pd.concat([m_ser, cpi_ser], axis=1)
-    diff_m_df = 100 * m_df.diff() / m_df.shift(1)
-    diff_m_df.columns = [f"c_{col}", "c_cpi"]
-    if freq == 'M':
-        diff_m_df = qtm.calc.pct_rate_to_yearly(diff_m_df, 12)
-    elif freq == 'Q':
-        diff_m_df = qtm.calc.pct_rate_to_yearly(diff_m_df, 4)
-    m_df = m_df.join(diff_m_df).dropna()
-    return m_df
-
-
-def ols(df, x_col, y_col):
-    lm = smf.ols(formula=f"{y_col} ~ {x_col}", data=df).fit()
-    return lm
-
-
-def money_cpi_reg_df(m_df, col):
-    regs = []
-    for lctn in m_df.index.levels[0]:
-        try:
-            tdf = m_df.loc[lctn, :]
-            lm = ols(tdf, col, 'c_cpi')
-            regs.append({"LOCATION": lctn, "r2": lm.rsquared, "slope": lm.params.loc[col]})
-        except KeyError as e:
-            pass
+# Create output path
+os.makedirs(preprocess_path, exist_ok=True)
+
+
+def read_manifest():
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest):
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def has_intervals(reg_path):
+    return "slope_lo" in pd.read_csv(reg_path, nrows=0).columns
+
+
+def write_money_cpi(m_ser, cpi_ser, col, freq, manifest, incremental, num_resamples=0):
+    """Write the growth rate (as CSV and as a panel store) and regression files for one aggregate and frequency.
+
+    In incremental mode, the locations whose inputs match the manifest are kept from
+    the existing files and only the others are recomputed and spliced in. Files with
+    or without bootstrap intervals, unlike what is asked for, are recomputed in full.
+    """
+    bootstrap = {"num_resamples": num_resamples, "block_size": bootstrap_block_sizes[freq]}
+    name = f"{col}-cpi_{freq.lower()}"
+    path = os.path.join(preprocess_path, f"{name}.csv")
+    reg_path = os.path.join(preprocess_path, f"{name}_reg.csv")
+    hashes = series_hashes(m_ser, cpi_ser)
+    old_hashes = manifest.get(name)
+    if incremental and old_hashes is not None and os.path.exists(path) and os.path.exists(reg_path) \
+            and has_intervals(reg_path) == bool(num_resamples):
+        changed = [lctn for lctn, h in hashes.items() if old_hashes.get(lctn) != h]
+        stale = set(changed).union(set(old_hashes).difference(hashes))
+        m_df = pd.read_csv(path, parse_dates=["TIME"], float_precision="round_trip").set_index(["LOCATION", "TIME"])
+        reg_df = pd.read_csv(reg_path, float_precision="round_trip").set_index("LOCATION")
+        m_df = select_locations(m_df, list(set(m_df.index.get_level_values(0)).difference(stale)))
+        reg_df = reg_df.loc[reg_df.index.difference(stale)].drop(columns="r2cat")
+        if changed:
+            changed_m_df = money_cpi_df(select_locations(m_ser, changed), select_locations(cpi_ser, changed), col, freq)
+            m_df = pd.concat([m_df, changed_m_df]).sort_index()
+            changed_m_df.index = changed_m_df.index.remove_unused_levels()
+            changed_reg_df = money_cpi_regs(changed_m_df, f"c_{col}", **bootstrap)
+            reg_df = pd.concat([reg_df, changed_reg_df])
+        reg_df = rank_reg_df(reg_df)
+        print(f"{name}: recomputed {len(changed)} of {len(hashes)} locations")
+    else:
+        m_df = money_cpi_df(m_ser, cpi_ser, col, freq)
+        reg_df = money_cpi_reg_df(m_df, f"c_{col}", **bootstrap)
+    m_df.to_csv(path)
+    qtm.panel.Panel.from_frame(m_df).save(os.path.join(preprocess_path, f"{name}{qtm.panel.STORE_SUFFIX}"))
+    reg_df.to_csv(reg_path)
+    manifest[name] = hashes
+    return m_df, reg_df
 
 
-    reg_df = pd.DataFrame(regs).set_index("LOCATION")
-    reg_df = reg_df.sort_values("r2", ascending=False)
-    reg_df["r2cat"] = pd.qcut(reg_df['r2'], 4, False)
-    return reg_df
+# %%
+frequencies = ["A", "M"]
+cpi_df = read_df(cpi_path, {"SUBJECT": "TOT", "MEASURE": "IDX2015", "FREQUENCY": frequencies})
 
+m1_df = read_df(m1_path, {"FREQUENCY": frequencies})
+m3_df = read_df(m3_path, {"FREQUENCY": frequencies})
 
 # %%
-cpi_df = read_df(cpi_path)
-cpi_df = cpi_df[cpi_df['SUBJECT'] == "TOT"]
-cpi_df = cpi_df[cpi_df['MEASURE'] == "IDX2015"]
-
-m1_df = read_df(m1_path)
-m3_df = read_df(m3_path)
+manifest = read_manifest()
 
 # %%
 cpi_a_ser = df_to_ser(cpi_df, "CPI", "A")
 m1_a_ser = df_to_ser(m1_df, "M1", "A")
-m1_a_df = money_cpi_df(m1_a_ser, cpi_a_ser, "m1", 'A')
-m1_a_df.to_csv("data/preprocess/m1-cpi_a.csv")
-
-# %%
-m1_a_reg_df = money_cpi_reg_df(m1_a_df, "c_m1")
-m1_a_reg_df.to_csv("data/preprocess/m1-cpi_a_reg.csv")
-
+m1_a_df, m1_a_reg_df = write_money_cpi(m1_a_ser, cpi_a_ser, "m1", "A", manifest, args.incremental, args.bootstrap)
 
 # %%
 cpi_m_ser = df_to_ser(cpi_df, "CPI", "M")
 m1_m_ser = df_to_ser(m1_df, "M1", "M")
-m1_m_df = money_cpi_df(m1_m_ser, cpi_m_ser, "m1", "M")
-m1_m_df.to_csv("data/preprocess/m1-cpi_m.csv")
-
-# %%
-m1_m_reg_df = money_cpi_reg_df(m1_m_df, "c_m1")
-m1_m_reg_df.to_csv("data/preprocess/m1-cpi_m_reg.csv")
+m1_m_df, m1_m_reg_df = write_money_cpi(m1_m_ser, cpi_m_ser, "m1", "M", manifest, args.incremental, args.bootstrap)
 
 # %%
 m3_a_ser = df_to_ser(m3_df, "M3", "A")
-m3_a_df = money_cpi_df(m3_a_ser, cpi_a_ser, "m3", "A")
-m3_a_df.to_csv("data/preprocess/m3-cpi_a.csv")
-m3_a_reg_df = money_cpi_reg_df(m3_a_df, "c_m3")
-m3_a_reg_df.to_csv("data/preprocess/m3-cpi_a_reg.csv")
+m3_a_df, m3_a_reg_df = write_money_cpi(m3_a_ser, cpi_a_ser, "m3", "A", manifest, args.incremental, args.bootstrap)
 
 # %%
 m3_m_ser = df_to_ser(m3_df, "M3", "M")
-m3_m_df = money_cpi_df(m3_m_ser, cpi_m_ser, "m3", "M")
-m3_m_df.to_csv("data/preprocess/m3-cpi_m.csv")
-m3_m_reg_df = money_cpi_reg_df(m3_m_df, "c_m3")
-m3_m_reg_df.to_csv("data/preprocess/m3-cpi_m_reg.csv")
+m3_m_df, m3_m_reg_df = write_money_cpi(m3_m_ser, cpi_m_ser, "m3", "M", manifest, args.incremental, args.bootstrap)
+
+# %%
+write_manifest(manifest)
@@ -0,0 +1 @@
+"""Benchmarks for qtm, run with `python -m benchmarks`."""
@@ -0,0 +1,372 @@
+"""
+  Benchmark suite for the main qtm code paths
+
+  Each case is timed on synthetic data of a given scale (see `synthetic`), keeping the
+  best of several runs, and its peak Python memory is measured with tracemalloc in a
+  separate run. Results can be stored as the baseline of a scale, and later runs are
+  compared against it:
+
+    python -m benchmarks --scale small --save-baseline
+    python -m benchmarks --scale small
+
+  The runs of a case alternate with runs of a fixed reference workload, and times are
+  compared relative to it, so a baseline saved on one machine can be checked on a faster or
+  slower one. Peak memory depends on the versions of the libraries, which the baseline
+  records.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+from . import synthetic
+
+SCALES = {
+    "small": {"num_locations": 30, "num_years": 60},
+    "medium": {"num_locations": 300, "num_years": 60},
+    "large": {"num_locations": 3000, "num_years": 60},
+}
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+cases = {}
+
+
+def case(name):
+    """Register a benchmark case: a function that takes the context and returns the function to time"""
+    def register(setup):
+        cases[name] = setup
+        return setup
+    return register
+
+
+def build_context(work_dir, num_locations, num_years):
+    from qtm import barro, oecd, preprocess
+    raw_paths = synthetic.write_raw(os.path.join(work_dir, "oecd"), num_locations, num_years)
+    preprocess_dir = os.path.join(work_dir, "preprocess")
+    synthetic.write_preprocessed(raw_paths, preprocess_dir)
+    barro_path = synthetic.write_barro(os.path.join(work_dir, "barro.csv"), 4 * (num_locations + 4))
+    cpi_df = preprocess.read_df(raw_paths["CPI"], {"SUBJECT": "TOT", "MEASURE": "IDX2015"})
+    m1_df = preprocess.read_df(raw_paths["M1"])
+    return {
+        "preprocess_dir": preprocess_dir,
+        "data": oecd.Data(preprocess_dir, "M1"),
+        "barro_df": barro.read_barro_data(barro_path),
+        "series": {freq: (preprocess.df_to_ser(m1_df, "M1", freq), preprocess.df_to_ser(cpi_df, "CPI", freq))
+                   for freq in ["A", "M"]}
+    }
+
+
+@case("data_read")
+def _data_read(ctx):
+    from qtm import oecd
+
+    def run():
+        data = oecd.Data(ctx["preprocess_dir"], "M1")
+        data.read()
+        for name in ["annual_df", "annual_reg_df", "max_inflation_df", "monthly_df", "monthly_reg_df"]:
+            getattr(data, name)
+    return run
+
+
+@case("summary_df")
+def _summary_df(ctx):
+    from qtm import oecd
+    df = ctx["data"].annual_df
+    return lambda: oecd.summary_df(df, "M1")
+
+
+@case("year_summary_df")
+def _year_summary_df(ctx):
+    from qtm import oecd
+    df = ctx["data"].annual_df
+    return lambda: oecd.year_summary_df(df)
+
+
+@case("quantile_ts_df")
+def _quantile_ts_df(ctx):
+    data = ctx["data"]
+    return lambda: data.quantile_ts_df(20, 6)
+
+
+@case("quantile_ts_summary_df")
+def _quantile_ts_summary_df(ctx):
+    from qtm import oecd
+    pp_df = ctx["data"].quantile_ts_df(20, 6)
+    threshold = 0.8 * pp_df.max().max() - 1
+    return lambda: oecd.quantile_ts_summary_df(pp_df, threshold)
+
+
+@case("linreg_fit")
+def _linreg_fit(ctx):
+    from qtm import viz
+    df = ctx["data"].annual_df
+    return lambda: viz.LinReg(df, "c_m1", "c_cpi").fit()
+
+
+@case("rolling_ols_m")
+def _rolling_ols(ctx):
+    from qtm import regression
+    df = ctx["data"].monthly_df
+    return lambda: regression.rolling_ols(df, "c_m1", "c_cpi", [12, 60, 120])
+
+
+@case("lead_lag_corr_m")
+def _lead_lag_corr(ctx):
+    from qtm import xcorr
+    df = ctx["data"].monthly_df
+    return lambda: xcorr.lead_lag_corr(df, "c_m1", "c_cpi", 36)
+
+
+@case("episodes_m")
+def _episodes(ctx):
+    from qtm import episodes
+    df = ctx["data"].monthly_df
+    return lambda: episodes.find_episodes(df, "c_cpi", quantile=[0.75, 0.9, 0.95], money_col="c_m1", lookback=12)
+
+
+@case("bootstrap_ci_a")
+def _bootstrap_ci(ctx):
+    from qtm import bootstrap
+    df = ctx["data"].annual_df
+    return lambda: bootstrap.bootstrap_ci(df, "c_m1", "c_cpi", num_resamples=1000, block_size=5)
+
+
+def _money_cpi_df_case(freq):
+    def setup(ctx):
+        from qtm import preprocess
+        m_ser, cpi_ser = ctx["series"][freq]
+        return lambda: preprocess.money_cpi_df(m_ser, cpi_ser, "m1", freq)
+    return setup
+
+
+case("money_cpi_df_a")(_money_cpi_df_case("A"))
+case("money_cpi_df_m")(_money_cpi_df_case("M"))
+
+
+@case("money_cpi_reg_df_m")
+def _money_cpi_reg_df(ctx):
+    from qtm import preprocess
+    m_ser, cpi_ser = ctx["series"]["M"]
+    m_df = preprocess.money_cpi_df(m_ser, cpi_ser, "m1", "M")
+    return lambda: preprocess.money_cpi_reg_df(m_df, "c_m1")
+
+
+@case("online_append_m")
+def _online_append(ctx):
+    import pandas as pd
+    from qtm import online
+    m_ser, cpi_ser = ctx["series"]["M"]
+    state = online.OnlineMoneyCpi.from_series(m_ser, cpi_ser, "m1", "M")
+    # The last month of every location, appended again as a release would
+    rows = pd.concat([m_ser, cpi_ser], axis=1).groupby(level=0).tail(1)
+
+    def run():
+        state.append(rows)
+        return state.reg_df()
+    return run
+
+
+def _figure_case(draw):
+    def setup(ctx):
+        def run():
+            import matplotlib.pyplot as plt
+            from qtm import smooth
+            # Smoothing is memoized; clear it so every run does the full work
+            smooth.cache.clear()
+            draw(ctx)
+            plt.gcf().savefig(io.BytesIO(), format="png", dpi=50)
+            plt.close("all")
+        return run
+    return setup
+
+
+def _plot_summary(ctx):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots()
+    ctx["data"].plot_summary(ax, [])
+
+
+def _ts_am_fig(ctx):
+    from qtm import oecd
+    oecd.ts_am_fig(ctx["data"], "2008")
+
+
+def _barro_xy_fig(ctx):
+    from qtm import barro
+    barro.xy_fig(ctx["barro_df"], "M1", "CPI", [])
+
+
+case("annual_ts_fig")(_figure_case(lambda ctx: ctx["data"].annual_ts_fig(marker_date="2008")))
+case("quantile_ts_fig")(_figure_case(lambda ctx: ctx["data"].quantile_ts_fig(0.2)))
+case("plot_summary")(_figure_case(_plot_summary))
+case("ts_am_fig")(_figure_case(_ts_am_fig))
+case("barro_xy_fig")(_figure_case(_barro_xy_fig))
+
+
+def reference_workload():
+    """A fixed numpy and pandas workload, which the time of every case is compared relative to"""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame({"key": rng.randint(0, 100, 200000), "value": rng.normal(size=200000)})
+
+    def run():
+        df.groupby("key")["value"].agg(["mean", "std"])
+        df.sort_values("value")
+        df["value"].rolling(12).mean()
+    return run
+
+
+def library_versions():
+    import matplotlib
+    import numpy
+    import pandas
+    return {"python": platform.python_version(), "numpy": numpy.__version__, "pandas": pandas.__version__,
+            "matplotlib": matplotlib.__version__}
+
+
+def measure(run, repeat, reference):
+    """Best time in seconds of a call of `run` and of `reference`, and peak traced memory in bytes of one more run.
+
+    The two are timed alternately, `repeat` times, with enough calls each time to take at
+    least 0.2s, so that the times of both follow any change in the load of the machine.
+    """
+    timers = [timeit.Timer(run), timeit.Timer(reference)]
+    numbers = [timer.autorange()[0] for timer in timers]
+    times = [[], []]
+    for _ in range(repeat):
+        for timer, number, samples in zip(timers, numbers, times):
+            samples.append(timer.timeit(number) / number)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"time": min(times[0]), "reference_time": min(times[1]), "peak_memory": peak}
+
+
+def run_cases(ctx, names, repeat):
+    reference = reference_workload()
+    return {name: measure(cases[name](ctx), repeat, reference) for name in names}
+
+
+def baseline_path(scale):
+    return os.path.join(BASELINE_DIR, f"{scale}.json")
+
+
+def read_baseline(scale):
+    path = baseline_path(scale)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_baseline(scale, params, results):
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    baseline = {
+        "scale": scale,
+        "params": params,
+        "versions": library_versions(),
+        "machine": platform.machine(),
+        "results": results
+    }
+    with open(baseline_path(scale), "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def scaled_time(base, result):
+    """The baseline time of a case, scaled by how much slower the reference workload ran with result than with base"""
+    if "reference_time" not in base or "reference_time" not in result:
+        return base["time"]
+    return base["time"] * result["reference_time"] / base["reference_time"]
+
+
+def compare(results, baseline, time_tolerance=0.3, memory_tolerance=0.2):
+    """Messages for the cases that are slower or use more memory than the baseline allows.
+
+    Times are compared relative to the reference workload timed with each case (see `scaled_time`).
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        expected = scaled_time(base, result)
+        if result["time"] > expected * (1 + time_tolerance):
+            regressions.append(f"{name}: time {result['time']:.3f}s vs baseline {base['time']:.3f}s, "
+                               f"{expected:.3f}s relative to the reference")
+        if result["peak_memory"] > base["peak_memory"] * (1 + memory_tolerance):
+            regressions.append(f"{name}: peak memory {result['peak_memory'] / 1e6:.1f}MB "
+                               f"vs baseline {base['peak_memory'] / 1e6:.1f}MB")
+    return regressions
+
+
+def format_results(results, baseline=None):
+    lines = [f"{'case':<24} {'time (ms)':>12} {'peak (MB)':>12} {'vs baseline':>12}"]
+    for name, result in results.items():
+        ratio = ""
+        if baseline is not None and name in baseline["results"]:
+            ratio = f"{result['time'] / scaled_time(baseline['results'][name], result):.2f}x"
+        lines.append(f"{name:<24} {result['time'] * 1000:>12.1f} {result['peak_memory'] / 1e6:>12.2f} {ratio:>12}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the qtm code paths")
+    parser.add_argument("--scale", default="small", choices=sorted(SCALES), help="size of the synthetic data")
+    parser.add_argument("--locations", type=int, default=None, help="override the number of locations")
+    parser.add_argument("--years", type=int, default=None, help="override the number of years")
+    parser.add_argument("--only", nargs="*", default=None, help="run only the cases whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of each case")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline of the scale")
+    parser.add_argument("--output", default=None, help="also write the results as JSON to this file")
+    parser.add_argument("--time-tolerance", type=float, default=0.3,
+                        help="allowed slowdown relative to the reference workload")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="allowed relative memory increase")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    params = dict(SCALES[args.scale])
+    if args.locations is not None:
+        params["num_locations"] = args.locations
+    if args.years is not None:
+        params["num_years"] = args.years
+    custom = params != SCALES[args.scale]
+    names = [name for name in cases if args.only is None or any(pattern in name for pattern in args.only)]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        ctx = build_context(work_dir, **params)
+        results = run_cases(ctx, names, args.repeat)
+
+    # Baselines only make sense for the named scales
+    baseline = None if custom else read_baseline(args.scale)
+    print(f"scale {args.scale}: {params['num_locations']} locations x {params['num_years']} years")
+    print(format_results(results, baseline))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": params, "results": results}, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        if custom:
+            print("not saving a baseline for a custom scale", file=sys.stderr)
+            return 1
+        write_baseline(args.scale, params, results)
+        return 0
+    if baseline is None:
+        return 0
+    versions = library_versions()
+    if baseline.get("versions") != versions:
+        print(f"note: the baseline was saved with {baseline.get('versions')}, this run uses {versions}; "
+              "peak memory may differ", file=sys.stderr)
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for regression in regressions:
+        print(f"regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,114 @@
+"""
+  Generator of synthetic data shaped like the OECD extracts and the Barro data set
+
+  The panels have `num_locations` random locations plus USA, ISL and the OECD/OECDE
+  aggregates, which the qtm code treats specially, with `num_years` of annual and
+  monthly values ending in 2020.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from qtm import preprocess
+
+END_YEAR = 2020
+SPECIAL_LOCATIONS = ["USA", "ISL", "OECD", "OECDE"]
+RAW_COLUMNS = ["LOCATION", "INDICATOR", "SUBJECT", "MEASURE", "FREQUENCY", "TIME", "Value", "Flag Codes"]
+
+
+def location_names(num_locations):
+    return [f"L{i:03d}" for i in range(num_locations)] + SPECIAL_LOCATIONS
+
+
+def _periods(freq, num_years):
+    start = f"{END_YEAR - num_years + 1}"
+    if freq == "A":
+        return pd.period_range(start, str(END_YEAR), freq="A")
+    return pd.period_range(f"{start}-01", f"{END_YEAR}-12", freq="M")
+
+
+def _levels(rng, starts, lengths, mean_growth, per_year):
+    """Index levels that grow by a noisy, location-specific percentage each period"""
+    growth = np.repeat(mean_growth, lengths) + rng.normal(0, 3, lengths.sum())
+    growth = np.maximum(growth, -50) / 100 / per_year
+    log_levels = np.log1p(growth)
+    # Restart the cumulative sum at the first period of every location
+    cum = np.cumsum(log_levels)
+    offsets = np.repeat(cum[starts] - log_levels[starts], lengths)
+    return 100 * np.exp(cum - offsets)
+
+
+def raw_frames(num_locations, num_years, frequencies=("A", "M"), seed=0):
+    """Raw CPI, M1 and M3 frames in the layout of the OECD csv extracts"""
+    rng = np.random.default_rng(seed)
+    locations = location_names(num_locations)
+    inflation = rng.lognormal(1.2, 0.8, len(locations))
+    # Locations start at different times, except ISL, which needs its early years
+    first_year = rng.integers(0, num_years // 2 + 1, len(locations))
+    first_year[locations.index("ISL")] = 0
+    frames = {name: [] for name in ["CPI", "M1", "M3"]}
+    for freq in frequencies:
+        periods = _periods(freq, num_years)
+        per_year = 1 if freq == "A" else 12
+        lengths = len(periods) - first_year * per_year
+        starts = np.cumsum(lengths) - lengths
+        period_idx = np.concatenate([np.arange(len(periods) - n, len(periods)) for n in lengths])
+        times = periods.astype(str).values[period_idx]
+        locs = np.repeat(locations, lengths)
+        for name, extra_growth in [("CPI", 0), ("M1", 2), ("M3", 3)]:
+            values = _levels(rng, starts, lengths, inflation + extra_growth, per_year)
+            frames[name].append(pd.DataFrame({
+                "LOCATION": locs,
+                "INDICATOR": name,
+                "SUBJECT": "TOT",
+                "MEASURE": "IDX2015" if name == "CPI" else "IDX",
+                "FREQUENCY": freq,
+                "TIME": times,
+                "Value": values,
+                "Flag Codes": ""
+            }, columns=RAW_COLUMNS))
+    return {name: pd.concat(dfs, ignore_index=True) for name, dfs in frames.items()}
+
+
+def write_raw(out_dir, num_locations, num_years, frequencies=("A", "M"), seed=0):
+    """Write CPI.csv, M1.csv and M3.csv to out_dir and return their paths"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for name, df in raw_frames(num_locations, num_years, frequencies, seed).items():
+        paths[name] = os.path.join(out_dir, f"{name}.csv")
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+def write_preprocessed(raw_paths, out_dir, frequencies=("A", "M")):
+    """Write the growth rate and regression files that `qtm.oecd.Data` reads, as the preprocessing script does"""
+    os.makedirs(out_dir, exist_ok=True)
+    cpi_df = preprocess.read_df(raw_paths["CPI"], {"SUBJECT": "TOT", "MEASURE": "IDX2015"})
+    for money in ["M1", "M3"]:
+        m_df = preprocess.read_df(raw_paths[money])
+        for freq in frequencies:
+            col = money.lower()
+            name = f"{col}-cpi_{freq.lower()}"
+            m_cpi_df = preprocess.money_cpi_df(preprocess.df_to_ser(m_df, money, freq),
+                                               preprocess.df_to_ser(cpi_df, "CPI", freq), col, freq)
+            m_cpi_df.to_csv(os.path.join(out_dir, f"{name}.csv"))
+            preprocess.money_cpi_reg_df(m_cpi_df, f"c_{col}").to_csv(os.path.join(out_dir, f"{name}_reg.csv"))
+
+
+def write_barro(path, num_countries, seed=0):
+    """Write a data set with the columns of the Barro data set"""
+    rng = np.random.default_rng(seed)
+    inflation = rng.lognormal(-2.5, 1, num_countries)
+    gdp = rng.normal(0.03, 0.02, num_countries)
+    currency = inflation + gdp + rng.normal(0, 0.02, num_countries)
+    df = pd.DataFrame({
+        "Country": [f"Country {i}" for i in range(num_countries)],
+        "Inflation rate": inflation,
+        "Growth rate of currency": currency,
+        "Growth rate of real currency": currency - inflation,
+        "Growth rate of real GDP": gdp,
+        "1980-2000 Inflation rate": inflation * rng.uniform(0.5, 1.5, num_countries)
+    })
+    df.to_csv(path, index=False)
+    return path
@@ -4,9 +4,21 @@ __author__ = """Chandrasekhar Ramakrishnan"""
 __email__ = 'cramakrishnan@gmail.com'
 __version__ = '0.1.0'
 
-from . import barro
-from . import calc
-from . import oecd
-from . import viz
+import importlib
 
-from .viz import set_style
+# Submodules are imported on first use, so that e.g. `qtm.calc` does not pull in the plotting stack
+_submodules = ["artists", "barro", "bootstrap", "cache", "calc", "cli", "episodes", "frames", "oecd", "online",
+               "panel", "preprocess", "regression", "smooth", "trace", "viz", "xcorr"]
+
+
+def __getattr__(name):
+    if name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    if name == "set_style":
+        from .viz import set_style
+        return set_style
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + _submodules + ["set_style"])
@@ -0,0 +1,27 @@
+"""
+  Deferred imports of heavy dependencies
+"""
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name):
+        """Stand-in for the module `name` that only imports it when an attribute is first used"""
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,92 @@
+"""
+  Matplotlib artists that decimate their points when they are drawn
+
+  The points needed depend on the size of the axes and the resolution of the output,
+  which are only known at draw time: after e.g. `tight_layout`, and at the dpi that
+  `savefig` renders at. These artists hold all the points and reduce them in `draw`.
+"""
+import matplotlib.artist as martist
+import matplotlib.collections as mcollections
+import matplotlib.lines as mlines
+import numpy as np
+
+from .viz import axes_pixels, minmax_indices, overlap_groups, stacked_alpha
+
+
+class DecimatedLine(mlines.Line2D):
+    def __init__(self, x, y, **kwargs):
+        """Line through (x, y) that draws the first, last, minimum and maximum point of each pixel column"""
+        super().__init__(x, y, **kwargs)
+        self._points = (np.asarray(x), np.asarray(y))
+        self._width = None
+
+    @classmethod
+    def replace(cls, line):
+        """Replace `line` in its axes with a DecimatedLine of its points and properties"""
+        decimated = cls(line.get_xdata(orig=True), line.get_ydata(orig=True))
+        decimated.update_from(line)
+        decimated.set_zorder(line.get_zorder())
+        decimated.set_rasterized(line.get_rasterized())
+        ax = line.axes
+        line.remove()
+        ax.add_line(decimated)
+        return decimated
+
+    @martist.allow_rasterization
+    def draw(self, renderer):
+        # e.g. a legend handle, which has no points of its own
+        if self.axes is None:
+            return super().draw(renderer)
+        width, _ = axes_pixels(self.axes, renderer)
+        if width != self._width:
+            x, y = self._points
+            idx = minmax_indices(x, y, width)
+            self.set_data(x[idx], y[idx])
+            self._width = width
+        super().draw(renderer)
+
+
+class DecimatedScatter(mcollections.PathCollection):
+    def __init__(self, paths, sizes, offsets, transOffset, **kwargs):
+        """Scatter that draws the markers overlapping at the resolution it is drawn at as one.
+
+        The merged marker has the opacity of the stacked markers, so the rendered density
+        is preserved with fewer markers.
+        """
+        super().__init__(paths, sizes, offsets=offsets, transOffset=transOffset, **kwargs)
+        self._points = np.asarray(offsets)
+        self._grid = None
+
+    @classmethod
+    def replace(cls, collection):
+        """Replace the single-color scatter `collection` in its axes with a DecimatedScatter"""
+        decimated = cls(collection.get_paths(), collection.get_sizes(), collection.get_offsets(),
+                        collection.get_offset_transform())
+        decimated.update_from(collection)
+        decimated.set_zorder(collection.get_zorder())
+        decimated.set_rasterized(collection.get_rasterized())
+        # The opacity of one marker, from its color and the alpha of the collection
+        decimated._rgba = collection.get_facecolor()[0].copy()
+        decimated.set_alpha(None)
+        decimated.set_facecolor(decimated._rgba)
+        ax = collection.axes
+        collection.remove()
+        ax.add_collection(decimated, autolim=False)
+        return decimated
+
+    @martist.allow_rasterization
+    def draw(self, renderer):
+        if self.axes is None:
+            return super().draw(renderer)
+        width, height = axes_pixels(self.axes, renderer)
+        # Markers closer than half a marker width are merged
+        cell = max(np.sqrt(self.get_sizes()[0]) * renderer.points_to_pixels(1.0) / 2, 1)
+        grid = max(int(width / cell), 1), max(int(height / cell), 1)
+        if grid != self._grid:
+            idx, counts = overlap_groups(self._points[:, 0], self._points[:, 1], *grid)
+            colors = np.tile(self._rgba, (len(idx), 1))
+            colors[:, 3] = stacked_alpha(self._rgba[3], counts)
+            self.set_offsets(self._points[idx])
+            self.set_facecolor(colors)
+            self._grid = grid
+        super().draw(renderer)
@@ -3,15 +3,20 @@
 """
 import numpy as np
 import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from ._lazy import lazy_import
+mpl = lazy_import("matplotlib")
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
 
 from .calc import rate_to_end_value_continuous
+from .frames import compact_frame
 from . import viz
+from . import trace
 
 
-def read_barro_data(path="data/barro/barro-data-set.csv"):
+@trace.traced
+def read_barro_data(path="data/barro/barro-data-set.csv", compact=False):
     df = pd.read_csv(path)
     df["Growth rate of velocity"] = df["Inflation rate"] + df["Growth rate of real GDP"] - df["Growth rate of currency"]
     df = df.drop('1980-2000 Inflation rate', axis=1)
@@ -24,12 +29,18 @@ def read_barro_data(path="data/barro/barro-data-set.csv"):
     df['pt'] = df['cpi'] * df['t']
     df['c_pt_rate'] = df['c_cpi_rate'] + df['c_t_rate']
     df['c_mv_rate'] = df['c_m1_rate'] + df['c_v_rate']
-    return df.set_index("country")
+    df = df.set_index("country")
+    if compact:
+        df = compact_frame(df)
+    return df
 
 
-def xy_plot(ax, df, xlabel, ylabel, labeled_points, palette, xcol, ycol):
+@trace.traced
+def xy_plot(ax, df, xlabel, ylabel, labeled_points, palette, xcol, ycol, num_resamples=0):
     lin_reg = viz.LinReg(df, xcol, ycol)
     lin_reg.fit()
+    if num_resamples:
+        lin_reg.bootstrap(num_resamples)
     viz.xy_plot(ax, df, lin_reg,  palette[0], palette[3], palette[4], palette[1], labeled_points, xcol, ycol)
     
     ax.set_xlim([-0.05, 1])
@@ -43,20 +54,23 @@ def xy_plot(ax, df, xlabel, ylabel, labeled_points, palette, xcol, ycol):
     
 
 
-def xy_fig(df, xlabel, ylabel, labeled_points, xcol="c_m1_rate", ycol="c_cpi_rate", figsize=(6, 6)):
+@trace.traced
+def xy_fig(df, xlabel, ylabel, labeled_points, xcol="c_m1_rate", ycol="c_cpi_rate", figsize=(6, 6), num_resamples=0):
     palette = sns.color_palette()
     fig, ax = plt.subplots(figsize=figsize)
-    xy_plot(ax, df, xlabel, ylabel, labeled_points, palette, xcol, ycol)
+    xy_plot(ax, df, xlabel, ylabel, labeled_points, palette, xcol, ycol, num_resamples)
     viz.cite_source(ax, "Barro Marcoeconomics: A Modern Approach, 2008")
     plt.tight_layout()
     return fig
 
 
-def xy_fig_with_error(df, xlabel, ylabel, labeled_points, xcol="c_m1_rate", ycol="c_cpi_rate", figsize=(6, 12)):
+@trace.traced
+def xy_fig_with_error(df, xlabel, ylabel, labeled_points, xcol="c_m1_rate", ycol="c_cpi_rate", figsize=(6, 12),
+                      num_resamples=0):
     with mpl.rc_context({'axes.labelsize': 'small'}):
         palette = sns.color_palette()
         fig, axs = plt.subplots(2, 1, sharex=True, sharey=False, figsize=figsize)
-        lin_reg = xy_plot(axs[0], df, xlabel, ylabel, labeled_points, palette, xcol, ycol)
+        lin_reg = xy_plot(axs[0], df, xlabel, ylabel, labeled_points, palette, xcol, ycol, num_resamples)
 
         viz.xy_reg_diff_plot(axs[1], df, lin_reg, palette[0], palette[1], labeled_points, xcol, ycol)
         viz.cite_source(axs[1], "Barro Marcoeconomics: A Modern Approach, 2008")
@@ -0,0 +1,138 @@
+"""
+  Module for bootstrap confidence intervals of simple regressions
+
+  Rows are resampled within each location, either one by one (the pairs bootstrap) or in
+  blocks of consecutive rows (the moving block bootstrap), which keeps the autocorrelation
+  of a time series within each block. The resamples of all locations are drawn as one 2-D
+  array of row indices, and the regressions of all replicates and locations are fit at
+  once from their sufficient statistics.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import trace
+from .regression import ols_from_stats, sufficient_stats
+
+FIT_COLUMNS = ["slope", "intercept", "r2"]
+
+
+def resample_indices(rng, sizes, num_resamples, block_size=None):
+    """Row indices of `num_resamples` resamples of consecutive groups of rows of the given sizes.
+
+    Returns an integer array of shape (num_resamples, sum(sizes)), each row of which holds,
+    for every group, as many indices into the rows of that group as it has. Without
+    `block_size`, rows are drawn independently. Otherwise, blocks of `block_size`
+    consecutive rows are drawn and joined, and the last block of a group is cut short to fit.
+    """
+    sizes = np.asarray(sizes, dtype=np.int64)
+    total = int(sizes.sum())
+    starts = np.r_[0, np.cumsum(sizes)[:-1]].astype(np.int64)
+    codes = np.repeat(np.arange(len(sizes)), sizes)
+    pos = np.arange(total) - starts[codes]
+    if block_size is None:
+        draws = rng.random((num_resamples, total))
+        return starts[codes] + (draws * sizes[codes]).astype(np.int64)
+    # Groups shorter than a block are resampled as one block
+    lengths = np.maximum(np.minimum(int(block_size), sizes), 1)
+    num_blocks = -(-sizes // lengths)
+    block_offsets = np.r_[0, np.cumsum(num_blocks)[:-1]].astype(np.int64)
+    block_groups = np.repeat(np.arange(len(sizes)), num_blocks)
+    draws = rng.random((num_resamples, int(num_blocks.sum())))
+    block_starts = (draws * (sizes - lengths + 1)[block_groups]).astype(np.int64)
+    blocks = block_offsets[codes] + pos // lengths[codes]
+    return starts[codes] + block_starts[:, blocks] + pos % lengths[codes]
+
+
+def replicate_fits(x, y, sizes, num_resamples, block_size=None, seed=None):
+    """Fits of y ~ x on `num_resamples` resamples of each group of consecutive rows of the given sizes.
+
+    Returns a dict of (num_resamples, number of groups) arrays of slope, intercept and r2.
+    """
+    rng = np.random.default_rng(seed)
+    idx = resample_indices(rng, sizes, num_resamples, block_size)
+    num_groups = len(sizes)
+    codes = np.repeat(np.arange(num_groups), sizes)
+    # Each (replicate, group) pair is a separate group of the flattened resamples
+    rep_codes = (np.arange(num_resamples)[:, None] * num_groups + codes[None, :]).ravel()
+    stats = sufficient_stats(x[idx].ravel(), y[idx].ravel(), rep_codes, num_resamples * num_groups)
+    fit = ols_from_stats(stats)
+    return {name: fit[name].reshape(num_resamples, num_groups) for name in FIT_COLUMNS}
+
+
+def _replicate_fits_task(args):
+    return replicate_fits(*args)
+
+
+def _chunks(num_resamples, num_rows, chunk_size):
+    """Numbers of resamples per chunk, so a chunk resamples about `chunk_size` rows"""
+    per_chunk = max(1, chunk_size // max(num_rows, 1))
+    return [min(per_chunk, num_resamples - start) for start in range(0, num_resamples, per_chunk)]
+
+
+@trace.traced
+def bootstrap_ols(df, xcol, ycol, num_resamples=1000, block_size=None, seed=0, jobs=1, chunk_size=1_000_000,
+                  level="LOCATION"):
+    """Bootstrap replicates of the fit of ycol ~ xcol for every group of the index `level`.
+
+    Rows are resampled within their group, in blocks of `block_size` rows if given (see
+    `resample_indices`); use `level=None` to resample the whole frame. Replicates are
+    computed in chunks of about `chunk_size` resampled rows, across `jobs` processes
+    if more than one. Every chunk draws from its own stream spawned from `seed`, so the
+    result depends on the seed but not on the number of processes. Returns a frame
+    indexed by (replicate, group) with the slope, intercept and r2 of every replicate.
+    """
+    if level is None:
+        codes, groups = np.zeros(len(df), dtype=np.int64), pd.Index([None], dtype=object)
+    else:
+        codes, groups = pd.factorize(df.index.get_level_values(level), sort=True)
+    order = np.argsort(codes, kind="stable")
+    sizes = np.bincount(codes, minlength=len(groups))
+    x = np.asarray(df[xcol].values, dtype=float)[order]
+    y = np.asarray(df[ycol].values, dtype=float)[order]
+    chunks = _chunks(num_resamples, len(df), chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = [(x, y, sizes, num, block_size, chunk_seed) for num, chunk_seed in zip(chunks, seeds)]
+    if jobs == 1 or len(tasks) == 1:
+        fits = [replicate_fits(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            fits = list(executor.map(_replicate_fits_task, tasks))
+    index = pd.MultiIndex.from_product([range(num_resamples), groups], names=["replicate", level])
+    return pd.DataFrame({name: np.concatenate([fit[name] for fit in fits]).ravel() for name in FIT_COLUMNS},
+                        index=index)
+
+
+def percentile_interval(values, confidence=0.95):
+    """Low and high percentiles of the `confidence` interval of values along the first axis, ignoring NaNs"""
+    tail = (1 - confidence) / 2 * 100
+    with np.errstate(invalid='ignore'):
+        lo, hi = np.nanpercentile(values, [tail, 100 - tail], axis=0)
+    return lo, hi
+
+
+def confidence_intervals(replicates, confidence=0.95, columns=("slope", "r2")):
+    """Percentile intervals of `columns` for every group of replicates from `bootstrap_ols`.
+
+    Returns a frame indexed by group with `<column>_lo` and `<column>_hi` columns.
+    Replicates without a fit, e.g. of a resample whose x is constant, are ignored.
+    """
+    num_resamples = len(replicates.index.levels[0])
+    # The groups are sorted, so they are the level; with level=None, its one group is missing from it
+    groups = replicates.index.levels[1]
+    if len(groups) == 0:
+        groups = pd.Index([None], dtype=object)
+    result = {}
+    for col in columns:
+        values = replicates[col].values.reshape(num_resamples, len(groups))
+        result[f"{col}_lo"], result[f"{col}_hi"] = percentile_interval(values, confidence)
+    return pd.DataFrame(result, index=groups.rename(replicates.index.names[1]))
+
+
+def bootstrap_ci(df, xcol, ycol, confidence=0.95, **kwargs):
+    """Bootstrap confidence intervals of the slope and r2 of ycol ~ xcol for every group.
+
+    The keyword arguments are those of `bootstrap_ols`.
+    """
+    return confidence_intervals(bootstrap_ols(df, xcol, ycol, **kwargs), confidence)
@@ -0,0 +1,177 @@
+"""
+  Module for caching post-processed frames on disk
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 1
+
+
+def file_signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime_ns}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _encode_values(name, values, arrays):
+    """Store `values` in `arrays` under `name` and return a description of how to restore them"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        cat = pd.Categorical(values)
+        desc = _encode_values(f"{name}.categories", pd.Index(cat.categories), arrays)
+        arrays[name] = cat.codes
+        return {"kind": "categorical", "ordered": bool(cat.ordered), "categories": desc}
+    if np.issubdtype(values.dtype, np.datetime64):
+        arrays[name] = np.asarray(values).astype("datetime64[ns]").view(np.int64)
+        return {"kind": "datetime"}
+    if values.dtype == object:
+        arrays[name] = np.asarray(values).astype(str)
+        return {"kind": "str"}
+    arrays[name] = np.asarray(values)
+    return {"kind": "plain"}
+
+
+def _decode_values(name, desc, arrays):
+    values = arrays[name]
+    kind = desc["kind"]
+    if kind == "categorical":
+        categories = _decode_values(f"{name}.categories", desc["categories"], arrays)
+        return pd.Categorical.from_codes(values, categories, ordered=desc["ordered"])
+    if kind == "datetime":
+        return values.view("datetime64[ns]")
+    if kind == "str":
+        return values.astype(object)
+    return values
+
+
+def frame_to_arrays(df):
+    """Convert a frame into a dict of plain numpy arrays that can be stored without pickling"""
+    arrays = {}
+    index = []
+    for i in range(df.index.nlevels):
+        values = df.index.get_level_values(i)
+        index.append({"name": values.name, "values": _encode_values(f"index.{i}", values, arrays)})
+    columns = []
+    for i, col in enumerate(df.columns):
+        columns.append({"name": col, "values": _encode_values(f"column.{i}", df[col], arrays)})
+    arrays["meta"] = np.array(json.dumps({"index": index, "columns": columns}))
+    return arrays
+
+
+def arrays_to_frame(arrays):
+    meta = json.loads(str(arrays["meta"]))
+    levels = [_decode_values(f"index.{i}", level["values"], arrays) for i, level in enumerate(meta["index"])]
+    names = [level["name"] for level in meta["index"]]
+    if len(levels) == 1:
+        index = pd.Index(levels[0], name=names[0])
+    else:
+        index = pd.MultiIndex.from_arrays(levels, names=names)
+    data = {col["name"]: _decode_values(f"column.{i}", col["values"], arrays)
+            for i, col in enumerate(meta["columns"])}
+    return pd.DataFrame(data, index=index, columns=[col["name"] for col in meta["columns"]])
+
+
+class FrameCache:
+    def __init__(self, cache_dir):
+        """Cache of named groups of frames derived from source files.
+
+        An entry is reused as long as its sources are unchanged: the size and mtime
+        are checked first, and the content hash decides if those differ.
+        """
+        self.cache_dir = cache_dir
+
+    def _paths(self, key, sources):
+        digest = hashlib.sha1("\n".join(os.path.abspath(p) for p in sources).encode()).hexdigest()[:10]
+        base = os.path.join(self.cache_dir, f"{key}-{digest}")
+        return f"{base}.json", f"{base}.npz"
+
+    def _source_entries(self, sources):
+        return [dict(path=os.path.abspath(p), sha256=file_hash(p), **file_signature(p)) for p in sources]
+
+    def _refresh(self, manifest, sources):
+        """Check the manifest against the sources; return None if stale, else whether it was updated"""
+        from . import __version__
+        if manifest.get("format") != FORMAT_VERSION or manifest.get("qtm") != __version__:
+            return None
+        if [s["path"] for s in manifest["sources"]] != [os.path.abspath(p) for p in sources]:
+            return None
+        updated = False
+        for entry in manifest["sources"]:
+            sig = file_signature(entry["path"])
+            if sig["size"] == entry["size"] and sig["mtime"] == entry["mtime"]:
+                continue
+            if sig["size"] != entry["size"] or file_hash(entry["path"]) != entry["sha256"]:
+                return None
+            # Touched but not modified: remember the new signature
+            entry.update(sig)
+            updated = True
+        return updated
+
+    def _read_manifest(self, manifest_path):
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_json(self, path, obj):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+
+    def load(self, key, sources, build):
+        """Return the dict of frames for `key`, calling `build()` to create it if the cache is stale"""
+        manifest_path, data_path = self._paths(key, sources)
+        manifest = self._read_manifest(manifest_path)
+        if manifest is not None and os.path.exists(data_path):
+            updated = self._refresh(manifest, sources)
+            if updated is not None:
+                if updated:
+                    self._write_json(manifest_path, manifest)
+                return self._read_frames(data_path, manifest["frames"])
+
+        # Fingerprint the sources before reading them, so a concurrent change invalidates the entry
+        source_entries = self._source_entries(sources)
+        frames = build()
+        self.store(key, source_entries, frames)
+        return frames
+
+    def store(self, key, source_entries, frames):
+        from . import __version__
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest_path, data_path = self._paths(key, [entry["path"] for entry in source_entries])
+        arrays = {}
+        for name, df in frames.items():
+            for array_name, values in frame_to_arrays(df).items():
+                arrays[f"{name}/{array_name}"] = values
+        tmp_path = f"{data_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, data_path)
+        manifest = {
+            "format": FORMAT_VERSION,
+            "qtm": __version__,
+            "frames": list(frames.keys()),
+            "sources": source_entries
+        }
+        self._write_json(manifest_path, manifest)
+
+    def _read_frames(self, data_path, names):
+        with np.load(data_path, allow_pickle=False) as npz:
+            frames = {}
+            for name in names:
+                prefix = f"{name}/"
+                arrays = {k[len(prefix):]: npz[k] for k in npz.files if k.startswith(prefix)}
+                frames[name] = arrays_to_frame(arrays)
+        return frames
@@ -1,5 +1,8 @@
 import numpy as np
 
+from ._lazy import lazy_import
+pd = lazy_import("pandas")
+
 
 def rate_to_end_value(rate, dur):
     return np.power(rate + 1, dur)
@@ -28,3 +31,124 @@ def change_rate(df, loc, col):
         return 0, 0
     inf_rate = (np.power(var_diff, 1/num_years) - 1) * 100
     return num_years, inf_rate
+
+
+def change_rates(df, cols):
+    """Compute change rates for every location of a (LOCATION, TIME) indexed frame in one pass.
+
+    Returns a frame indexed by location with the number of years spanned and, for
+    each column, the first and last values (`<col>_first`, `<col>_last`) and the
+    annualised rate of change in percent (`<col>`). Locations spanning less than
+    a year get 0 years and a 0 rate, like `change_rate`.
+    """
+    if isinstance(cols, str):
+        cols = [cols]
+    codes, locs = pd.factorize(df.index.get_level_values(0), sort=True)
+    _, first_pos = np.unique(codes, return_index=True)
+    _, rev_pos = np.unique(codes[::-1], return_index=True)
+    last_pos = len(codes) - 1 - rev_pos
+
+    years = df.index.get_level_values(1).year.values
+    num_years = years[last_pos] - years[first_pos]
+    valid = num_years >= 1
+    result = {"years": np.where(valid, num_years, 0)}
+    for col in cols:
+        values = df[col].values
+        first = values[first_pos]
+        last = values[last_pos]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = (np.power(last / first, 1 / np.where(valid, num_years, 1)) - 1) * 100
+        result[f"{col}_first"] = first
+        result[f"{col}_last"] = last
+        result[col] = np.where(valid, rate, 0)
+    return pd.DataFrame(result, index=pd.Index(locs, name=df.index.names[0]))
+
+
+def lead_lag_matrix(ser, groups, shifts):
+    """Build the leads/lags of `ser` within each group for all `shifts` in one pass.
+
+    Column `k` of the result holds the value `k` rows ahead (negative `k` looks back)
+    in the same group, or a missing value if the group ends first. Rows of a group
+    are taken in the order they appear in `ser`. Categorical series stay categorical.
+    """
+    shifts = np.asarray(list(shifts), dtype=np.int64)
+    codes, _ = pd.factorize(np.asarray(groups))
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+
+    n = len(ser)
+    pos = np.arange(n)[:, None] + shifts[None, :]
+    valid = (pos >= 0) & (pos < n)
+    pos = np.clip(pos, 0, max(n - 1, 0))
+    valid &= sorted_codes[pos] == sorted_codes[:, None]
+
+    is_categorical = isinstance(ser.dtype, pd.CategoricalDtype)
+    if is_categorical:
+        values = ser.cat.codes.values[order]
+        matrix = np.where(valid, values[pos], -1)
+    else:
+        values = ser.values.astype(float)[order]
+        matrix = np.where(valid, values[pos], np.nan)
+    result = np.empty_like(matrix)
+    result[order] = matrix
+
+    columns = {}
+    for i, k in enumerate(shifts):
+        if is_categorical:
+            columns[k] = pd.Categorical.from_codes(result[:, i], dtype=ser.dtype)
+        else:
+            columns[k] = result[:, i]
+    return pd.DataFrame(columns, index=ser.index)
+
+
+def quantile_codes(values, groups, num_q):
+    """Assign values to `num_q` quantile bins within each group, as `pd.qcut` would per group.
+
+    Bins are found from grouped ranks rather than by cutting every group separately.
+    `values` may be 2-D, in which case each column is binned independently. Returns an
+    array of the same shape with bins numbered from 1, and 0 for missing values.
+    Like `pd.qcut`, raises a ValueError if the bin edges of a group are not unique.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        return quantile_codes(values[:, None], groups, num_q)[:, 0]
+    n, m = values.shape
+    codes, _ = pd.factorize(np.asarray(groups))
+    num_groups = codes.max() + 1 if n else 0
+
+    # Every (column, group) pair is a separate group of the flattened values
+    flat = values.T.ravel()
+    flat_groups = (np.arange(m)[:, None] * num_groups + codes[None, :]).ravel()
+    valid_idx = np.flatnonzero(~np.isnan(flat))
+    order = np.lexsort((flat[valid_idx], flat_groups[valid_idx]))
+    sv = flat[valid_idx][order]
+    sg = flat_groups[valid_idx][order]
+    result = np.zeros(n * m, dtype=np.min_scalar_type(num_q))
+    if len(sv) == 0:
+        return result.reshape(m, n).T
+
+    new_group = np.r_[True, sg[1:] != sg[:-1]]
+    starts = np.flatnonzero(new_group)
+    sizes = np.diff(np.r_[starts, len(sv)])
+    # Position of the last value of each run of ties, i.e. the 'max' rank
+    run_ends = np.flatnonzero(np.r_[(sv[1:] != sv[:-1]) | new_group[1:], True])
+    tie_end = run_ends[np.searchsorted(run_ends, np.arange(len(sv)))]
+
+    # Interior bin edges, interpolated between order statistics like pd.qcut
+    pos = np.linspace(0, 1, num_q + 1)[None, 1:-1] * (sizes[:, None] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, sizes[:, None] - 1)
+    lo_v = sv[starts[:, None] + lo]
+    hi_v = sv[starts[:, None] + hi]
+    edges = lo_v + (hi_v - lo_v) * (pos - lo)
+    all_edges = np.column_stack([sv[starts], edges, sv[starts + sizes - 1]])
+    if (np.diff(all_edges, axis=1) == 0).any():
+        raise ValueError("Bin edges must be unique within each group")
+
+    # Global position one past the last value <= each edge
+    counts = np.where(lo_v == edges, tie_end[starts[:, None] + lo] + 1,
+                      np.where(hi_v == edges, tie_end[starts[:, None] + hi] + 1, starts[:, None] + lo + 1))
+    group_rank = np.repeat(np.arange(len(starts)), sizes)
+    bins = np.searchsorted(counts.ravel(), np.arange(len(sv)), side="right") - (num_q - 1) * group_rank + 1
+    result[valid_idx[order]] = bins
+    return result.reshape(m, n).T
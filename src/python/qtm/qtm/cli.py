@@ -0,0 +1,197 @@
+"""
+  Command line interface for rendering the figures headlessly
+
+  The figures to render are described in a JSON file, e.g.
+
+    {
+      "data_dir": "data/preprocess",
+      "barro_path": "data/barro/barro-data-set.csv",
+      "figures": [
+        {"name": "m1-annual", "figure": "annual_ts_fig", "aggregate": "M1", "params": {"marker_date": "2008"}},
+        {"name": "m1-quantile", "figure": "quantile_ts_fig", "aggregate": "M1", "params": {"threshold_frac": 0.2}},
+        {"name": "m1-summary", "figure": "plot_summary", "aggregate": "M1",
+         "params": {"countries_to_label": ["TUR", "USA"]}},
+        {"name": "barro", "figure": "barro.xy_fig", "params": {"xlabel": "M1", "ylabel": "CPI",
+                                                             "labeled_points": ["Brazil"]}}
+      ]
+    }
+
+  Relative paths are resolved against the directory of the spec file.
+"""
+import argparse
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from . import trace
+
+# State shared with the worker processes, set by `init_worker`
+_worker_state = {}
+
+
+def _data_fig(method):
+    def render(state, fig_spec, params):
+        import matplotlib.pyplot as plt
+        data = state["data"][fig_spec["aggregate"]]
+        getattr(data, method)(**params)
+        return plt.gcf()
+    return render
+
+
+def _summary_fig(state, fig_spec, params):
+    import matplotlib.pyplot as plt
+    data = state["data"][fig_spec["aggregate"]]
+    figsize = params.pop("figsize", (8, 8))
+    fig, ax = plt.subplots(figsize=figsize)
+    data.plot_summary(ax, **params)
+    return fig
+
+
+def _barro_fig(name):
+    def render(state, fig_spec, params):
+        from . import barro
+        return getattr(barro, name)(state["barro_df"], **params)
+    return render
+
+
+renderers = {
+    "annual_ts_fig": _data_fig("annual_ts_fig"),
+    "quantile_ts_fig": _data_fig("quantile_ts_fig"),
+    "plot_summary": _summary_fig,
+    "barro.xy_fig": _barro_fig("xy_fig"),
+    "barro.xy_fig_with_error": _barro_fig("xy_fig_with_error"),
+}
+
+
+def load_state(spec):
+    """Read the data needed by the figures in `spec` once, so it can be shared with the workers"""
+    from . import barro
+    from . import oecd
+    state = {"data": {}, "barro_df": None}
+    aggregates = []
+    for fig_spec in spec["figures"]:
+        if fig_spec["figure"] not in renderers:
+            raise ValueError(f"Unknown figure '{fig_spec['figure']}' for '{fig_spec['name']}'")
+        if fig_spec["figure"].startswith("barro."):
+            if state["barro_df"] is None:
+                state["barro_df"] = barro.read_barro_data(spec["barro_path"])
+        elif fig_spec["aggregate"] not in aggregates:
+            aggregates.append(fig_spec["aggregate"])
+    if aggregates:
+        multi_data = oecd.MultiData(spec["data_dir"], aggregates, spec.get("cache_dir"))
+        for aggregate in aggregates:
+            data = multi_data[aggregate]
+            # The figures only use the annual data, which is loaded here rather than in every worker
+            for name in ["annual_df", "max_inflation_df", "annual_panel"]:
+                getattr(data, name)
+            state["data"][aggregate] = data
+    return state
+
+
+def init_worker(state, style):
+    import matplotlib
+    matplotlib.use("Agg")
+    if style:
+        from .viz import set_style
+        set_style()
+    _worker_state.update(state)
+
+
+def render_figure(fig_spec, out_dir, fmt, dpi):
+    """Render one figure in the current process and return the path it was written to"""
+    import matplotlib.pyplot as plt
+    params = dict(fig_spec.get("params", {}))
+    fig = renderers[fig_spec["figure"]](_worker_state, fig_spec, params)
+    path = os.path.join(out_dir, f"{fig_spec['name']}.{fmt}")
+    with trace.stage("cli.savefig"):
+        fig.savefig(path, dpi=dpi)
+    plt.close("all")
+    return path
+
+
+def _render_or_error(fig_spec, out_dir, fmt, dpi, traced=False):
+    """Render one figure, returning its path, the traceback if it failed and, if traced, the trace report"""
+    if traced:
+        with trace.tracing(f"cli.render {fig_spec['name']}") as tracer:
+            path, error, _ = _render_or_error(fig_spec, out_dir, fmt, dpi)
+        return path, error, tracer.report()
+    try:
+        return render_figure(fig_spec, out_dir, fmt, dpi), None, None
+    except Exception:
+        return None, traceback.format_exc(), None
+
+
+def read_spec(path):
+    with open(path) as f:
+        spec = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for key in ["data_dir", "barro_path", "cache_dir"]:
+        if spec.get(key) is not None:
+            spec[key] = os.path.join(base, spec[key])
+    spec.setdefault("data_dir", os.path.join(base, "data/preprocess"))
+    spec.setdefault("barro_path", os.path.join(base, "data/barro/barro-data-set.csv"))
+    return spec
+
+
+def render(spec, out_dir, jobs=None, fmt="png", dpi=None, style=True):
+    """Render all figures of `spec` into `out_dir` across `jobs` processes.
+
+    Returns a dict from figure name to a (path, error) pair, where error is the
+    traceback if rendering failed. When tracing, the stages of every figure, including
+    those rendered by the workers, are added to the current tracer.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with trace.stage("cli.load_state"):
+        state = load_state(spec)
+    figures = spec["figures"]
+    tracer = trace.current()
+    traced = tracer is not None
+    if jobs == 1:
+        init_worker(state, style)
+        results = [_render_or_error(fig_spec, out_dir, fmt, dpi, traced) for fig_spec in figures]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(state, style)) as executor:
+            futures = [executor.submit(_render_or_error, fig_spec, out_dir, fmt, dpi, traced) for fig_spec in figures]
+            results = [future.result() for future in futures]
+    for _, _, report in results:
+        if report is not None:
+            tracer.merge(report)
+    return {fig_spec["name"]: (path, error) for fig_spec, (path, error, _) in zip(figures, results)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="qtm", description="Quantity Theory of Money tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    render_parser = subparsers.add_parser("render", help="render the figures described in a JSON spec")
+    render_parser.add_argument("spec", help="JSON file listing the figures and their parameters")
+    render_parser.add_argument("-o", "--out", default="figures", help="output directory")
+    render_parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes")
+    render_parser.add_argument("-f", "--format", default="png", help="output format, e.g. png, pdf or svg")
+    render_parser.add_argument("--dpi", type=int, default=None, help="resolution of raster output")
+    render_parser.add_argument("--no-style", action="store_true", help="do not apply qtm.viz.set_style")
+    render_parser.add_argument("--trace", default=None, metavar="PATH",
+                               help="write the time spent in each stage as JSON to PATH and print a summary")
+    args = parser.parse_args(argv)
+
+    spec = read_spec(args.spec)
+    if args.trace:
+        with trace.tracing("qtm render") as tracer:
+            results = render(spec, args.out, args.jobs, args.format, args.dpi, not args.no_style)
+        tracer.write_json(args.trace)
+        print(tracer.flame_summary(), file=sys.stderr)
+    else:
+        results = render(spec, args.out, args.jobs, args.format, args.dpi, not args.no_style)
+    failed = 0
+    for name, (path, error) in results.items():
+        if error is None:
+            print(f"{name}: {path}")
+        else:
+            failed += 1
+            print(f"{name}: failed\n{error}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+  Module for finding episodes of high inflation or money growth
+
+  An episode is a run of consecutive rows of a location whose value is above a threshold,
+  either the same for every location or a quantile of each location's own values. The
+  panel is flattened into one array sorted by location, and the runs of all locations,
+  and of several thresholds at once, are found by run-length encoding the flags of the
+  values above threshold: a run starts where a flag is set but the one before it (in the
+  same location and threshold) is not, and ends where the next one is not.
+"""
+import numpy as np
+import pandas as pd
+
+from . import trace
+
+
+def run_bounds(flags, codes):
+    """First and last positions of the runs of set flags, where runs do not cross from one code to the next.
+
+    Rows of a code must be consecutive. Returns two integer arrays, in order of position.
+    """
+    flags = np.asarray(flags, dtype=bool)
+    same_prev = np.r_[False, codes[1:] == codes[:-1]]
+    same_next = np.r_[same_prev[1:], False]
+    prev_flags = np.r_[False, flags[:-1]] & same_prev
+    next_flags = np.r_[flags[1:], False] & same_next
+    return np.flatnonzero(flags & ~prev_flags), np.flatnonzero(flags & ~next_flags)
+
+
+def group_quantiles(values, codes, num_groups, q):
+    """The q quantile of the present values of every group, interpolated linearly like `np.nanquantile`"""
+    valid = np.flatnonzero(~np.isnan(values))
+    order = valid[np.lexsort((values[valid], codes[valid]))]
+    sizes = np.bincount(codes[valid], minlength=num_groups)
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    pos = q * np.maximum(sizes - 1, 0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, np.maximum(sizes - 1, 0))
+    sorted_values = np.r_[values[order], np.nan]
+    # Groups without values index the trailing missing value
+    lo_values = sorted_values[np.where(sizes > 0, starts + lo, len(order))]
+    hi_values = sorted_values[np.where(sizes > 0, starts + hi, len(order))]
+    return lo_values + (pos - lo) * (hi_values - lo_values)
+
+
+@trace.traced
+def find_episodes(df, col, threshold=None, quantile=None, min_duration=1, money_col=None, lookback=3,
+                  level="LOCATION"):
+    """Runs of consecutive rows of every location where `col` is above a threshold.
+
+    Give either `threshold`, the same for every location, or `quantile`, for the given
+    quantile of each location's values of `col`; either may be a list, to find the
+    episodes of several thresholds at once. Runs are of consecutive rows of the panel,
+    whether or not their periods are, and runs shorter than `min_duration` rows are
+    left out. With `money_col`, its mean over the `lookback`
+    rows before each episode (or as many as the location has) is added as
+    `prior_<money_col>`.
+
+    Rows are taken in order of the last index level, TIME, within each location.
+    Returns a frame with a row per episode: its location, threshold (and quantile), the
+    TIME of its start, end and peak, its duration in rows and the peak value of `col`.
+    """
+    if (threshold is None) == (quantile is None):
+        raise ValueError("Give either threshold or quantile")
+    codes, locations = pd.factorize(df.index.get_level_values(level), sort=True)
+    times = df.index.get_level_values(-1).values
+    order = np.lexsort((times, codes))
+    codes, times = codes[order], times[order]
+    values = np.asarray(df[col].values, dtype=float)[order]
+    num_locations = len(locations)
+
+    levels = np.atleast_1d(np.asarray(quantile if threshold is None else threshold, dtype=float))
+    if threshold is None:
+        thresholds = np.stack([group_quantiles(values, codes, num_locations, q) for q in levels])
+    else:
+        thresholds = np.repeat(levels[:, None], num_locations, axis=1)
+    # Every (threshold, location) pair is a separate group of the flattened flags
+    with np.errstate(invalid='ignore'):
+        flags = (values[None, :] > thresholds[:, codes]).ravel()
+    layer_codes = (np.arange(len(levels))[:, None] * num_locations + codes[None, :]).ravel()
+    starts, ends = run_bounds(flags, layer_codes)
+    durations = ends - starts + 1
+    # Outside the runs, values never win the max over the rows from one start to the next
+    masked = np.where(flags, np.tile(values, len(levels)), -np.inf)
+    peaks = np.maximum.reduceat(masked, starts) if len(starts) else np.zeros(0)
+    offsets = np.arange(durations.sum()) - np.repeat(np.cumsum(durations) - durations, durations)
+    run_rows = np.repeat(starts, durations) + offsets
+    run_of_row = np.repeat(np.arange(len(starts)), durations)
+    is_peak = masked[run_rows] == peaks[run_of_row]
+    _, first_peak = np.unique(run_of_row[is_peak], return_index=True)
+    peak_positions = run_rows[is_peak][first_peak]
+
+    keep = durations >= min_duration
+    starts, ends, durations, peaks, peak_positions = (a[keep] for a in [starts, ends, durations, peaks, peak_positions])
+    # Positions in the flattened flags are (threshold, row) pairs
+    num_rows = max(len(values), 1)
+    layers, rows = np.divmod(starts, num_rows)
+    episode_codes = codes[rows]
+
+    result = {
+        level: np.asarray(locations)[episode_codes],
+        "threshold": thresholds[layers, episode_codes],
+    }
+    if threshold is None:
+        result["quantile"] = levels[layers]
+    result.update({
+        "start": times[rows],
+        "end": times[ends % num_rows],
+        "duration": durations,
+        "peak": peaks,
+        "peak_time": times[peak_positions % num_rows],
+    })
+    if money_col is not None:
+        money = np.asarray(df[money_col].values, dtype=float)[order]
+        present = ~np.isnan(money)
+        sums = np.r_[0, np.cumsum(np.where(present, money, 0))]
+        counts = np.r_[0, np.cumsum(present)]
+        location_starts = np.searchsorted(codes, np.arange(num_locations))
+        lo = np.maximum(rows - lookback, location_starts[episode_codes])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[f"prior_{money_col}"] = (sums[rows] - sums[lo]) / (counts[rows] - counts[lo])
+    return pd.DataFrame(result)
@@ -0,0 +1,77 @@
+"""
+  Module for making frames compact in memory and measuring them
+"""
+import numpy as np
+import pandas as pd
+
+
+def _repeats(values):
+    """Whether values are repeated enough for a categorical to be smaller"""
+    return len(values) > 0 and values.nunique() <= len(values) // 2
+
+
+def _compact_values(values, float_dtype):
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return values
+    if dtype == object:
+        return values.astype("category") if _repeats(values) else values
+    if np.issubdtype(dtype, np.floating):
+        return values.astype(float_dtype)
+    if np.issubdtype(dtype, np.integer) and len(values) > 0:
+        small = np.promote_types(np.min_scalar_type(values.min()), np.min_scalar_type(values.max()))
+        return values.astype(small)
+    return values
+
+
+def compact_frame(df, float_dtype=np.float32):
+    """Copy of df using less memory.
+
+    Float columns become `float_dtype`, integer columns the smallest integer type that
+    holds their values, and string columns and a string index become categoricals if
+    their values repeat. The levels of a MultiIndex are already stored once, so it is
+    kept as is.
+    """
+    df = df.copy()
+    for col in df.columns:
+        df[col] = _compact_values(df[col], float_dtype)
+    if not isinstance(df.index, pd.MultiIndex) and df.index.dtype == object and _repeats(df.index):
+        df.index = pd.CategoricalIndex(df.index, name=df.index.name)
+    return df
+
+
+def _values_memory_usage(values):
+    """Bytes of an array, categorical or extension array, including the contents of strings"""
+    if isinstance(values, pd.Categorical):
+        return values.codes.nbytes + index_memory_usage(values.categories)
+    if values.dtype == object:
+        return int(pd.Series(values, copy=False).memory_usage(deep=True, index=False))
+    return int(values.nbytes)
+
+
+def index_memory_usage(index):
+    """Bytes of the labels of an index: the levels and codes of a MultiIndex, the codes and
+    categories of a CategoricalIndex, or else its values.
+
+    Unlike `Index.memory_usage`, this leaves out the lookup table pandas builds and keeps
+    for an index once it is used, e.g. by `.loc`.
+    """
+    if isinstance(index, pd.MultiIndex):
+        return sum(index_memory_usage(level) for level in index.levels) + sum(int(c.nbytes) for c in index.codes)
+    if isinstance(index, pd.RangeIndex):
+        return int(index.nbytes)
+    return _values_memory_usage(index.values)
+
+
+def memory_usage(obj):
+    """Bytes used by a frame, series or Panel, including the index and the contents of strings.
+
+    Only the data are counted, not what pandas caches for them, so this does not depend
+    on how the object has been used.
+    """
+    if isinstance(obj, pd.Series):
+        return _values_memory_usage(obj.values) + index_memory_usage(obj.index)
+    if isinstance(obj, pd.DataFrame):
+        columns = sum(_values_memory_usage(obj.iloc[:, i].values) for i in range(obj.shape[1]))
+        return columns + index_memory_usage(obj.index)
+    return int(obj.memory_usage())
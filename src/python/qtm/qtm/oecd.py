@@ -5,15 +5,24 @@
 import os
 import numpy as np
 import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-import statsmodels.api as sm
-lowess = sm.nonparametric.lowess
+from ._lazy import lazy_import
+mpl = lazy_import("matplotlib")
+mcollections = lazy_import("matplotlib.collections")
+mcolors = lazy_import("matplotlib.colors")
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
 
 from . import calc
+from . import episodes
+from . import frames
+from . import smooth
+from . import trace
+from .cache import FrameCache
+from . import panel
+from .panel import Panel
 from . import viz
+from . import xcorr
 
 country_code_map = {
     "AUS": "Australia",
@@ -46,43 +55,113 @@ country_code_map = {
     "ZAF": "South Africa"
 }
 
-def read_data(path):
-    df = pd.read_csv(path)
-    df['TIME'] = pd.to_datetime(df['TIME'])
-    df = df.set_index(['LOCATION', "TIME"])
-    df = df.drop(['OECDE', 'OECD'])
+class PaletteColor:
+    def __init__(self, index):
+        """Attribute that defaults to an entry of the seaborn palette, looked up on first use"""
+        self.index = index
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = f"_{name}"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.name not in obj.__dict__:
+            obj.__dict__[self.name] = sns.color_palette()[self.index]
+        return obj.__dict__[self.name]
+
+    def __set__(self, obj, value):
+        obj.__dict__[self.name] = value
+
+
+# The OECD aggregates, which are left out of the per-country analysis
+aggregate_locations = ['OECDE', 'OECD']
+
+
+@trace.traced
+def read_panel(path):
+    """Open a panel store, without the OECD aggregates.
+
+    The panel uses the memory-mapped arrays of the store, so only the rows of the
+    locations used are ever read.
+    """
+    store = Panel.open(path)
+    missing = [loc for loc in aggregate_locations if loc not in store]
+    if missing:
+        raise ValueError(f"Panel store {path} has no rows for {', '.join(missing)}")
+    return store.select([loc for loc in store.locations if loc not in aggregate_locations])
+
+
+@trace.traced
+def read_data(path, compact=False):
+    """Read a (LOCATION, TIME) panel from a CSV file or a memory-mapped panel store.
+
+    With `compact`, the values are float32 (see `frames.compact_frame`).
+    """
+    if panel.is_store(path):
+        df = read_panel(path).to_frame()
+    else:
+        df = pd.read_csv(path)
+        df['TIME'] = pd.to_datetime(df['TIME'])
+        df = df.set_index(['LOCATION', "TIME"])
+        df = df.drop(aggregate_locations)
+    if compact:
+        df = frames.compact_frame(df)
     return df
 
 
-def read_reg_data(path):
+def excluded_rows(index, usa_period):
+    """Mask of the rows of a (LOCATION, TIME) index left out of the analysis.
+
+    These are the first row of the USA in `usa_period`, e.g. "2020" or "2020-05", and
+    the rows of Iceland up to 1976.
+    """
+    locs = index.get_level_values(0)
+    times = index.get_level_values(1)
+    period = pd.Period(usa_period)
+    usa = np.flatnonzero((locs == "USA") & (times >= period.start_time) & (times <= period.end_time))
+    if len(usa) == 0:
+        raise KeyError(("USA", usa_period))
+    mask = np.asarray((locs == "ISL") & (times <= pd.Period("1976").end_time))
+    mask[usa[0]] = True
+    return mask
+
+
+def data_path(folder_path, name):
+    """Path of the panel store for name in folder_path if there is one, otherwise of the CSV file"""
+    store_path = os.path.join(folder_path, f"{name}{panel.STORE_SUFFIX}")
+    if panel.is_store(store_path):
+        return store_path
+    return os.path.join(folder_path, f"{name}.csv")
+
+
+@trace.traced
+def read_reg_data(path, compact=False):
     df = pd.read_csv(path)
     df = df.set_index('LOCATION')
     df = df.drop(['OECDE', 'OECD'])
+    if compact:
+        df = frames.compact_frame(df)
     return df
 
 
+@trace.traced
 def summary_df(df, xcol):
-    change_idx = []
-    m_change = []
-    cpi_change = []
-    years= []
-    for c, c_df in df.groupby(level=0):
-        cr = calc.change_rate(df, c, xcol)
-        if cr[0] < 1:
-            continue
-        years.append(cr[0])
-        m_change.append(cr[1])
-        cpi_change.append(calc.change_rate(df, c, "CPI")[1])
-        change_idx.append(c)
-
-    summary_df = pd.DataFrame({xcol: m_change, "CPI": cpi_change, "years": years}, change_idx)
+    rates = calc.change_rates(df, [xcol, "CPI"])
+    rates = rates[rates["years"] >= 1]
+    summary_df = pd.DataFrame({xcol: rates[xcol].values, "CPI": rates["CPI"].values, "years": rates["years"].values},
+                              list(rates.index))
     return summary_df
 
 
-def summary_fig(ax, df, xlabel, ylabel, labeled_points, xcol="M1", ycol="CPI"):
+@trace.traced
+def summary_fig(ax, df, xlabel, ylabel, labeled_points, xcol="M1", ycol="CPI", num_resamples=0):
     palette = sns.color_palette()
     lin_reg = viz.LinReg(df, xcol, ycol)
     lin_reg.fit()
+    if num_resamples:
+        lin_reg.bootstrap(num_resamples)
     viz.xy_plot(ax, df, lin_reg, palette[0], palette[3], palette[4], palette[1], labeled_points, xcol, ycol)
     ax.set_xlabel(xlabel)
     ax.xaxis.set_label_coords(0.2, -0.1)
@@ -91,6 +170,7 @@ def summary_fig(ax, df, xlabel, ylabel, labeled_points, xcol="M1", ycol="CPI"):
     return
 
 
+@trace.traced
 def year_summary_df(df):
     idx = []
     start_years = []
@@ -113,41 +193,46 @@ def to_loc_quantile_df(df, xcol, ycol, numq, name):
     return tdf
 
 
+@trace.traced
 def to_quantile_df(df, xcol, ycol, num_quantiles):
-    qdfs = []
-    qdfs = [to_loc_quantile_df(ldf, xcol, ycol, num_quantiles, name) 
-            for name, ldf in df.groupby(level="LOCATION")]
-
-    return pd.concat(qdfs)
-
-
-def quantile_ts_plot_df(df, cat_col, other_col, tperiod):
-    result_dfs = []
-    for name, ldf in df.groupby(level='LOCATION'):
-        cc = ldf[cat_col].reset_index(level=0, drop=True)
-        cc.name = "cat"
-        rdf = pd.DataFrame(cc)
-        rdf['LOCATION'] = name
-        for i in range(0, tperiod):
-            rdf.loc[:, f"Year_{i}"] = ldf[other_col].shift(-1*i).reset_index(level=0, drop=True)
-        result_dfs.append(rdf)
-    result_df = pd.concat(result_dfs).set_index('LOCATION', append=True)
-    return result_df.reorder_levels([1, 0]).sort_index().set_index('cat', append=True)
-
-
+    locs = df.index.get_level_values("LOCATION")
+    codes = calc.quantile_codes(df[[xcol, ycol]].values, locs, num_quantiles)
+    order = np.argsort(pd.factorize(locs, sort=True)[0], kind="stable")
+    labels = range(1, num_quantiles + 1)
+    qdfs = {col: pd.Categorical.from_codes(codes[order, i].astype(int) - 1, labels, ordered=True)
+            for i, col in enumerate([xcol, ycol])}
+    return pd.DataFrame(qdfs, index=df.index[order])
+
+
+@trace.traced
+def quantile_ts_plot_df(df, cat_col, other_col, tperiod, lags=0):
+    """Rows of `cat_col` with the next `tperiod` values (and previous `lags` values) of `other_col`"""
+    locs = df.index.get_level_values("LOCATION")
+    lead_df = calc.lead_lag_matrix(df[other_col], locs, range(-lags, tperiod))
+    lead_df.columns = [f"Year_{i}" for i in lead_df.columns]
+    lead_df.insert(0, "cat", df[cat_col])
+    return lead_df.sort_index().set_index('cat', append=True)
+
+
+@trace.traced
 def quantile_ts_summary_df(qts_df, threshold):
-    summary_rows = []
-    for c, cdf in qts_df.groupby(level="LOCATION"):
-        ttdf = cdf.loc[(True if i[2] > threshold else False for i in cdf.index)]
-        for i, r in ttdf.iterrows():
-            summary_rows.append({"LOCATION": c, "index": i[0], "cat": i[1], "percentage": len(r[r > threshold]) / len(r)})
-    return pd.DataFrame(summary_rows)
+    locs = qts_df.index.get_level_values(0)
+    times = qts_df.index.get_level_values(1)
+    cats = np.asarray(qts_df.index.get_level_values(2), dtype=float)
+    values = np.column_stack([qts_df[col].astype(float).values for col in qts_df.columns])
 
+    codes, _ = pd.factorize(locs, sort=True)
+    rows = np.flatnonzero(cats > threshold)
+    rows = rows[np.argsort(codes[rows], kind="stable")]
+    percentage = (values[rows] > threshold).sum(axis=1) / values.shape[1]
+    return pd.DataFrame({"LOCATION": locs[rows], "index": locs[rows], "cat": times[rows], "percentage": percentage})
 
+
+@trace.traced
 def ts_a_scatterplot(ax, df_a, col, color, label, frac):
-    ax.scatter(df_a.index, df_a[col], alpha=0.7, s=30, color=color, label=label)
-    smoothed = lowess(df_a[col], df_a.index, frac=frac, return_sorted=False)
-    ax.plot(df_a.index, smoothed, alpha=0.7, lw=3, color=color)
+    viz.decimated_scatter(ax, df_a.index, df_a[col], alpha=0.7, s=30, color=color, label=label)
+    smoothed = smooth.lowess(df_a[col], df_a.index, frac=frac)
+    viz.decimated_plot(ax, df_a.index, smoothed, alpha=0.7, lw=3, color=color)
 
 
 def ts_a_plot(ax, df, loc, start_date, marker_date, years_frac, i_color=None, m_color=None, a_color=None, money="M1"):
@@ -176,10 +261,10 @@ def ts_a_plot(ax, df, loc, start_date, marker_date, years_frac, i_color=None, m_
 
 def facet_ts_plot_label(df, loc):
     tdf = df.loc[loc, :].reset_index()
-    dr = tdf['TIME'].agg([np.min, np.max]).dt.year
+    dr = tdf['TIME'].agg(["min", "max"]).dt.year
     # r2 = ue_cpi_r2_df[ue_cpi_r2_df['LOCATION'] == loc]['R2'].iloc[0]
-    # title = f"{loc} | {dr['amin']} – {dr['amax']}\n$r^2 = {r2:.2f}$"
-    title = f"{loc} | {dr['amin']} – {dr['amax']}"
+    # title = f"{loc} | {dr['min']} – {dr['max']}\n$r^2 = {r2:.2f}$"
+    title = f"{loc} | {dr['min']} – {dr['max']}"
     return title
 
 
@@ -199,25 +284,39 @@ def facet_ts_a_plot(xname, yname, color, **kwargs):
     
     
 def quantile_ts_scatter(ax, df, color, highlight_color, threshold, alpha=0.025, highlight_alpha=0.1, label=None):
-    cats = [i[1] for i in df.index]
-    subset = [True if cat > threshold else False for cat in cats]
-    tdf = df.loc[subset]
-    for i, col in enumerate(tdf.columns):
-        l = label if (i == 0) else None
-        ax.scatter(np.full(len(tdf), i), tdf[col], color=highlight_color, alpha=highlight_alpha, label=l)
+    cats = np.asarray(df.index.get_level_values(1), dtype=float)
+    values = df.loc[cats > threshold].astype(float).values
+    xs = np.broadcast_to(np.arange(values.shape[1]), values.shape)
+    ax.scatter(xs.ravel(), values.ravel(), color=highlight_color, alpha=highlight_alpha, label=label)
+
+
+def quantile_ts_segments(df):
+    """The rows of df as polylines over the horizon columns, for a LineCollection"""
+    values = df.astype(float).values
+    xs = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    return np.stack([xs, values], axis=-1)
 
 
 def quantile_ts_lines(ax, df, color, highlight_color, threshold, alpha=0.025, highlight_alpha=0.1,
                     normal_label=None, top_label=None):
-    for i, r in df.iterrows():
-        c = highlight_color if i[1] > threshold else color
-        a = highlight_alpha if i[1] > threshold else alpha
-        ax.plot(range(len(r)), r, color=c, alpha=a)
+    cats = np.asarray(df.index.get_level_values(1), dtype=float)
+    segments = quantile_ts_segments(df)
+    highlighted = cats > threshold
+    # One collection for the normal rows and one drawn over it for the highlighted rows
+    for subset, c, a, label in [(~highlighted, color, alpha, normal_label),
+                                (highlighted, highlight_color, highlight_alpha, top_label)]:
+        if not subset.any():
+            continue
+        colors = np.tile(mcolors.to_rgba(c, a), (subset.sum(), 1))
+        lines = mcollections.LineCollection(segments[subset], colors=colors, label=label)
+        ax.add_collection(lines)
+    ax.autoscale_view()
 
 def quantile_ts_threshold(ax, threshold, maxy, a_color, alpha):
     ax.axhspan(threshold, maxy, color=a_color, alpha=alpha)
     
     
+@trace.traced
 def quantile_ts_plot(ax, df, color, highlight_color, threshold, alpha, highlight_alpha, 
                      normal_label, top_label, num_q, threshold_color, threshold_alpha):
     quantile_ts_lines(ax, df, color, highlight_color, threshold, alpha, highlight_alpha,
@@ -246,57 +345,214 @@ def facet_quantile_ts_plot(money, cpi, color, **kwargs):
 #     quantile_ts_threshold(ax, threshold, num_q, palette[4], 0.3)
 
 
-class Data:
-    def __init__(self, folder_path, monetary_aggregate):
-        """Utility class for working with a given monetary aggregate"""
+class LazyFrame:
+    def __init__(self, source, derived_from=None):
+        """Frame attribute that is built on first use by the `_build_<name>` method of its owner.
+
+        `source` names the attribute holding the path of the file the frame is read
+        from, and `derived_from` the frame it is computed from, if any. Setting the
+        attribute forgets the frames derived from it.
+        """
+        self.source = source
+        self.derived_from = derived_from
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.name not in obj.__dict__:
+            path = None if self.source is None else getattr(obj, self.source)
+            obj.__dict__[self.name] = obj._load_frame(self.name, path)
+        return obj.__dict__[self.name]
+
+    def __set__(self, obj, value):
+        obj.invalidate(self.name)
+        obj.__dict__[self.name] = value
+        obj.__dict__.setdefault("_assigned", set()).add(self.name)
+
+    @staticmethod
+    def _attributes(cls):
+        attributes = {}
+        for klass in cls.__mro__:
+            for name, attr in vars(klass).items():
+                if isinstance(attr, LazyFrame):
+                    attributes.setdefault(name, attr)
+        return list(attributes.values())
+
+    @staticmethod
+    def names(cls):
+        return [attr.name for attr in LazyFrame._attributes(cls)]
+
+    @staticmethod
+    def derived(cls, name):
+        return [attr.name for attr in LazyFrame._attributes(cls) if attr.derived_from == name]
+
+
+class LazyFrames:
+    """Base of the classes whose frames are LazyFrame attributes"""
+
+    def invalidate(self, *names):
+        """Forget the named frames, and those derived from them, so they are reloaded on next use.
+
+        Without names, all frames are forgotten.
+        """
+        frames = LazyFrame.names(type(self))
+        stale = list(names or frames)
+        while stale:
+            name = stale.pop()
+            if name not in frames:
+                raise ValueError(f"Unknown frame '{name}'")
+            self.__dict__.pop(name, None)
+            self.__dict__.get("_assigned", set()).discard(name)
+            stale.extend(LazyFrame.derived(type(self), name))
+
+    def assigned(self, name):
+        """Whether the frame `name`, or one it is derived from, was set rather than loaded"""
+        attributes = {attr.name: attr for attr in LazyFrame._attributes(type(self))}
+        assigned = self.__dict__.get("_assigned", set())
+        while name is not None:
+            if name in assigned:
+                return True
+            name = attributes[name].derived_from
+        return False
+
+    def memory_report(self):
+        """Rows, columns and deep memory usage in bytes of each frame that is loaded"""
+        report = {}
+        for name in LazyFrame.names(type(self)):
+            obj = self.__dict__.get(name)
+            if obj is not None:
+                report[name] = {"rows": len(obj), "columns": len(obj.columns), "bytes": frames.memory_usage(obj)}
+        report = pd.DataFrame.from_dict(report, orient="index", columns=["rows", "columns", "bytes"])
+        report.index.name = "frame"
+        return report
+
+
+class Data(LazyFrames):
+    inflation_color = PaletteColor(3)
+    money_color = PaletteColor(2)
+    annot_color = PaletteColor(4)
+
+    annual_df_full = LazyFrame("annual_path")  # include the US 2020 data
+    annual_df = LazyFrame("annual_path", derived_from="annual_df_full")
+    max_inflation_df = LazyFrame("annual_path", derived_from="annual_df")
+    annual_reg_df = LazyFrame("annual_reg_path")
+    monthly_df_full = LazyFrame("monthly_path")  # include May 2020 for the US
+    monthly_df = LazyFrame("monthly_path", derived_from="monthly_df_full")
+    monthly_reg_df = LazyFrame("monthly_reg_path")
+    # Array-backed annual_df and monthly_df, for per-location access
+    annual_panel = LazyFrame(None, derived_from="annual_df")
+    monthly_panel = LazyFrame(None, derived_from="monthly_df")
+    # The memory-mapped panels of annual_path and monthly_path if they are panel stores, else None
+    annual_store = LazyFrame("annual_path")
+    monthly_store = LazyFrame("monthly_path")
+
+    def __init__(self, folder_path, monetary_aggregate, cache_dir=None, compact=False):
+        """Utility class for working with a given monetary aggregate
+
+        The frames are loaded when they are first used, each from its own source file.
+        If `cache_dir` is given, the frames read from the CSV files are cached there
+        and only re-read when those change. With `compact`, the frames
+        use float32 values and small integer types (see `frames.compact_frame`).
+        """
         self.folder_path = folder_path
         self.monetary_aggregate = monetary_aggregate
+        self.cache_dir = cache_dir
+        self.compact = compact
         ma = monetary_aggregate.lower()
-        self.annual_path = os.path.join(folder_path, f"{ma}-cpi_a.csv")
+        self.annual_path = data_path(folder_path, f"{ma}-cpi_a")
         self.annual_reg_path = os.path.join(folder_path, f"{ma}-cpi_a_reg.csv")
-        self.monthly_path = os.path.join(folder_path, f"{ma}-cpi_m.csv")
+        self.monthly_path = data_path(folder_path, f"{ma}-cpi_m")
         self.monthly_reg_path = os.path.join(folder_path, f"{ma}-cpi_m_reg.csv")
-        palette = sns.color_palette()
-        self.inflation_color = palette[3]
-        self.money_color = palette[2]
-        self.annot_color = palette[4]
-        self.annual_df = None
-        self.annual_df_full = None   # include the US 2020 data
-        self.annual_reg_df = None
-        self.monthly_df = None
-        self.monthly_df_full = None  # include May 2020 for the US
-        self.monthly_reg_df = None
-        self.max_inflation_df = None
-        
-    def read(self):
-        self.annual_df_full = read_data(self.annual_path)
+
+    def _load_frame(self, name, path):
+        with trace.stage(f"oecd.Data.load {name}") as stage:
+            df = self._load_or_build(name, path)
+            stage.add_rows(trace.row_count(df))
+        return df
+
+    def _load_or_build(self, name, path):
+        build = getattr(self, f"_build_{name}")
+        # Panel stores are memory-mapped, so there is nothing to gain from caching them. Derived
+        # frames are not cached either, as they depend on their source frame, which may be set.
+        if path is None or self.cache_dir is None or panel.is_store(path) or \
+                getattr(type(self), name).derived_from is not None:
+            return build()
+        key = f"{self.monetary_aggregate.lower()}-{name}" + ("-compact" if self.compact else "")
+        return FrameCache(self.cache_dir).load(key, [path], lambda: {name: build()})[name]
+
+    def _build_annual_df_full(self):
+        return read_data(self.annual_path, self.compact)
+
+    def _build_annual_df(self):
         df = self.annual_df_full
-        df = df.drop(index=df.loc[("USA", "2020"), :].index[0])
-        isl_start_year = df.loc["ISL"].index[0].year
-        df = df.drop(index=df.loc[("ISL", slice(str(isl_start_year), "1976")), :].index)
-        self.annual_df = df
-        self.annual_reg_df = read_reg_data(self.annual_reg_path)
-        self.monthly_df_full = read_data(self.monthly_path)
-        df = self.monthly_df_full
-        df = df.drop(index=df.loc[("USA", "2020-05"), :].index[0])
-        isl_start_year = df.loc["ISL"].index[0].year
-        df = df.drop(index=df.loc[("ISL", slice(str(isl_start_year), "1976")), :].index)
-        self.monthly_df = df
-        self.monthly_reg_df = read_reg_data(self.monthly_reg_path)
+        return df[~excluded_rows(df.index, "2020")]
+
+    def _build_max_inflation_df(self):
         max_inflation_df = pd.DataFrame(
             self.annual_df.groupby(level="LOCATION").max()['c_cpi'].sort_values(ascending=False))
         max_inflation_df['quantile'] = pd.qcut(max_inflation_df['c_cpi'], 4, labels=range(1, 5))
-        self.max_inflation_df = max_inflation_df
-        
+        return max_inflation_df
+
+    def _build_annual_reg_df(self):
+        return read_reg_data(self.annual_reg_path, self.compact)
+
+    def _build_monthly_df_full(self):
+        return read_data(self.monthly_path, self.compact)
+
+    def _build_monthly_df(self):
+        df = self.monthly_df_full
+        return df[~excluded_rows(df.index, "2020-05")]
+
+    def _build_monthly_reg_df(self):
+        return read_reg_data(self.monthly_reg_path, self.compact)
+
+    def _build_annual_panel(self):
+        return self._panel("annual_df", "annual_store", "2020")
+
+    def _build_monthly_panel(self):
+        return self._panel("monthly_df", "monthly_store", "2020-05")
+
+    def _panel(self, name, store_name, usa_period):
+        """The Panel of frame `name`, using the rows of its store (a panel store or, for an AggregateData, the MultiData panel) if any"""
+        if not self.compact and not self.assigned(name):
+            store = getattr(self, store_name)
+            if store is not None:
+                return store.where(~excluded_rows(store.row_index(), usa_period))
+        return Panel.from_frame(getattr(self, name))
+
+    def _build_annual_store(self):
+        return read_panel(self.annual_path) if panel.is_store(self.annual_path) else None
+
+    def _build_monthly_store(self):
+        return read_panel(self.monthly_path) if panel.is_store(self.monthly_path) else None
+
+    def read(self):
+        """Forget any loaded frames, so they are re-read from the files on next use"""
+        self.invalidate()
+
+    def as_panel(self, df):
+        """The Panel of df, reusing the one of annual_df or monthly_df"""
+        if df is self.__dict__.get("annual_df"):
+            return self.annual_panel
+        if df is self.__dict__.get("monthly_df"):
+            return self.monthly_panel
+        return Panel.from_frame(df)
+
     def money_col(self):
         return f"c_{self.monetary_aggregate.lower()}"
 
     
-    def plot_summary(self, ax, countries_to_label):
+    @trace.traced
+    def plot_summary(self, ax, countries_to_label, num_resamples=0):
         ma = self.monetary_aggregate
         sdf = summary_df(self.annual_df, ma)
-        summary_fig(ax, sdf, f"{ma} growth rate", "Inflation rate", countries_to_label, ma)
+        summary_fig(ax, sdf, f"{ma} growth rate", "Inflation rate", countries_to_label, ma, num_resamples=num_resamples)
         
+    @trace.traced
     def annual_ts_fig(self, marker_date=None, years_frac=3, subset=None, sharey=False, df=None, ylabel="% Change", 
                       citex=0.93, citey=0.07, show_title=False):
         if df is None:
@@ -307,30 +563,36 @@ class Data:
         else:
             tdf = df.loc[subset].reset_index()
             col_order = self.max_inflation_df.loc[subset].index
-        g = sns.FacetGrid(tdf, col="LOCATION", col_wrap=4, col_order=col_order, sharey=sharey, height=3, aspect=1.5)
-        start_date = tdf['TIME'].min()
-        g.map_dataframe(facet_ts_a_plot, "Year", ylabel, df=df, 
-                        start_date=start_date, marker_date=marker_date,
-                        money=self.monetary_aggregate,
-                        years_frac=years_frac,
-                        i_color=self.inflation_color, m_color=self.money_color,
-                        a_color=self.annot_color)
+        # Smooth all the facets in one pass; the per-facet lowess calls are then served from the memo
+        sdf = df if subset is None else df.loc[subset]
+        smooth.lowess_panel(sdf, [self.money_col(), "c_cpi"], years_frac / sdf.groupby(level="LOCATION").size())
+        with trace.stage("oecd.facets", len(tdf)):
+            g = sns.FacetGrid(tdf, col="LOCATION", col_wrap=4, col_order=col_order, sharey=sharey, height=3, aspect=1.5)
+            start_date = tdf['TIME'].min()
+            g.map_dataframe(facet_ts_a_plot, "Year", ylabel, df=self.as_panel(df), 
+                            start_date=start_date, marker_date=marker_date,
+                            money=self.monetary_aggregate,
+                            years_frac=years_frac,
+                            i_color=self.inflation_color, m_color=self.money_color,
+                            a_color=self.annot_color)
         for l in tdf['LOCATION'].values:
             ax = g.axes_dict[l]
-            ax.set_title(facet_ts_plot_label(self.annual_df, l))
+            ax.set_title(facet_ts_plot_label(self.annual_panel, l))
         if subset is None:
             g.axes[3].legend()
         if show_title:
             tdf = df.loc[subset].groupby(level='LOCATION').max()
-            max_vals = tdf.agg([np.max, np.min])['c_cpi']
-            plt.gcf().suptitle(f"Year over Year Changes in CPI and M1 | Max Inflation {max_vals['amax']:.0f}% — {max_vals['amin']:.0f}%")    
+            max_vals = tdf.agg(["max", "min"])['c_cpi']
+            plt.gcf().suptitle(f"Year over Year Changes in CPI and M1 | Max Inflation {max_vals['max']:.0f}% — {max_vals['min']:.0f}%")    
         viz.cite_fig_source(plt.gcf(), "OECD", citex, citey)
-        plt.tight_layout()        
+        with trace.stage("oecd.tight_layout"):
+            plt.tight_layout()
         
     def quantile_subset(self, q):
         return self.max_inflation_df.index[self.max_inflation_df['quantile'] == q]
     
-    def quantile_ts_df(self, num_q, num_y, label_column=None):
+    @trace.traced
+    def quantile_ts_df(self, num_q, num_y, label_column=None, lags=0):
         if label_column is None:
             cat_col = self.money_col()
             other_col = "c_cpi"
@@ -338,8 +600,27 @@ class Data:
             cat_col = "c_cpi"
             other_col = self.money_col()     
         q_df = to_quantile_df(self.annual_df, cat_col, other_col, num_q)
-        return quantile_ts_plot_df(q_df, cat_col, other_col, num_y)
+        return quantile_ts_plot_df(q_df, cat_col, other_col, num_y, lags)
     
+    @trace.traced
+    def lead_lag_df(self, max_lag, monthly=False, min_periods=10):
+        """Lag in years (or months) at which inflation correlates most with money growth, for every location"""
+        df = self.monthly_df if monthly else self.annual_df
+        corr_df = xcorr.lead_lag_corr(df, self.money_col(), "c_cpi", max_lag, min_periods)
+        return xcorr.best_lag(corr_df.loc[:, 0:])
+
+    @trace.traced
+    def episodes_df(self, threshold=None, quantile=None, monthly=False, cpi=True, min_duration=1, lookback=3):
+        """Episodes of high inflation, or of high money growth if not `cpi`, for every location.
+
+        See `episodes.find_episodes`; the mean money growth over the `lookback` years (or
+        months) before each episode is included.
+        """
+        df = self.monthly_df if monthly else self.annual_df
+        col = "c_cpi" if cpi else self.money_col()
+        return episodes.find_episodes(df, col, threshold, quantile, min_duration, self.money_col(), lookback)
+
+    @trace.traced
     def quantile_ts_fig(self, threshold_frac, num_q=20, num_y=6, pp_df=None):
         if pp_df is None:
             pp_df = self.quantile_ts_df(num_q, num_y)
@@ -347,24 +628,169 @@ class Data:
         threshold = (1 - threshold_frac) * max_pct - 1
         tdf = pp_df.reset_index()
         pp_summary_df = quantile_ts_summary_df(pp_df, threshold)
-        pp_summary_ser = pp_summary_df.groupby("LOCATION").mean()['percentage'].sort_values(ascending=False)
+        pp_summary_ser = pp_summary_df.groupby("LOCATION")["percentage"].mean().sort_values(ascending=False)
         col_order = pp_summary_ser.index
         # top_label = f"top {threshold_frac*100:.0f}% year"
         top_label = None
-        g = sns.FacetGrid(tdf, col="LOCATION", col_wrap=4, col_order=col_order, height=3, aspect=1.2)
-        g.map_dataframe(facet_quantile_ts_plot, "Years Out", "Inflation Rank", df=pp_df, alpha=0.2, 
-                        highlight_alpha=0.3, num_q=num_q,
-                        threshold=threshold, top_label=top_label)
+        with trace.stage("oecd.facets", len(tdf)):
+            g = sns.FacetGrid(tdf, col="LOCATION", col_wrap=4, col_order=col_order, height=3, aspect=1.2)
+            g.map_dataframe(facet_quantile_ts_plot, "Years Out", "Inflation Rank", df=Panel.from_frame(pp_df), alpha=0.2, 
+                            highlight_alpha=0.3, num_q=num_q,
+                            threshold=threshold, top_label=top_label)
         for l in tdf['LOCATION'].values:
             ax = g.axes_dict.get(l)
             if ax is None:
                 continue
-            label_base = facet_ts_plot_label(self.annual_df, l)
+            label_base = facet_ts_plot_label(self.annual_panel, l)
             title = f"{label_base} | {pp_summary_ser.loc[l]*100:.0f}%"
             ax.set_title(title)
         viz.cite_source(g.axes[-1], "OECD", (1, 0), (-2, -40))
     
 
+@trace.traced
+def combine_aggregates(dfs):
+    """Align frames of money and CPI, e.g. one per aggregate, on the union of their rows.
+
+    The CPI and c_cpi columns, which are the same in every frame, are kept only once.
+    Raises a ValueError if they differ on a row the frames share.
+    """
+    cpi_cols = ["CPI", "c_cpi"]
+    index = dfs[0].index
+    for df in dfs[1:]:
+        index = index.union(df.index)
+    cpi = None
+    money = []
+    for df in dfs:
+        if cpi is None:
+            cpi = df[cpi_cols]
+        else:
+            common = cpi.index.intersection(df.index)
+            old, new = cpi.loc[common].values, df.loc[common, cpi_cols].values
+            present = ~(np.isnan(old) | np.isnan(new))
+            if not np.array_equal(old[present], new[present]):
+                raise ValueError("The CPI columns of the frames differ on the rows they share")
+            cpi = cpi.combine_first(df[cpi_cols])
+        money.append(df.drop(columns=cpi_cols).reindex(index))
+    return pd.concat([cpi.reindex(index)] + money, axis=1)
+
+
+def aggregate_columns(monetary_aggregate):
+    ma = monetary_aggregate
+    return [ma, "CPI", f"c_{ma.lower()}", "c_cpi"]
+
+
+def aggregate_frame(df, monetary_aggregate):
+    """The rows and columns of one aggregate in a frame from `combine_aggregates`"""
+    cols = aggregate_columns(monetary_aggregate)
+    return df.loc[df[cols].notna().all(axis=1).values, cols]
+
+
+def aggregate_panel(combined_panel, monetary_aggregate):
+    """The rows and columns of one aggregate in the Panel of a frame from `combine_aggregates`.
+
+    Unlike `aggregate_frame`, nothing is copied: the panels of all aggregates share the
+    arrays of the combined panel, and so its single CPI and c_cpi columns.
+    """
+    view = combined_panel.select_columns(aggregate_columns(monetary_aggregate))
+    return view.where(view.notna())
+
+
+class AggregateData(Data):
+    # Views of the panels of the MultiData, which the frames are built from
+    annual_store = LazyFrame(None)
+    monthly_store = LazyFrame(None)
+    annual_df_full = LazyFrame(None, derived_from="annual_store")  # include the US 2020 data
+    monthly_df_full = LazyFrame(None, derived_from="monthly_store")  # include May 2020 for the US
+
+    def __init__(self, multi_data, monetary_aggregate):
+        """View of one aggregate of a MultiData, with the methods of Data.
+
+        The panels of the view share the arrays of the MultiData. Its frames are built from
+        them directly, so annual_df_full and monthly_df_full are only copied when used.
+        """
+        super().__init__(multi_data.folder_path, monetary_aggregate, multi_data.cache_dir, multi_data.compact)
+        self.multi_data = multi_data
+
+    def _build_annual_store(self):
+        return aggregate_panel(self.multi_data.annual_panel_full, self.monetary_aggregate)
+
+    def _build_monthly_store(self):
+        return aggregate_panel(self.multi_data.monthly_panel_full, self.monetary_aggregate)
+
+    def _build_annual_df_full(self):
+        return self.annual_store.to_frame()
+
+    def _build_monthly_df_full(self):
+        return self.monthly_store.to_frame()
+
+    def _build_annual_df(self):
+        if self.assigned("annual_df_full"):
+            return super()._build_annual_df()
+        return self.annual_panel.to_frame()
+
+    def _build_monthly_df(self):
+        if self.assigned("monthly_df_full"):
+            return super()._build_monthly_df()
+        return self.monthly_panel.to_frame()
+
+    def _panel(self, name, store_name, usa_period):
+        # The MultiData panels have the dtype of its frames, so they are used even if compact
+        if self.assigned(name):
+            return Panel.from_frame(getattr(self, name))
+        store = getattr(self, store_name)
+        return store.where(~excluded_rows(store.row_index(), usa_period))
+
+
+class MultiData(LazyFrames):
+    # Array-backed aggregates, aligned with combine_aggregates, which the views share
+    annual_panel_full = LazyFrame("annual_paths")
+    monthly_panel_full = LazyFrame("monthly_paths")
+
+    # The frame of the views that is built from each panel
+    view_frames = {"annual_panel_full": "annual_store", "monthly_panel_full": "monthly_store"}
+
+    def __init__(self, folder_path, monetary_aggregates=("M1", "M3"), cache_dir=None, compact=False):
+        """Several monetary aggregates, aligned on a common (LOCATION, TIME) index with one CPI column.
+
+        `data[ma]` is a view of aggregate ma that works like `Data(folder_path, ma)`.
+        """
+        self.folder_path = folder_path
+        self.monetary_aggregates = list(monetary_aggregates)
+        self.cache_dir = cache_dir
+        self.compact = compact
+        mas = [ma.lower() for ma in self.monetary_aggregates]
+        self.annual_paths = [data_path(folder_path, f"{ma}-cpi_a") for ma in mas]
+        self.monthly_paths = [data_path(folder_path, f"{ma}-cpi_m") for ma in mas]
+        self.views = {}
+
+    def _load_frame(self, name, paths):
+        with trace.stage(f"oecd.MultiData.load {name}") as stage:
+            df = self._load_or_build(name, paths)
+            stage.add_rows(trace.row_count(df))
+        return df
+
+    def _load_or_build(self, name, paths):
+        # The combined frame is what is cached, but only its panel is kept
+        build = lambda: combine_aggregates([read_data(path, self.compact) for path in paths])
+        if self.cache_dir is None or any(panel.is_store(path) for path in paths):
+            return Panel.from_frame(build())
+        key = "-".join(ma.lower() for ma in self.monetary_aggregates) + f"-{name}" + ("-compact" if self.compact else "")
+        return Panel.from_frame(FrameCache(self.cache_dir).load(key, paths, lambda: {name: build()})[name])
+
+    def __getitem__(self, monetary_aggregate):
+        if monetary_aggregate not in self.monetary_aggregates:
+            raise KeyError(monetary_aggregate)
+        if monetary_aggregate not in self.views:
+            self.views[monetary_aggregate] = AggregateData(self, monetary_aggregate)
+        return self.views[monetary_aggregate]
+
+    def invalidate(self, *names):
+        super().invalidate(*names)
+        stale = {self.view_frames[name] for name in names or LazyFrame.names(MultiData)}
+        for view in self.views.values():
+            view.invalidate(*stale)
+
+
 # Triage -- not sure we need this stuff
     
 def clipped_monthly_df(df_a, df_m):
@@ -376,12 +802,14 @@ def clipped_monthly_df(df_a, df_m):
     return clipped_df
 
 
+@trace.traced
 def ts_am_scatterplot(ax, df_a, df_m, col, m_offset, color, label, frac):
-    ax.scatter(df_a.index, df_a[col], alpha=0.7, s=30, color=color, label=label)
+    viz.decimated_scatter(ax, df_a.index, df_a[col], alpha=0.7, s=30, color=color, label=label)
     x_loc = pd.to_datetime(df_m.index.year, format="%Y")
-    ax.scatter(x_loc, df_m[col], alpha=0.05, s=15, color=color)
-    smoothed = lowess(df_m[col], df_m.index, frac=frac, return_sorted=False)
-    ax.plot(df_m.index, smoothed, alpha=0.7, lw=3, color=color)
+    # The monthly points are dense, so vector output embeds them as an image
+    viz.decimated_scatter(ax, x_loc, df_m[col], alpha=0.05, s=15, color=color, rasterized=True)
+    smoothed = smooth.lowess(df_m[col], df_m.index, frac=frac)
+    viz.decimated_plot(ax, df_m.index, smoothed, alpha=0.7, lw=3, color=color)
 
 
 def ts_am_plot(ax, df_a, df_m, loc, start_date, marker_date, money="M1"):
@@ -417,16 +845,18 @@ def facet_ts_am_plot(money, ycol, color, **kwargs):
     ts_am_plot(ax, df_a, df_m, loc, start_date, marker_date, money)
         
         
+@trace.traced
 def ts_am_fig(self, marker_date, sharey=False):
     tdf = self.annual_df.reset_index()
-    g = sns.FacetGrid(tdf, col="LOCATION", col_wrap=3, col_order=self.annual_reg_df.index, sharey=sharey, aspect=1.5)
-    start_date = tdf['TIME'].min()
-    g.map_dataframe(facet_ts_am_plot, "M1", "CPI", 
-                    df_a=self.annual_df, df_m=self.monthly_df, 
-                    start_date=start_date, marker_date=marker_date)
+    with trace.stage("oecd.facets", len(tdf)):
+        g = sns.FacetGrid(tdf, col="LOCATION", col_wrap=3, col_order=self.annual_reg_df.index, sharey=sharey, aspect=1.5)
+        start_date = tdf['TIME'].min()
+        g.map_dataframe(facet_ts_am_plot, "M1", "CPI", 
+                        df_a=self.annual_panel, df_m=self.monthly_panel, 
+                        start_date=start_date, marker_date=marker_date)
     for l in tdf['LOCATION'].values:
         ax = g.axes_dict[l]
-        ax.set_title(facet_ts_plot_label(self.annual_df, l))
+        ax.set_title(facet_ts_plot_label(self.annual_panel, l))
     g.axes[2].legend()
 
 
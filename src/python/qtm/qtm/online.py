@@ -0,0 +1,220 @@
+"""
+  Module for updating the growth rates and regressions as new observations arrive
+
+  An `OnlineMoneyCpi` holds, for every location, the money and CPI levels, their growth
+  rates as computed by `preprocess.money_cpi_df`, and the sufficient statistics of the
+  regression of c_cpi on money growth. New or revised observations only recompute the
+  growth rates from the first period they change, and the statistics are updated by
+  removing the rows that were replaced and adding the new ones, so an update costs about
+  as much as the rows it touches rather than a rebuild of the whole panel:
+
+    online = OnlineMoneyCpi.from_series(m1_m_ser, cpi_m_ser, "m1", "M")
+    online.append(new_rows)
+    m_df, reg_df = online.frame(), online.reg_df()
+"""
+import numpy as np
+import pandas as pd
+
+from . import trace
+from .preprocess import annualized, rank_reg_df
+from .regression import ols_from_stats, sufficient_stats
+
+STAT_NAMES = ["n", "x_mean", "y_mean", "sxx", "syy", "sxy"]
+
+
+def empty_stats():
+    return {name: 0.0 for name in STAT_NAMES}
+
+
+def array_stats(x, y):
+    """Sufficient statistics of y ~ x over the rows where both are present, as a dict of floats"""
+    stats = sufficient_stats(x, y, np.zeros(len(x), dtype=np.int64), 1)
+    if stats["n"][0] == 0:
+        return empty_stats()
+    return {name: float(stats[name][0]) for name in STAT_NAMES}
+
+
+def merge_stats(a, b):
+    """Statistics of the rows of both a and b, from the statistics of each"""
+    if b["n"] == 0:
+        return dict(a)
+    if a["n"] == 0:
+        return dict(b)
+    n = a["n"] + b["n"]
+    dx = b["x_mean"] - a["x_mean"]
+    dy = b["y_mean"] - a["y_mean"]
+    weight = a["n"] * b["n"] / n
+    return {
+        "n": n,
+        "x_mean": a["x_mean"] + dx * b["n"] / n,
+        "y_mean": a["y_mean"] + dy * b["n"] / n,
+        "sxx": a["sxx"] + b["sxx"] + dx * dx * weight,
+        "syy": a["syy"] + b["syy"] + dy * dy * weight,
+        "sxy": a["sxy"] + b["sxy"] + dx * dy * weight
+    }
+
+
+def remove_stats(a, b):
+    """Statistics of the rows of a less those of b, which must be among them; the inverse of `merge_stats`"""
+    if b["n"] == 0:
+        return dict(a)
+    n = a["n"] - b["n"]
+    if n <= 0:
+        return empty_stats()
+    x_mean = (a["n"] * a["x_mean"] - b["n"] * b["x_mean"]) / n
+    y_mean = (a["n"] * a["y_mean"] - b["n"] * b["y_mean"]) / n
+    dx = b["x_mean"] - x_mean
+    dy = b["y_mean"] - y_mean
+    weight = n * b["n"] / a["n"]
+    return {
+        "n": n,
+        "x_mean": x_mean,
+        "y_mean": y_mean,
+        "sxx": max(a["sxx"] - b["sxx"] - dx * dx * weight, 0.0),
+        "syy": max(a["syy"] - b["syy"] - dy * dy * weight, 0.0),
+        "sxy": a["sxy"] - b["sxy"] - dx * dy * weight
+    }
+
+
+def growth_rates(levels, freq):
+    """Growth rates of every row of levels from the previous one, annualized as in `preprocess.money_cpi_df`"""
+    rates = np.full(levels.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rates[1:] = 100 * (levels[1:] - levels[:-1]) / levels[:-1]
+        return annualized(rates, freq)
+
+
+def _valid(levels, growth):
+    """The rows `money_cpi_df` keeps, which have both levels and both growth rates"""
+    return ~(np.isnan(levels).any(axis=1) | np.isnan(growth).any(axis=1))
+
+
+def _rows_stats(levels, growth):
+    valid = _valid(levels, growth)
+    return array_stats(growth[valid, 0], growth[valid, 1])
+
+
+def _location_slices(df):
+    """Location, TIME values and row values of every location of a (LOCATION, TIME) frame, in order of TIME"""
+    codes, locations = pd.factorize(df.index.get_level_values(0), sort=True)
+    times = df.index.get_level_values(1).values
+    # e.g. an outer concat of the money and CPI series may leave rows out of order
+    order = np.lexsort((times, codes))
+    starts = np.searchsorted(codes[order], np.arange(len(locations) + 1))
+    times = times[order]
+    values = np.asarray(df.values, dtype=float)[order]
+    for i, lctn in enumerate(locations):
+        yield lctn, times[starts[i]:starts[i + 1]], values[starts[i]:starts[i + 1]]
+
+
+class OnlineMoneyCpi:
+    def __init__(self, levels_df, col, freq, growth_df=None):
+        """Growth rates and regressions of one aggregate and frequency that can be updated.
+
+        `levels_df` holds the money and CPI levels indexed by (LOCATION, TIME), in any
+        order. The growth rates are computed from them unless given as `growth_df`, with
+        the same index. Use `from_series` or `from_frame` rather than building them by
+        hand.
+        """
+        self.col = col
+        self.freq = freq
+        self.xcol = f"c_{col}"
+        self.columns = list(levels_df.columns)
+        self.times = {}
+        self.levels = {}
+        self.growth = {}
+        self.stats = {}
+        if growth_df is None:
+            for lctn, times, levels in _location_slices(levels_df):
+                self._set_location(lctn, times, levels, growth_rates(levels, freq))
+        else:
+            for (lctn, times, levels), (_, _, growth) in zip(_location_slices(levels_df),
+                                                             _location_slices(growth_df)):
+                self._set_location(lctn, times, levels, growth)
+
+    @classmethod
+    def from_series(cls, m_ser, cpi_ser, col, freq):
+        """From the raw money and CPI series, as passed to `preprocess.money_cpi_df`"""
+        return cls(pd.concat([m_ser, cpi_ser], axis=1).sort_index(), col, freq)
+
+    @classmethod
+    def from_frame(cls, m_df, col, freq):
+        """From a growth rate frame, e.g. a preprocessed file.
+
+        Its levels stand in for the raw series, so the observations it left out for lack
+        of a growth rate count as missing.
+        """
+        growth_cols = [f"c_{col}", "c_cpi"]
+        return cls(m_df.drop(columns=growth_cols), col, freq, m_df[growth_cols])
+
+    def _set_location(self, lctn, times, levels, growth):
+        self.times[lctn] = times
+        self.levels[lctn] = levels
+        self.growth[lctn] = growth
+        self.stats[lctn] = _rows_stats(levels, growth)
+
+    def _update_location(self, lctn, new_times, new_levels):
+        times = self.times.get(lctn)
+        if times is None:
+            self._set_location(lctn, new_times, new_levels, growth_rates(new_levels, self.freq))
+            return
+        levels, growth = self.levels[lctn], self.growth[lctn]
+        # The rows before pos are unchanged, and so are their growth rates
+        pos = int(np.searchsorted(times, new_times[0]))
+        stats = remove_stats(self.stats[lctn], _rows_stats(levels[pos:], growth[pos:]))
+        if pos == len(times):
+            times = np.concatenate([times, new_times])
+            levels = np.concatenate([levels, new_levels])
+        else:
+            merged_times = np.union1d(times, new_times)
+            merged = np.full((len(merged_times), levels.shape[1]), np.nan)
+            merged[np.searchsorted(merged_times, times)] = levels
+            at = np.searchsorted(merged_times, new_times)
+            # A missing value keeps the current observation
+            merged[at] = np.where(np.isnan(new_levels), merged[at], new_levels)
+            times, levels = merged_times, merged
+        start = max(pos - 1, 0)
+        tail_growth = growth_rates(levels[start:], self.freq)[pos - start:]
+        self.times[lctn] = times
+        self.levels[lctn] = levels
+        self.growth[lctn] = np.concatenate([growth[:pos], tail_growth])
+        self.stats[lctn] = merge_stats(stats, _rows_stats(levels[pos:], tail_growth))
+
+    @trace.traced
+    def append(self, rows):
+        """Add or revise observations, given as a frame indexed by (LOCATION, TIME) with the money and CPI columns.
+
+        A missing value leaves the current observation, if any, as it is, so one series
+        can be added before the other. Returns the locations that were updated.
+        """
+        # Rows for the same period are combined, the last value of each column winning
+        rows = rows.reindex(columns=self.columns).groupby(level=[0, 1]).last()
+        locations = []
+        for lctn, times, levels in _location_slices(rows):
+            self._update_location(lctn, times, levels)
+            locations.append(lctn)
+        return locations
+
+    def frame(self):
+        """The growth rates of all locations, as `preprocess.money_cpi_df` computes them"""
+        locations = sorted(self.times)
+        valid = [_valid(self.levels[lctn], self.growth[lctn]) for lctn in locations]
+        index = pd.MultiIndex.from_arrays([
+            np.repeat(np.array(locations, dtype=object), [v.sum() for v in valid]),
+            np.concatenate([self.times[lctn][v] for lctn, v in zip(locations, valid)])
+        ], names=["LOCATION", "TIME"])
+        values = np.concatenate([np.hstack([self.levels[lctn], self.growth[lctn]])[v]
+                                 for lctn, v in zip(locations, valid)])
+        return pd.DataFrame(values, index=index, columns=self.columns + [self.xcol, "c_cpi"])
+
+    def regs(self):
+        """r2 and slope of c_cpi ~ c_<col> for every location, as `preprocess.money_cpi_regs` computes them"""
+        locations = sorted(self.stats)
+        stats = {name: np.array([self.stats[lctn][name] for lctn in locations]) for name in STAT_NAMES}
+        fit = ols_from_stats(stats)
+        reg_df = pd.DataFrame({"r2": fit["r2"], "slope": fit["slope"]}, index=pd.Index(locations, name="LOCATION"))
+        return reg_df[fit["n"] > 0]
+
+    def reg_df(self):
+        """The regressions ranked into r2 quartiles, which only takes a sort of the locations"""
+        return rank_reg_df(self.regs())
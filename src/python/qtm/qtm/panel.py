@@ -0,0 +1,282 @@
+"""
+  Module for an array-backed panel of per-location time series
+
+  A panel indexed by (LOCATION, TIME) can be saved as a directory containing
+
+    meta.json   locations, their row offsets, column names and the number of rows
+    time.i8     the TIME of every row, as little-endian int64 nanoseconds
+    values.f8   the columns one after the other, as little-endian float64
+
+  which is opened with `numpy.memmap`, so processes reading the same store share the
+  page cache and only read the rows of the locations they use. Panels selected from a
+  store keep using its mapped arrays, and are pickled as the path of the store, so
+  worker processes map it again rather than receive a copy of its contents.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from . import frames
+
+STORE_FORMAT_VERSION = 1
+STORE_SUFFIX = ".panel"
+
+
+class _LocIndexer:
+    def __init__(self, panel):
+        self.panel = panel
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            loc, cols = key
+            return self.panel.frame(loc, cols)
+        return self.panel.frame(key)
+
+
+class Panel:
+    def __init__(self, locations, offsets, index, values, columns, level="LOCATION", rows=None, path=None,
+                 column_positions=None):
+        """A (LOCATION, ...) indexed panel stored as contiguous arrays.
+
+        The rows of each location are contiguous, between `offsets[i]` and `offsets[i + 1]`,
+        and `index` holds the remaining index levels of all rows. `values` is a float
+        array of shape (number of columns, number of rows), so each column is contiguous.
+        The frames returned for a location are views of these arrays, not copies.
+
+        With `rows`, the panel only uses some of the rows of `index` and `values`, at
+        the positions it holds, and the offsets are into `rows`; this is how `select` and
+        `where` share the arrays of a panel. Likewise, with `column_positions`, the columns
+        are those rows of `values`, as for `select_columns`. `path` is the store the arrays
+        are mapped from.
+        """
+        self.locations = pd.Index(locations, name=level)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.index = index
+        self.values = values
+        self.columns = pd.Index(columns)
+        self.level = level
+        self.rows = None if rows is None else np.asarray(rows, dtype=np.int64)
+        self.path = path
+        self.column_positions = None if column_positions is None else np.asarray(column_positions, dtype=np.int64)
+        self._bounds = {loc: (self.offsets[i], self.offsets[i + 1]) for i, loc in enumerate(self.locations)}
+        positions = range(len(self.columns)) if column_positions is None else self.column_positions
+        self._column_pos = {col: int(pos) for col, pos in zip(self.columns, positions)}
+        self.loc = _LocIndexer(self)
+
+    def __reduce__(self):
+        if self.path is None:
+            return super().__reduce__()
+        # Map the store again rather than pickle its contents
+        return _open_selection, (self.path, list(self.locations), self.offsets, self.rows, list(self.columns),
+                                 self.column_positions)
+
+    def _positions(self, start=0, end=None):
+        """Positions in the arrays of the rows from start to end, as a slice if they are contiguous"""
+        end = len(self) if end is None else end
+        if self.rows is None:
+            return slice(start, end)
+        rows = self.rows[start:end]
+        if len(rows) == 0:
+            return slice(0, 0)
+        if rows[-1] - rows[0] == len(rows) - 1:
+            return slice(rows[0], rows[-1] + 1)
+        return rows
+
+    def _take(self, positions, rows):
+        """Values of the columns at `positions` (all if None) for rows from `_positions`"""
+        if positions is None:
+            return self.values[:, rows]
+        if isinstance(rows, np.ndarray):
+            return self.values[np.ix_(positions, rows)]
+        return self.values[positions, rows]
+
+    def _array_rows(self, start=0, end=None):
+        """Positions in the arrays of the rows from start to end, as an array"""
+        end = len(self) if end is None else end
+        return np.arange(start, end) if self.rows is None else self.rows[start:end]
+
+    @classmethod
+    def from_frame(cls, df, level="LOCATION"):
+        """Panel of a frame indexed by `level` and other levels, e.g. (LOCATION, TIME).
+
+        Rows are grouped by location and sorted by the other levels within each location,
+        so the series of a location are in time order. Rows with equal index keep their order.
+        """
+        codes, locations = pd.factorize(df.index.get_level_values(level), sort=True)
+        times, _ = pd.factorize(df.index.droplevel(level), sort=True)
+        order = np.lexsort((times, codes))
+        if not np.array_equal(order, np.arange(len(order))):
+            df = df.iloc[order]
+            codes = codes[order]
+        offsets = np.searchsorted(codes, np.arange(len(locations) + 1))
+        index = df.index.droplevel(level)
+        # Keep float32 columns, e.g. of compact frames, as float32
+        dtypes = [np.dtype(dtype) if not isinstance(dtype, pd.CategoricalDtype) else np.dtype(object)
+                  for dtype in df.dtypes]
+        all_float32 = len(dtypes) > 0 and all(dtype == np.float32 for dtype in dtypes)
+        values = np.ascontiguousarray(df.values.T, dtype=np.float32 if all_float32 else float)
+        return cls(locations, offsets, index, values, df.columns, level)
+
+    def row_index(self):
+        """The index of the rows, with the location level first, as of `to_frame`"""
+        locs = np.repeat(self.locations.values, np.diff(self.offsets))
+        index = self.index[self._positions()]
+        if isinstance(index, pd.MultiIndex):
+            levels = [locs] + [index.get_level_values(i) for i in range(index.nlevels)]
+            names = [self.level] + list(index.names)
+        else:
+            levels = [locs, index]
+            names = [self.level, index.name]
+        return pd.MultiIndex.from_arrays(levels, names=names)
+
+    def to_frame(self):
+        """The panel as a frame, in the layout it was created from. Its values are a copy."""
+        values = self._take(self.column_positions, self._positions())
+        return pd.DataFrame(values.T, index=self.row_index(), columns=self.columns)
+
+    def __len__(self):
+        return len(self.index) if self.rows is None else len(self.rows)
+
+    def __contains__(self, loc):
+        return loc in self._bounds
+
+    @property
+    def shape(self):
+        """Number of rows and columns, as of the frame of the panel"""
+        return len(self), len(self.columns)
+
+    def memory_usage(self):
+        """Bytes used by the arrays and index of the panel, not counting memory-mapped values.
+
+        The index and locations are measured with `frames.index_memory_usage`.
+        """
+        values_bytes = 0 if isinstance(self.values, np.memmap) else self.values.nbytes
+        rows_bytes = 0 if self.rows is None else self.rows.nbytes
+        return (values_bytes + rows_bytes + self.offsets.nbytes + frames.index_memory_usage(self.index)
+                + frames.index_memory_usage(self.locations))
+
+    def bounds(self, loc):
+        """Start and end row of `loc`"""
+        try:
+            return self._bounds[loc]
+        except (KeyError, TypeError):
+            raise KeyError(loc) from None
+
+    def column(self, loc, col):
+        """The values of `col` for `loc`, a view unless the panel skips some of its rows"""
+        start, end = self.bounds(loc)
+        return self.values[self._column_pos[col], self._positions(start, end)]
+
+    def _with_rows(self, locations, sizes, rows):
+        offsets = np.r_[0, np.cumsum(sizes, dtype=np.int64)]
+        if len(rows) == len(self.index) and np.array_equal(rows, np.arange(len(rows))):
+            rows = None
+        return Panel(locations, offsets, self.index, self.values, self.columns, self.level, rows, self.path,
+                     self.column_positions)
+
+    def select(self, locations):
+        """Panel of only `locations`, in that order, which shares the arrays of this one"""
+        bounds = [self.bounds(loc) for loc in locations]
+        sizes = [end - start for start, end in bounds]
+        rows = np.concatenate([self._array_rows(start, end) for start, end in bounds] + [np.zeros(0, dtype=np.int64)])
+        return self._with_rows(locations, sizes, rows)
+
+    def where(self, mask):
+        """Panel of the rows where `mask`, in the order of `row_index`, is true, which shares the arrays of this one.
+
+        Locations left without rows are dropped.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        kept = np.r_[0, np.cumsum(mask)][self.offsets]
+        sizes = np.diff(kept)
+        return self._with_rows(self.locations[sizes > 0], sizes[sizes > 0], self._array_rows()[mask])
+
+    def select_columns(self, cols):
+        """Panel of only `cols`, in that order, which shares the arrays of this one"""
+        return Panel(self.locations, self.offsets, self.index, self.values, cols, self.level, self.rows, self.path,
+                     [self._column_pos[col] for col in cols])
+
+    def notna(self, cols=None):
+        """Mask of the rows, in the order of `row_index`, where none of `cols` (by default all) is missing"""
+        mask = np.ones(len(self), dtype=bool)
+        rows = self._positions()
+        for col in self.columns if cols is None else cols:
+            mask &= ~np.isnan(self.values[self._column_pos[col], rows])
+        return mask
+
+    def frame(self, loc, cols=None):
+        """The rows of `loc` as a frame indexed by the remaining levels, like `df.loc[loc]`.
+
+        Without `cols` (or with `:`), the frame is a view of the panel's arrays, unless the
+        panel skips some of their rows or columns.
+        """
+        start, end = self.bounds(loc)
+        rows = self._positions(start, end)
+        if cols is None or (isinstance(cols, slice) and cols == slice(None)):
+            values = self._take(self.column_positions, rows)
+            columns = self.columns
+        else:
+            values = self._take([self._column_pos[col] for col in cols], rows)
+            columns = pd.Index(cols)
+        return pd.DataFrame(values.T, index=self.index[rows], columns=columns, copy=False)
+
+    def save(self, path):
+        """Write the panel as a store directory at path"""
+        if not isinstance(self.index, pd.DatetimeIndex):
+            raise ValueError("Only panels indexed by location and time can be saved")
+        os.makedirs(path, exist_ok=True)
+        rows = self._positions()
+        _write_array(os.path.join(path, "time.i8"), self.index[rows].values.view(np.int64).astype("<i8"))
+        _write_array(os.path.join(path, "values.f8"), self._take(self.column_positions, rows).astype("<f8"))
+        meta = {
+            "format": STORE_FORMAT_VERSION,
+            "level": self.level,
+            "index_name": self.index.name,
+            "locations": [str(loc) for loc in self.locations],
+            "offsets": self.offsets.tolist(),
+            "columns": [str(col) for col in self.columns],
+            "rows": len(self)
+        }
+        # The metadata is written last, so a store is only complete once it is in place
+        tmp_path = os.path.join(path, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def open(cls, path, mode="r"):
+        """Open the store at path, with its arrays memory-mapped"""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported panel store format {meta.get('format')} in {path}")
+        rows = meta["rows"]
+        columns = meta["columns"]
+        times = _open_array(os.path.join(path, "time.i8"), "<i8", (rows,), mode)
+        values = _open_array(os.path.join(path, "values.f8"), "<f8", (len(columns), rows), mode)
+        index = pd.DatetimeIndex(times.view("datetime64[ns]"), name=meta["index_name"])
+        return cls(meta["locations"], meta["offsets"], index, values, columns, meta["level"], path=path)
+
+
+def _open_selection(path, locations, offsets, rows, columns, column_positions):
+    store = Panel.open(path)
+    return Panel(locations, offsets, store.index, store.values, columns, store.level, rows, path, column_positions)
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def _write_array(path, values):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    np.ascontiguousarray(values).tofile(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _open_array(path, dtype, shape, mode):
+    if shape[-1] == 0:
+        # Empty files cannot be mapped
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode=mode, shape=shape)
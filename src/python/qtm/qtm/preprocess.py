@@ -0,0 +1,128 @@
+"""
+  Module for computing the growth rate and regression files from the raw OECD data
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from ._lazy import lazy_import
+smf = lazy_import("statsmodels.formula.api")
+
+from . import calc
+from .bootstrap import bootstrap_ci
+from .regression import grouped_ols
+
+# Columns of the raw OECD extracts. Only the ones needed are read, with fixed dtypes so
+# pandas does not need to infer them, and the small-vocabulary ones as categoricals.
+oecd_dtypes = {
+    "LOCATION": "category",
+    "INDICATOR": "category",
+    "SUBJECT": "category",
+    "MEASURE": "category",
+    "FREQUENCY": "category",
+    "TIME": str,
+    "Value": np.float64
+}
+oecd_columns = ["LOCATION", "FREQUENCY", "TIME", "Value"]
+
+
+def read_df(path, filters=None, chunksize=500_000):
+    """Stream the raw OECD csv at path, keeping only the rows that match filters.
+
+    filters maps a column to the value (or list of values) it must have. The
+    predicates are applied to each chunk as it is read, and TIME is only parsed
+    for the rows that survive.
+    """
+    filters = filters or {}
+    usecols = oecd_columns + [col for col in filters if col not in oecd_columns]
+    dtypes = {col: oecd_dtypes[col] for col in usecols}
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize):
+        mask = np.ones(len(chunk), dtype=bool)
+        for col, value in filters.items():
+            mask &= chunk[col].isin(value if isinstance(value, (list, tuple, set)) else [value]).values
+        chunks.append(chunk.loc[mask, oecd_columns])
+    df = pd.concat(chunks, ignore_index=True)
+    for col in ["LOCATION", "FREQUENCY"]:
+        df[col] = df[col].astype(str).astype("category")
+    df['TIME'] = pd.to_datetime(df['TIME'])
+    return df
+
+
+def df_to_ser(df, name, freq):
+    tdf = df[df['FREQUENCY'] == freq].astype({"LOCATION": str}).set_index(["LOCATION", "TIME"])
+    tdf = tdf.sort_index()
+    ser = tdf['Value']
+    ser.name = name
+    return ser
+
+
+def read_ser(path, name, freq):
+    df = read_df(path, {"FREQUENCY": freq})
+    return df_to_ser(df, name, freq)
+
+
+# Periods per year of the frequencies whose growth rates are annualized
+periods_per_year = {"M": 12, "Q": 4}
+
+
+def annualized(rate, freq):
+    """Period growth rates in percent, as yearly rates"""
+    periods = periods_per_year.get(freq)
+    return rate if periods is None else calc.pct_rate_to_yearly(rate, periods)
+
+
+def money_cpi_df(m_ser, cpi_ser, col, freq):
+    # The outer join can leave the rows missing from one series out of order
+    m_df = pd.concat([m_ser, cpi_ser], axis=1).sort_index()
+    # Growth rates are computed within each location, so a location's result only depends on its own series
+    m_grouped = m_df.groupby(level=0)
+    diff_m_df = 100 * m_grouped.diff() / m_grouped.shift(1)
+    diff_m_df.columns = [f"c_{col}", "c_cpi"]
+    diff_m_df = annualized(diff_m_df, freq)
+    m_df = m_df.join(diff_m_df).dropna()
+    return m_df
+
+
+def ols(df, x_col, y_col):
+    """Full statsmodels fit, for when a complete summary of one regression is needed"""
+    lm = smf.ols(formula=f"{y_col} ~ {x_col}", data=df).fit()
+    return lm
+
+
+def money_cpi_regs(m_df, col, num_resamples=0, block_size=None, seed=0):
+    """r2 and slope of c_cpi ~ col for every location.
+
+    With `num_resamples`, the 95% bootstrap intervals of both are added as r2_lo, r2_hi,
+    slope_lo and slope_hi, resampling blocks of `block_size` rows if given (see
+    `bootstrap.bootstrap_ols`).
+    """
+    reg_df = grouped_ols(m_df, col, 'c_cpi')
+    reg_df = reg_df[reg_df['n'] > 0]
+    reg_df = reg_df[["r2", "slope"]]
+    if num_resamples:
+        ci_df = bootstrap_ci(m_df, col, 'c_cpi', num_resamples=num_resamples, block_size=block_size, seed=seed)
+        reg_df = reg_df.join(ci_df[["r2_lo", "r2_hi", "slope_lo", "slope_hi"]])
+    return reg_df
+
+
+def money_cpi_reg_df(m_df, col, num_resamples=0, block_size=None, seed=0):
+    return rank_reg_df(money_cpi_regs(m_df, col, num_resamples, block_size, seed))
+
+
+def rank_reg_df(reg_df):
+    reg_df = reg_df.sort_values("r2", ascending=False)
+    reg_df["r2cat"] = pd.qcut(reg_df['r2'], 4, False)
+    return reg_df
+
+
+def series_hashes(m_ser, cpi_ser):
+    """Content hash of the input series of each location"""
+    df = pd.concat([m_ser, cpi_ser], axis=1)
+    row_hashes = pd.util.hash_pandas_object(df, index=True)
+    return {lctn: hashlib.sha1(h.values.tobytes()).hexdigest() for lctn, h in row_hashes.groupby(level=0)}
+
+
+def select_locations(df, locations):
+    return df[df.index.get_level_values(0).isin(locations)]
@@ -0,0 +1,174 @@
+"""
+  Module for fitting simple y ~ x regressions in batches
+"""
+import numpy as np
+import pandas as pd
+
+from . import trace
+
+
+def _group_codes(df, level):
+    if level is None:
+        return np.zeros(len(df), dtype=np.int64), pd.Index([None])
+    return pd.factorize(df.index.get_level_values(level), sort=True)
+
+
+def _group_sums(codes, values, num_groups):
+    return np.bincount(codes, weights=values, minlength=num_groups)
+
+
+def sufficient_stats(x, y, codes, num_groups):
+    """Count, means and centered sums of squares and cross products of x and y for each group"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y, codes = x[valid], y[valid], codes[valid]
+    n = np.bincount(codes, minlength=num_groups).astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = _group_sums(codes, x, num_groups) / n
+        y_mean = _group_sums(codes, y, num_groups) / n
+    # Center before summing products, which is much more accurate than using raw sums
+    dx = x - x_mean[codes]
+    dy = y - y_mean[codes]
+    return {
+        "n": n,
+        "x_mean": x_mean,
+        "y_mean": y_mean,
+        "sxx": _group_sums(codes, dx * dx, num_groups),
+        "syy": _group_sums(codes, dy * dy, num_groups),
+        "sxy": _group_sums(codes, dx * dy, num_groups)
+    }
+
+
+def ols_from_stats(stats):
+    """Slope, intercept, r², standard errors and residual variance from sufficient statistics"""
+    n = stats["n"]
+    sxx, syy, sxy = stats["sxx"], stats["syy"], stats["sxy"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = sxy / sxx
+        intercept = stats["y_mean"] - slope * stats["x_mean"]
+        r2 = sxy * sxy / (sxx * syy)
+        sse = np.maximum(syy - slope * sxy, 0)
+        sigma2 = np.where(n > 2, sse / (n - 2), np.nan)
+        se_slope = np.sqrt(sigma2 / sxx)
+        se_intercept = np.sqrt(sigma2 * (1 / n + stats["x_mean"] ** 2 / sxx))
+    return {"n": n, "slope": slope, "intercept": intercept, "r2": r2,
+            "se_slope": se_slope, "se_intercept": se_intercept, "sigma2": sigma2}
+
+
+@trace.traced
+def grouped_ols(df, xcol, ycol, level="LOCATION"):
+    """Fit ycol ~ xcol for every group of the index `level` at once.
+
+    Rows with a missing x or y are ignored, as statsmodels does. Returns a frame
+    indexed by group with n, slope, intercept, r2, se_slope, se_intercept and sigma2.
+    Use `level=None` to fit a single regression over the whole frame.
+    """
+    codes, groups = _group_codes(df, level)
+    stats = sufficient_stats(df[xcol].values, df[ycol].values, codes, len(groups))
+    result = pd.DataFrame(ols_from_stats(stats), index=groups)
+    result.index.name = level
+    return result
+
+
+def grouped_residuals(df, fit, xcol, ycol, level="LOCATION"):
+    """Residuals of ycol for every row of df, using the per-group fit from `grouped_ols`"""
+    if level is None:
+        intercept = fit["intercept"].values[0]
+        slope = fit["slope"].values[0]
+    else:
+        groups = df.index.get_level_values(level)
+        intercept = fit["intercept"].reindex(groups).values
+        slope = fit["slope"].reindex(groups).values
+    return df[ycol] - (intercept + slope * df[xcol])
+
+
+def _windowed_ols(df, xcol, ycol, lowers, level, min_periods):
+    """Fits of ycol ~ xcol over the rows `lowers(rows, group_starts)` to row i of each group.
+
+    The windows are taken from cumulative sums of x, y and their products, so every
+    window costs a few subtractions however long it is. `lowers` returns an array of
+    shape (number of windows, number of rows). Returns the fits in the shape of
+    `ols_from_stats`, and the index of the rows, which are grouped by `level`.
+    """
+    codes, groups = _group_codes(df, level)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    x = np.asarray(df[xcol].values, dtype=float)[order]
+    y = np.asarray(df[ycol].values, dtype=float)[order]
+    valid = ~(np.isnan(x) | np.isnan(y))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n_group = np.bincount(codes, weights=valid, minlength=len(groups))
+        x_group = _group_sums(codes, np.where(valid, x, 0), len(groups)) / n_group
+        y_group = _group_sums(codes, np.where(valid, y, 0), len(groups)) / n_group
+    # Centering on the group means keeps the cumulative sums of products accurate
+    dx = np.where(valid, x - x_group[codes], 0)
+    dy = np.where(valid, y - y_group[codes], 0)
+    cums = {name: np.r_[0, np.cumsum(values)] for name, values in
+            [("n", valid.astype(float)), ("x", dx), ("y", dy), ("xx", dx * dx), ("yy", dy * dy), ("xy", dx * dy)]}
+    rows = np.arange(len(codes))
+    lower = lowers(rows, np.searchsorted(codes, codes))
+    sums = {name: cum[rows + 1] - cum[lower] for name, cum in cums.items()}
+    n = sums["n"]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = sums["x"] / n
+        y_mean = sums["y"] / n
+    stats = {
+        "n": n,
+        "x_mean": x_mean + x_group[codes],
+        "y_mean": y_mean + y_group[codes],
+        "sxx": np.maximum(sums["xx"] - n * x_mean * x_mean, 0),
+        "syy": np.maximum(sums["yy"] - n * y_mean * y_mean, 0),
+        "sxy": sums["xy"] - n * x_mean * y_mean
+    }
+    fit = ols_from_stats(stats)
+    too_short = n < min_periods
+    for name in fit:
+        if name != "n":
+            fit[name] = np.where(too_short, np.nan, fit[name])
+    return fit, df.index[order]
+
+
+def _fit_frame(fit, index, windows):
+    """Frame of fits of shape (number of windows, number of rows), with a window level if there are several"""
+    if windows is None:
+        return pd.DataFrame({name: values[0] for name, values in fit.items()}, index=index)
+    levels = [np.repeat(windows, len(index))] + [np.tile(index.get_level_values(i), len(windows))
+                                                 for i in range(index.nlevels)]
+    index = pd.MultiIndex.from_arrays(levels, names=["window"] + list(index.names))
+    return pd.DataFrame({name: values.ravel() for name, values in fit.items()}, index=index)
+
+
+@trace.traced
+def rolling_ols(df, xcol, ycol, windows, min_periods=None, level="LOCATION"):
+    """Fit ycol ~ xcol over the trailing `windows` rows of every row of a (LOCATION, TIME) panel.
+
+    `windows` is a number of rows (years or months, depending on the panel), or a list
+    of them, which are all fit in one pass. A fit needs `min_periods` rows with both x
+    and y (by default, the whole window) and is missing otherwise. Returns a frame with
+    the columns of `grouped_ols` for every row, grouped by location; for a list of
+    windows, the index has a leading `window` level.
+    """
+    single = np.isscalar(windows)
+    sizes = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    if (sizes < 1).any():
+        raise ValueError(f"Windows must be at least one row: {windows}")
+    min_periods = sizes[:, None] if min_periods is None else min_periods
+
+    def lowers(rows, group_starts):
+        return np.maximum(rows[None, :] - sizes[:, None] + 1, group_starts[None, :])
+    fit, index = _windowed_ols(df, xcol, ycol, lowers, level, min_periods)
+    return _fit_frame(fit, index, None if single else list(sizes))
+
+
+@trace.traced
+def expanding_ols(df, xcol, ycol, min_periods=3, level="LOCATION"):
+    """Fit ycol ~ xcol over all the rows of the location up to every row of a (LOCATION, TIME) panel.
+
+    The last fit of each location is that of `grouped_ols`. Returns a frame with the
+    columns of `grouped_ols` for every row, grouped by location.
+    """
+    def lowers(rows, group_starts):
+        return group_starts[None, :]
+    fit, index = _windowed_ols(df, xcol, ycol, lowers, level, min_periods)
+    return _fit_frame(fit, index, None)
@@ -0,0 +1,233 @@
+"""
+  Module for LOWESS smoothing of time series
+
+  The smoother follows the algorithm of statsmodels' `lowess` (tricube-weighted local
+  linear fits over the k nearest neighbours, with bisquare robustness iterations), but
+  evaluates the points of all series together over sorted-window matrices, in chunks of
+  rows bounded by `WINDOW_BUDGET` so memory does not grow with n * k. Results are
+  memoized by the content of the series, so re-rendering a figure does not smooth again.
+"""
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from ._lazy import lazy_import
+pd = lazy_import("pandas")
+
+from . import trace
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ns]").view(np.int64)
+    return values.astype(float)
+
+
+def _window_starts(x, starts, sizes, k, group_rank):
+    """First index of the k-nearest-neighbour window of every point, as statsmodels' lowess would pick it.
+
+    The window of x[i] moves right while x[i] > (x[left] + x[right]) / 2, so its start is the
+    number of candidate starts s with x[s] + x[s + k] < 2 x[i]. These counts are found for all
+    groups at once by sorting the candidates together with the points.
+    """
+    num_groups = len(starts)
+    num_candidates = np.maximum(sizes - k, 0)
+    candidate_group = np.repeat(np.arange(num_groups), num_candidates)
+    candidates_before = np.cumsum(num_candidates) - num_candidates
+    candidate_pos = starts[candidate_group] + np.arange(len(candidate_group)) - candidates_before[candidate_group]
+    a = x[candidate_pos] + x[candidate_pos + k[candidate_group]]
+
+    keys_group = np.concatenate([candidate_group, group_rank])
+    keys_value = np.concatenate([a, 2 * x])
+    is_candidate = np.concatenate([np.ones(len(a), dtype=np.int64), np.zeros(len(x), dtype=np.int64)])
+    # Points sort before candidates with an equal value, so only a < 2 x[i] is counted
+    order = np.lexsort((is_candidate, keys_value, keys_group))
+    candidates_seen = np.cumsum(is_candidate[order])
+    counts = np.empty(len(x), dtype=np.int64)
+    is_point = is_candidate[order] == 0
+    counts[order[is_point] - len(a)] = candidates_seen[is_point]
+    return starts[group_rank] + counts - candidates_before[group_rank]
+
+
+def _residual_weights(y, fit, starts, sizes, group_rank):
+    resid = np.abs(y - fit)
+    sorted_resid = resid[np.lexsort((resid, group_rank))]
+    median = (sorted_resid[starts + (sizes - 1) // 2] + sorted_resid[starts + sizes // 2]) / 2
+    median = median[group_rank]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std_resid = np.where(median == 0, (resid > 0).astype(float), resid / (6 * median))
+    std_resid = np.minimum(std_resid, 1)
+    return (1 - std_resid ** 2) ** 2
+
+
+def _windows(x, window_start, window_size, rows):
+    """Positions, x values and tricube weights of the windows of the points in `rows`, padded to the widest"""
+    start = window_start[rows]
+    size = window_size[rows]
+    offsets = np.arange(size.max())
+    in_window = offsets[None, :] < size[:, None]
+    idx = np.where(in_window, start[:, None] + offsets[None, :], start[:, None])
+    x_window = x[idx]
+
+    x_rows = x[rows]
+    radius = np.maximum(x_rows - x[start], x[start + size - 1] - x_rows)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dist = np.where(radius[:, None] > 0, np.abs(x_window - x_rows[:, None]) / radius[:, None], 0)
+    tricube = np.where(in_window, (1 - np.minimum(dist, 1) ** 3) ** 3, 0)
+    return idx, x_window, tricube
+
+
+def _local_fits(x, y, resid_weights, windows, rows):
+    """Weighted local linear fits at the points in `rows`, from their `_windows`"""
+    idx, x_window, tricube = windows
+    weights = tricube * resid_weights[idx]
+    sum_weights = weights.sum(axis=1)
+    reg_ok = (sum_weights > 0) & ((weights != 0).sum(axis=1) > 1)
+    weights = weights / np.where(sum_weights > 0, sum_weights, 1)[:, None]
+    x_mean = (weights * x_window).sum(axis=1)
+    dx_window = x_window - x_mean[:, None]
+    sqdev = (weights * dx_window ** 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope_term = np.where(sqdev[:, None] > 0, (x[rows] - x_mean)[:, None] * dx_window / sqdev[:, None], 0)
+    return np.where(reg_ok, (weights * (1 + slope_term) * y[idx]).sum(axis=1), y[rows])
+
+
+# Number of elements of each window matrix; the points are fitted in chunks of rows that fit in it
+WINDOW_BUDGET = 2 ** 20
+
+
+def _lowess_sorted(x, y, starts, sizes, k, it):
+    """LOWESS fits for points sorted by group and x, with group boundaries `starts`/`sizes`"""
+    n = len(x)
+    group_rank = np.repeat(np.arange(len(starts)), sizes)
+    window_start = _window_starts(x, starts, sizes, k, group_rank)
+    window_size = k[group_rank]
+    chunk_size = max(1, WINDOW_BUDGET // int(k.max()))
+    chunks = [slice(i, min(i + chunk_size, n)) for i in range(0, n, chunk_size)]
+    # When all points fit in one chunk, its windows are kept for the robustness iterations
+    windows = _windows(x, window_start, window_size, chunks[0]) if len(chunks) == 1 else None
+
+    resid_weights = np.ones(n)
+    for iteration in range(it + 1):
+        fit = np.empty(n)
+        for rows in chunks:
+            chunk_windows = windows if windows is not None else _windows(x, window_start, window_size, rows)
+            fit[rows] = _local_fits(x, y, resid_weights, chunk_windows, rows)
+        if iteration < it:
+            resid_weights = _residual_weights(y, fit, starts, sizes, group_rank)
+    return fit
+
+
+def lowess_groups(y, x, groups=None, frac=2/3, it=3):
+    """LOWESS fit of y on x within each group, for all groups in one pass.
+
+    `frac` is the fraction of each group's points used for each local fit; it may be a
+    scalar, or an array with one value per row (constant within a group). Pairs with a
+    missing value are ignored and get a missing fit. Returns the fits in input order.
+    """
+    y = _as_float(y)
+    x = _as_float(x)
+    n = len(y)
+    if groups is None:
+        codes = np.zeros(n, dtype=np.int64)
+    else:
+        codes = pd.factorize(np.asarray(groups))[0]
+    frac = np.broadcast_to(np.asarray(frac, dtype=float), (n,))
+    result = np.full(n, np.nan)
+
+    valid_idx = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if len(valid_idx) == 0:
+        return result
+    order = valid_idx[np.lexsort((x[valid_idx], codes[valid_idx]))]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    k = np.floor(frac[order][starts] * sizes + 1e-10).astype(np.int64)
+    k = np.clip(k, 1, sizes)
+    result[order] = _lowess_sorted(x[order], y[order], starts, sizes, k, it)
+    return result
+
+
+class SmoothingCache:
+    def __init__(self, maxsize=512):
+        """Bounded LRU memo of smoothed series, keyed by the content of the series and the parameters"""
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(y, x, frac, it):
+        y = np.ascontiguousarray(_as_float(y))
+        x = np.ascontiguousarray(_as_float(x))
+        h = hashlib.blake2b(digest_size=16)
+        h.update(np.int64(len(y)).tobytes())
+        h.update(x.tobytes())
+        h.update(y.tobytes())
+        return h.hexdigest(), float(frac), int(it)
+
+    def get(self, key):
+        fit = self.entries.get(key)
+        if fit is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return fit
+
+    def put(self, key, fit):
+        fit = np.asarray(fit)
+        fit.flags.writeable = False
+        self.entries[key] = fit
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+cache = SmoothingCache()
+
+
+@trace.traced
+def lowess(y, x, frac=2/3, it=3):
+    """Memoized LOWESS fit of y on x, in the order of the input (like `return_sorted=False`)"""
+    key = cache.key(y, x, frac, it)
+    fit = cache.get(key)
+    if fit is None:
+        fit = lowess_groups(y, x, frac=frac, it=it)
+        cache.put(key, fit)
+    return fit
+
+
+@trace.traced
+def lowess_panel(df, cols, frac, it=3, level="LOCATION"):
+    """Smooth `cols` against time for every location of a (LOCATION, TIME) panel in one call.
+
+    `frac` is a scalar, or a Series of fractions indexed by location. The fit of each
+    location is also stored in the memo, so later `lowess` calls on a single location's
+    series are served from it. Returns a frame of fits aligned with df.
+    """
+    locs = df.index.get_level_values(level)
+    times = df.index.get_level_values(-1)
+    if isinstance(frac, pd.Series):
+        row_frac = frac.reindex(locs).values
+    else:
+        row_frac = np.full(len(df), frac, dtype=float)
+    codes, uniques = pd.factorize(locs)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    fits = {}
+    for col in cols:
+        fit = lowess_groups(df[col].values, times, codes, row_frac, it)
+        for i, loc in enumerate(uniques):
+            rows = order[bounds[i]:bounds[i + 1]]
+            loc_frac = frac.loc[loc] if isinstance(frac, pd.Series) else frac
+            cache.put(cache.key(df[col].values[rows], times[rows], loc_frac, it), fit[rows])
+        fits[col] = fit
+    return pd.DataFrame(fits, index=df.index)
@@ -0,0 +1,241 @@
+"""
+  Module for timing the stages of the qtm pipeline
+
+  Tracing is off by default, and traced functions then only pay for reading one global.
+  Within `tracing()`, every call of a function decorated with `traced` and every `stage`
+  block is recorded in a tree of stages, with its wall time, number of calls and the
+  number of rows it processed:
+
+    with trace.tracing() as tracer:
+        data.annual_ts_fig(marker_date="2008")
+    print(tracer.flame_summary())
+    tracer.write_json("trace.json")
+
+  Tracing is per process and not thread-safe; reports from other processes can be
+  added with `Tracer.merge`.
+"""
+import contextlib
+import functools
+import json
+import time
+
+# The tracer that records stages, if tracing is on
+_tracer = None
+
+
+class Stage:
+    def __init__(self, name):
+        """Totals of all the calls of a stage at one place in the tree"""
+        self.name = name
+        self.calls = 0
+        self.time = 0.0
+        self.rows = 0
+        self.children = {}
+
+    def child(self, name):
+        stage = self.children.get(name)
+        if stage is None:
+            stage = self.children[name] = Stage(name)
+        return stage
+
+    @property
+    def self_time(self):
+        """Time not spent in the child stages"""
+        return max(self.time - sum(child.time for child in self.children.values()), 0.0)
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.time += other.time
+        self.rows += other.rows
+        for name, child in other.children.items():
+            self.child(name).merge(child)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "time": self.time,
+            "self_time": self.self_time,
+            "rows": self.rows,
+            "children": [child.to_dict() for child in self.children.values()]
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stage = cls(d["name"])
+        stage.calls = d["calls"]
+        stage.time = d["time"]
+        stage.rows = d["rows"]
+        for child in d["children"]:
+            stage.children[child["name"]] = cls.from_dict(child)
+        return stage
+
+
+class Tracer:
+    def __init__(self, name="total"):
+        self.root = Stage(name)
+        self._stack = [self.root]
+
+    def enter(self, name):
+        stage = self._stack[-1].child(name)
+        self._stack.append(stage)
+        return stage
+
+    def exit(self, stage, elapsed, rows=0):
+        stage.calls += 1
+        stage.time += elapsed
+        stage.rows += rows
+        self._stack.pop()
+
+    def merge(self, report):
+        """Add a report, e.g. from a worker process, as a child of the current stage"""
+        self._stack[-1].child(report["name"]).merge(Stage.from_dict(report))
+
+    def report(self):
+        return self.root.to_dict()
+
+    def write_json(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def flame_summary(self, width=30, min_fraction=0.0):
+        """Text summary of the stages as an indented tree, with bars proportional to their time.
+
+        Stages taking less than `min_fraction` of the total time are left out.
+        """
+        total = self.root.time or sum(child.time for child in self.root.children.values()) or 1.0
+        lines = [f"{'stage':<48} {'time (s)':>9} {'%':>6} {'calls':>7} {'rows':>10}"]
+
+        def add(stage, depth):
+            frac = stage.time / total
+            if depth > 0 and frac < min_fraction:
+                return
+            label = f"{'  ' * depth}{stage.name}"
+            bar = "#" * int(round(frac * width))
+            lines.append(f"{label:<48.48} {stage.time:>9.3f} {100 * frac:>6.1f} {stage.calls:>7} {stage.rows:>10}"
+                         f"  {bar}")
+            for child in sorted(stage.children.values(), key=lambda child: -child.time):
+                add(child, depth + 1)
+        add(self.root, 0)
+        return "\n".join(lines)
+
+    def collapsed(self):
+        """Self time of every stack in microseconds, in the folded format read by flame graph tools"""
+        lines = []
+
+        def add(stage, path):
+            path = f"{path};{stage.name}" if path else stage.name
+            micros = int(round(stage.self_time * 1e6))
+            if micros > 0:
+                lines.append(f"{path} {micros}")
+            for child in stage.children.values():
+                add(child, path)
+        add(self.root, "")
+        return "\n".join(lines)
+
+
+@contextlib.contextmanager
+def tracing(name="total"):
+    """Record the traced stages run in the block, in the Tracer returned by `with`"""
+    global _tracer
+    tracer = Tracer(name)
+    previous = _tracer
+    _tracer = tracer
+    start = time.perf_counter()
+    try:
+        yield tracer
+    finally:
+        tracer.root.calls += 1
+        tracer.root.time += time.perf_counter() - start
+        _tracer = previous
+
+
+def current():
+    """The tracer recording stages, or None if tracing is off"""
+    return _tracer
+
+
+def row_count(obj):
+    """Number of rows of a frame, series, array or Panel, and 0 for anything else"""
+    shape = getattr(obj, "shape", None)
+    if isinstance(shape, tuple) and len(shape) > 0:
+        return int(shape[0])
+    return 0
+
+
+class _Stage:
+    def __init__(self, tracer, name, rows):
+        self.tracer = tracer
+        self.name = name
+        self.rows = rows
+
+    def add_rows(self, rows):
+        self.rows += rows
+
+    def __enter__(self):
+        self._stage = self.tracer.enter(self.name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.exit(self._stage, time.perf_counter() - self._start, self.rows)
+        return False
+
+
+class _NullStage:
+    def add_rows(self, rows):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_stage = _NullStage()
+
+
+def stage(name, rows=0):
+    """Context manager timing its block as the stage `name`. More rows can be added with `add_rows`."""
+    tracer = _tracer
+    if tracer is None:
+        return _null_stage
+    return _Stage(tracer, name, rows)
+
+
+def _rows(args, kwargs, result):
+    for arg in list(args) + list(kwargs.values()):
+        rows = row_count(arg)
+        if rows:
+            return rows
+    return row_count(result)
+
+
+def traced(func=None, name=None):
+    """Decorator recording the calls of func as a stage, by default named `module.qualname`.
+
+    The rows of a stage are those of its first argument that is a frame, series, array or
+    Panel, or, if there is none (e.g. for readers), those of its result.
+    """
+    def decorate(func):
+        stage_name = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            stage = tracer.enter(stage_name)
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                tracer.exit(stage, time.perf_counter() - start, _rows(args, kwargs, result))
+            return result
+        return wrapper
+
+    if func is not None:
+        return decorate(func)
+    return decorate
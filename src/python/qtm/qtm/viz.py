@@ -6,12 +6,19 @@
 
 import numpy as np
 import pandas as pd
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-import statsmodels.formula.api as smf
-import statsmodels.api as sm
+from ._lazy import lazy_import
+mpl = lazy_import("matplotlib")
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
+smf = lazy_import("statsmodels.formula.api")
+sm = lazy_import("statsmodels.api")
+
+artists = lazy_import("qtm.artists")
+
+from . import bootstrap
+from .regression import grouped_ols
+from . import trace
 
 
 def set_style():
@@ -28,6 +35,111 @@ def set_style():
     mpl.rc('figure', dpi=300)
     
     
+def _as_numeric(values):
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype("datetime64[ns]").view(np.int64)
+    return values.astype(float)
+
+
+def _bucket(values, num_buckets):
+    """Equal-width bucket of each value over the range of the values"""
+    lo, hi = np.nanmin(values), np.nanmax(values)
+    if hi <= lo:
+        return np.zeros(len(values), dtype=np.int64)
+    buckets = np.floor((values - lo) / (hi - lo) * num_buckets).astype(np.int64)
+    return np.minimum(buckets, num_buckets - 1)
+
+
+def minmax_indices(x, y, num_buckets):
+    """Indices of the points needed to draw the line through (x, y) at a width of `num_buckets` pixels.
+
+    This keeps the first, last, minimum and maximum point of each x bucket, which
+    rasterizes to the same pixels as the full line. Missing values are kept, so gaps
+    in the line are preserved. Returns the indices in input order.
+    """
+    x = _as_numeric(x)
+    y = np.asarray(y, dtype=float)
+    if len(x) <= 4 * num_buckets:
+        return np.arange(len(x))
+    missing = np.isnan(x) | np.isnan(y)
+    valid_idx = np.flatnonzero(~missing)
+    if len(valid_idx) == 0:
+        return np.arange(len(x))
+    buckets = _bucket(x[valid_idx], num_buckets)
+    by_y = valid_idx[np.lexsort((y[valid_idx], buckets))]
+    by_x = valid_idx[np.lexsort((x[valid_idx], buckets))]
+    sorted_buckets = np.sort(buckets)
+    firsts = np.flatnonzero(np.r_[True, sorted_buckets[1:] != sorted_buckets[:-1]])
+    lasts = np.r_[firsts[1:], len(sorted_buckets)] - 1
+    keep = [by_y[firsts], by_y[lasts], by_x[firsts], by_x[lasts], np.flatnonzero(missing)]
+    return np.unique(np.concatenate(keep))
+
+
+def stacked_alpha(alpha, counts):
+    """Opacity of `counts` markers of transparency `alpha` drawn on top of each other"""
+    alpha = 1 if alpha is None else alpha
+    return 1 - (1 - alpha) ** np.asarray(counts)
+
+
+def overlap_groups(x, y, num_x, num_y):
+    """Merge the points of (x, y) that fall in the same cell of a `num_x` x `num_y` grid.
+
+    Returns the index of the first point of each occupied cell, in input order, and the
+    number of points in the cell. Missing values are dropped, as scatter would.
+    """
+    x = _as_numeric(x)
+    y = np.asarray(y, dtype=float)
+    valid_idx = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+    if len(valid_idx) == 0:
+        return valid_idx, np.zeros(0, dtype=np.int64)
+    cells = _bucket(x[valid_idx], num_x) * num_y + _bucket(y[valid_idx], num_y)
+    order = np.argsort(cells, kind="stable")
+    sorted_cells = cells[order]
+    firsts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[firsts, len(order)])
+    first_idx = valid_idx[order[firsts]]
+    input_order = np.argsort(first_idx)
+    return first_idx[input_order], counts[input_order]
+
+
+def axes_pixels(ax, renderer=None):
+    """Width and height of ax in pixels, at the resolution of renderer or else of the figure"""
+    bbox = ax.get_window_extent(renderer)
+    return max(int(np.ceil(bbox.width)), 1), max(int(np.ceil(bbox.height)), 1)
+
+
+# Layers of at most this many points are drawn as they are
+DECIMATION_THRESHOLD = 200
+
+
+@trace.traced
+def decimated_plot(ax, x, y, **kwargs):
+    """`ax.plot` of (x, y) that, for a dense series, only draws the points visible at the output resolution.
+
+    The points are chosen when the line is drawn (see `artists.DecimatedLine`), so
+    they follow the final size of ax and the dpi the figure is saved at.
+    """
+    lines = ax.plot(x, y, **kwargs)
+    if len(lines[0].get_xdata(orig=True)) <= DECIMATION_THRESHOLD:
+        return lines
+    return [artists.DecimatedLine.replace(lines[0])]
+
+
+@trace.traced
+def decimated_scatter(ax, x, y, alpha=None, s=None, color=None, **kwargs):
+    """`ax.scatter` that, for a dense layer, merges the markers overlapping at the output resolution.
+
+    Points closer than half a marker width are drawn as one marker, with the opacity of
+    the stacked markers, so the rendered density is preserved with fewer markers. The
+    merging is done when the layer is drawn (see `artists.DecimatedScatter`).
+    """
+    collection = ax.scatter(x, y, s=s, color=color, alpha=alpha, **kwargs)
+    if len(collection.get_offsets()) <= DECIMATION_THRESHOLD:
+        return collection
+    return artists.DecimatedScatter.replace(collection)
+
+
 def annot_line(ax, line_loc, text, text_loc, a_color):
     ax.axvline(pd.to_datetime(line_loc), color=a_color, lw=3, alpha=0.5)
     ax.annotate(text, (pd.to_datetime(text_loc[0]), text_loc[1]), fontsize="x-small")
@@ -81,11 +193,10 @@ def annotate_years(ax, df, xcol, ycol):
 
 
 def regression(ax, lin_reg, color, label="regression", x_offset=-2, y_offset=0.15):
-    lm = lin_reg.lm
     pred_range = lin_reg.pred_range
     predictions = lin_reg.predictions
     ax.plot(pred_range, predictions, color=color, alpha=0.7, lw=3.0, label=label)
-    ax.text(pred_range[1] + x_offset, predictions[1] + y_offset, "$r^2={:.2f}$".format(lm.rsquared))
+    ax.text(pred_range[1] + x_offset, predictions[1] + y_offset, "$r^2={:.2f}$".format(lin_reg.rsquared))
 
 
 def yeqx(ax, tdf, xcol, ycol, color, lims, label="y = x"):
@@ -106,15 +217,20 @@ def cite_fig_source(fig, source, x=0.93, y=0.07):
     fig.supxlabel(f"{source_header} {source}\n{viz}", x=x, y=y, fontsize=8, va='bottom', ha='right')
 
 
+@trace.traced
 def xy_plot(ax, df, lin_reg, scatterc, linec, xeqyc, labelc, labeled_points, xcol, ycol):
     ax.scatter(df[xcol], df[ycol], alpha=0.4, color=scatterc)
     lims = plot_min_max_lims(df, xcol, ycol)
     yeqx(ax, df, xcol, ycol, xeqyc, lims)
-    lm = lin_reg.lm
     pred_range = lin_reg.pred_range
     predictions = lin_reg.predictions
-    slope = lm.params[xcol]
-    label = "regression, $r^2={:.2f}$ ($slope={:.2f}$)".format(lm.rsquared, slope)
+    label = "regression, $r^2={:.2f}$ ($slope={:.2f}$)".format(lin_reg.rsquared, lin_reg.slope)
+    if lin_reg.band is not None:
+        # Bootstrapped: show the intervals and the band of the regression line
+        label = "regression, $r^2={:.2f}$ [{:.2f}, {:.2f}]\n($slope={:.2f}$ [{:.2f}, {:.2f}])".format(
+            lin_reg.rsquared, *lin_reg.r2_ci, lin_reg.slope, *lin_reg.slope_ci)
+        grid, lo, hi = lin_reg.band
+        ax.fill_between(grid, lo, hi, color=linec, alpha=0.2, lw=0)
     ax.plot(pred_range, predictions, color=linec, alpha=0.7, lw=3.0, label=label)
 
     if labeled_points:
@@ -124,8 +240,9 @@ def xy_plot(ax, df, lin_reg, scatterc, linec, xeqyc, labelc, labeled_points, xco
         ax.annotate(c, (df.loc[c, xcol], df.loc[c, ycol]))
 
 
+@trace.traced
 def xy_reg_diff_plot(ax, df, lin_reg, scatterc, labelc, labeled_points, xcol, ycol):
-    predictions = lin_reg.lm.predict(df)
+    predictions = lin_reg.predict(df)
     pred_diff = df[ycol] - predictions
     ax.scatter(df[xcol], pred_diff, alpha=0.5, color=scatterc)
 
@@ -138,22 +255,67 @@ def xy_reg_diff_plot(ax, df, lin_reg, scatterc, labelc, labeled_points, xcol, yc
 
 class LinReg:
     def __init__(self, df, xcol, ycol):
+        """Simple regression of ycol on xcol.
+
+        The fit is computed in closed form; the full statsmodels results are only
+        computed when `lm` (or `summary`) is used.
+        """
         self.df = df
         self.xcol = xcol
         self.ycol = ycol
-        self.lm = None
+        self.slope = None
+        self.intercept = None
+        self.rsquared = None
+        self.fit_df = None
         self.pred_range = None
         self.preds_input = None
         self.predictions = None
+        self.slope_ci = None
+        self.r2_ci = None
+        self.band = None
+        self._lm = None
 
+    @trace.traced
     def fit(self):
         df = self.df
         xcol= self.xcol
-        lm = smf.ols(formula=f"{self.ycol} ~ {xcol}", data=df).fit()
+        fit_df = grouped_ols(df, xcol, self.ycol, level=None)
+        self.fit_df = fit_df
+        self.slope = fit_df['slope'].iloc[0]
+        self.intercept = fit_df['intercept'].iloc[0]
+        self.rsquared = fit_df['r2'].iloc[0]
+        self._lm = None
         pred_range = (df[xcol].min(), df[xcol].max())
         preds_input = pd.DataFrame({xcol: pred_range})
-        predictions = lm.predict(preds_input)
-        self.lm = lm
+        predictions = self.predict(preds_input)
         self.pred_range = pred_range
         self.preds_input = preds_input
         self.predictions = predictions
+
+    def bootstrap(self, num_resamples=1000, confidence=0.95, block_size=None, seed=0, jobs=1):
+        """Bootstrap intervals of the slope and r², and the band of the regression line over pred_range.
+
+        Sets `slope_ci` and `r2_ci` to (low, high) pairs, and `band` to the x values and the
+        low and high predictions, which `xy_plot` draws. Call after `fit`.
+        """
+        replicates = bootstrap.bootstrap_ols(self.df, self.xcol, self.ycol, num_resamples, block_size, seed, jobs,
+                                             level=None)
+        ci = bootstrap.confidence_intervals(replicates, confidence).iloc[0]
+        self.slope_ci = (ci["slope_lo"], ci["slope_hi"])
+        self.r2_ci = (ci["r2_lo"], ci["r2_hi"])
+        grid = np.linspace(self.pred_range[0], self.pred_range[1], 50)
+        preds = replicates["intercept"].values[:, None] + replicates["slope"].values[:, None] * grid[None, :]
+        self.band = (grid, *bootstrap.percentile_interval(preds, confidence))
+
+    def predict(self, df):
+        return pd.Series(self.intercept + self.slope * df[self.xcol].values, index=df.index)
+
+    @property
+    def lm(self):
+        """The statsmodels results for the regression"""
+        if self._lm is None:
+            self._lm = smf.ols(formula=f"{self.ycol} ~ {self.xcol}", data=self.df).fit()
+        return self._lm
+
+    def summary(self):
+        return self.lm.summary()
@@ -0,0 +1,96 @@
+"""
+  Module for lead/lag cross-correlation of panel series
+
+  The correlation of x with y `lag` rows later is computed for every location and lag at
+  once: the series of all locations are padded into one array, and the sums the Pearson
+  correlation needs at every lag (counts, sums, sums of squares and cross products over
+  the rows where both series are present) are cross-correlations, computed with FFTs.
+"""
+import numpy as np
+import pandas as pd
+
+from . import trace
+
+
+def _padded(df, cols, level):
+    """Values of cols as (number of locations, longest location) arrays, padded with missing values"""
+    codes, locations = pd.factorize(df.index.get_level_values(level), sort=True)
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    starts = np.searchsorted(codes, np.arange(len(locations) + 1))
+    pos = np.arange(len(codes)) - starts[codes]
+    length = int(np.diff(starts).max()) if len(locations) else 0
+    arrays = []
+    for col in cols:
+        padded = np.full((len(locations), length), np.nan)
+        padded[codes, pos] = np.asarray(df[col].values, dtype=float)[order]
+        arrays.append(padded)
+    return pd.Index(locations, name=level), arrays
+
+
+def _centered(values):
+    """Values less their row mean, and 0 where missing, with the mask of present values"""
+    present = ~np.isnan(values)
+    # Rows without any values are centered on 0 rather than warning about an empty mean
+    mean = np.nanmean(np.where(present.any(axis=1, keepdims=True), values, 0), axis=1, keepdims=True)
+    return np.where(present, values - mean, 0), present.astype(float)
+
+
+def cross_sums(left, right, pairs, max_lag):
+    """Sums over t of left[i][..., t] * right[j][..., t + lag] for every (i, j) of pairs and lag up to max_lag.
+
+    `left` and `right` are stacks of arrays, which are transformed once however many
+    pairs use them. Returns an array of shape (len(pairs), ..., 2 * max_lag + 1), for
+    the lags from -max_lag to max_lag, computed with real FFTs padded against wrap-around.
+    """
+    length = left.shape[-1]
+    nfft = 1 << max(int(length + max_lag - 1).bit_length(), 0)
+    left_f = np.conj(np.fft.rfft(left, nfft))
+    right_f = np.fft.rfft(right, nfft)
+    products = np.stack([left_f[i] * right_f[j] for i, j in pairs])
+    sums = np.fft.irfft(products, nfft)
+    return sums[..., np.arange(-max_lag, max_lag + 1) % nfft]
+
+
+@trace.traced
+def lead_lag_corr(df, xcol, ycol, max_lag, min_periods=10, level="LOCATION"):
+    """Correlation of xcol with ycol `lag` rows later, for every location and lag up to `max_lag`.
+
+    Positive lags pair x with later values of y, i.e. x leading y, negative lags with
+    earlier ones. Like `x.corr(y.shift(-lag))` per location, only rows where both are
+    present count, and correlations over fewer than `min_periods` pairs are missing.
+    Lags are in rows of the panel (years or months). Returns a frame indexed by location
+    with a column per lag.
+    """
+    locations, (x, y) = _padded(df, [xcol, ycol], level)
+    max_lag = int(min(max_lag, max(x.shape[1] - 1, 0)))
+    # Centering each location keeps the differences of sums below accurate
+    x, x_present = _centered(x)
+    y, y_present = _centered(y)
+    left = np.stack([x_present, x, x * x])
+    right = np.stack([y_present, y, y * y])
+    pairs = [(0, 0), (1, 0), (2, 0), (0, 1), (0, 2), (1, 1)]
+    n, sx, sxx, sy, syy, sxy = cross_sums(left, right, pairs, max_lag)
+    n = np.round(n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_x = n * sxx - sx * sx
+        var_y = n * syy - sy * sy
+        corr = np.clip((n * sxy - sx * sy) / np.sqrt(var_x * var_y), -1, 1)
+    corr = np.where((n >= max(min_periods, 2)) & (var_x > 0) & (var_y > 0), corr, np.nan)
+    columns = pd.Index(np.arange(-max_lag, max_lag + 1), name="lag")
+    return pd.DataFrame(corr, index=locations, columns=columns)
+
+
+def best_lag(corr_df, absolute=False):
+    """The lag of highest correlation of every location in a frame from `lead_lag_corr`.
+
+    With `absolute`, the strongest correlation of either sign is taken. Locations
+    without any correlation are left out. Returns a frame with the lag and its corr.
+    """
+    corr = corr_df.values
+    key = np.abs(corr) if absolute else corr
+    has_corr = ~np.isnan(key).all(axis=1)
+    pos = np.argmax(np.where(np.isnan(key), -np.inf, key), axis=1)
+    rows = np.arange(len(corr))
+    result = pd.DataFrame({"lag": corr_df.columns.values[pos], "corr": corr[rows, pos]}, index=corr_df.index)
+    return result[has_corr]
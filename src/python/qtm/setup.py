@@ -29,6 +29,11 @@ setup(
         'Programming Language :: Python :: 3.8',
     ],
     description="Code for investigating the Quantity Theory of Money",
+    entry_points={
+        'console_scripts': [
+            'qtm=qtm.cli:main',
+        ],
+    },
     install_requires=requirements,
     license="BSD license",
     long_description=readme + '\n\n' + history,
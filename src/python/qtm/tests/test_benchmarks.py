@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+"""Tests for `benchmarks`."""
+
+from benchmarks import suite, synthetic
+from qtm import oecd
+
+
+def test_synthetic_data_reads(tmp_path):
+    raw_paths = synthetic.write_raw(tmp_path / "oecd", num_locations=3, num_years=12)
+    synthetic.write_preprocessed(raw_paths, tmp_path / "preprocess")
+    data = oecd.Data(tmp_path / "preprocess", "M1")
+    locations = set(data.annual_df.index.unique("LOCATION"))
+    assert {"L000", "L001", "L002", "USA"} <= locations
+    assert not {"OECD", "OECDE"} & locations
+    assert data.monthly_df["c_cpi"].notna().any()
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"a": {"time": 1.0, "peak_memory": 100}, "b": {"time": 1.0, "peak_memory": 100}}}
+    results = {"a": {"time": 1.2, "peak_memory": 110}, "b": {"time": 2.0, "peak_memory": 150}, "c": {"time": 9, "peak_memory": 9}}
+    regressions = suite.compare(results, baseline, time_tolerance=0.5, memory_tolerance=0.2)
+    assert len(regressions) == 2
+    assert all(r.startswith("b:") for r in regressions)
+
+
+def test_compare_scales_times_by_the_reference():
+    baseline = {"results": {"a": {"time": 1.0, "reference_time": 0.1, "peak_memory": 100}}}
+    # Twice as slow as the baseline, on a machine that runs the reference twice as slowly
+    assert suite.compare({"a": {"time": 2.0, "reference_time": 0.2, "peak_memory": 100}}, baseline) == []
+    assert len(suite.compare({"a": {"time": 2.0, "reference_time": 0.1, "peak_memory": 100}}, baseline)) == 1
+
+
+def test_suite_runs(tmp_path):
+    ctx = suite.build_context(str(tmp_path), num_locations=3, num_years=12)
+    results = suite.run_cases(ctx, ["summary_df", "linreg_fit", "money_cpi_df_m"], repeat=1)
+    assert set(results) == {"summary_df", "linreg_fit", "money_cpi_df_m"}
+    assert all(r["time"] > 0 and r["reference_time"] > 0 and r["peak_memory"] > 0 for r in results.values())
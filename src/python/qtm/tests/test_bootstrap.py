@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.bootstrap`."""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import bootstrap, preprocess, viz
+
+
+@pytest.fixture
+def growth_df():
+    """A (LOCATION, TIME) panel where c_cpi depends linearly on c_m1 plus noise."""
+    rng = np.random.default_rng(6)
+    dfs = []
+    for loc, slope, n in [("AAA", 0.8, 80), ("BBB", 1.5, 40)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range("1960", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        x = rng.normal(10, 4, n)
+        dfs.append(pd.DataFrame({"c_m1": x, "c_cpi": 2 + slope * x + rng.normal(0, 2, n)}, idx))
+    return pd.concat(dfs)
+
+
+@pytest.mark.parametrize("block_size", [None, 4])
+def test_resample_indices_stay_in_group(block_size):
+    rng = np.random.default_rng(0)
+    sizes = [3, 10, 1]
+    idx = bootstrap.resample_indices(rng, sizes, 50, block_size)
+    assert idx.shape == (50, 14)
+    groups = np.repeat([0, 1, 2], sizes)
+    assert (groups[idx] == groups[None, :]).all()
+    if block_size:
+        # Within a block, the resampled rows are consecutive
+        assert (np.diff(idx[:, 3:7], axis=1) == 1).all()
+
+
+def test_replicate_fits_match_direct_fits():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=30), rng.normal(size=30)
+    fits = bootstrap.replicate_fits(x, y, [30], 5, seed=3)
+    idx = bootstrap.resample_indices(np.random.default_rng(3), [30], 5)
+    for r in range(5):
+        slope, intercept = np.polyfit(x[idx[r]], y[idx[r]], 1)
+        assert fits["slope"][r, 0] == pytest.approx(slope)
+        assert fits["intercept"][r, 0] == pytest.approx(intercept)
+
+
+def test_bootstrap_is_reproducible_across_jobs(growth_df):
+    kwargs = dict(num_resamples=60, block_size=5, seed=7, chunk_size=1000)
+    serial = bootstrap.bootstrap_ols(growth_df, "c_m1", "c_cpi", jobs=1, **kwargs)
+    parallel = bootstrap.bootstrap_ols(growth_df, "c_m1", "c_cpi", jobs=2, **kwargs)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert serial.index.names == ["replicate", "LOCATION"]
+    assert len(serial) == 120
+
+
+def test_confidence_intervals_cover_the_slope(growth_df):
+    ci = bootstrap.bootstrap_ci(growth_df, "c_m1", "c_cpi", num_resamples=500)
+    assert list(ci.columns) == ["slope_lo", "slope_hi", "r2_lo", "r2_hi"]
+    assert ci.loc["AAA", "slope_lo"] < 0.8 < ci.loc["AAA", "slope_hi"]
+    assert ci.loc["BBB", "slope_lo"] < 1.5 < ci.loc["BBB", "slope_hi"]
+    reg_df = preprocess.money_cpi_reg_df(growth_df, "c_m1", num_resamples=200, block_size=5)
+    assert (reg_df["r2_lo"] <= reg_df["r2"]).all() and (reg_df["r2"] <= reg_df["r2_hi"]).all()
+
+
+def test_confidence_intervals_of_whole_frame(growth_df):
+    replicates = bootstrap.bootstrap_ols(growth_df, "c_m1", "c_cpi", num_resamples=100, level=None)
+    ci = bootstrap.confidence_intervals(replicates)
+    assert list(ci.index) == [None]
+    assert ci.index.dtype == object
+    lo, hi = bootstrap.percentile_interval(replicates["slope"].values)
+    assert (lo, hi) == (ci["slope_lo"].iloc[0], ci["slope_hi"].iloc[0])
+
+
+def test_lin_reg_bootstrap_band(growth_df):
+    lin_reg = viz.LinReg(growth_df.loc["AAA"], "c_m1", "c_cpi")
+    lin_reg.fit()
+    assert lin_reg.band is None
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        lin_reg.bootstrap(300)
+    grid, lo, hi = lin_reg.band
+    assert lin_reg.slope_ci[0] < lin_reg.slope < lin_reg.slope_ci[1]
+    mid = len(grid) // 2
+    assert lo[mid] < lin_reg.intercept + lin_reg.slope * grid[mid] < hi[mid]
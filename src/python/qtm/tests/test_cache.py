@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.cache`."""
+
+import os
+
+import pandas as pd
+import pytest
+
+from qtm import cache
+
+
+@pytest.fixture
+def source_csv(tmp_path):
+    path = tmp_path / "source.csv"
+    path.write_text("LOCATION,TIME,CPI\nAAA,2000-01-01,1.0\nAAA,2001-01-01,1.5\nBBB,2000-01-01,2.0\n")
+    return str(path)
+
+
+def build_frames(path, calls):
+    calls.append(path)
+    df = pd.read_csv(path, parse_dates=["TIME"]).set_index(["LOCATION", "TIME"])
+    summary_df = pd.DataFrame({"CPI": df.groupby(level=0).max()["CPI"]})
+    summary_df["quantile"] = pd.qcut(summary_df["CPI"], 2, labels=range(1, 3))
+    return {"df": df, "summary_df": summary_df}
+
+
+def test_frame_cache_round_trip(tmp_path, source_csv):
+    calls = []
+    frame_cache = cache.FrameCache(str(tmp_path / "cache"))
+    first = frame_cache.load("test", [source_csv], lambda: build_frames(source_csv, calls))
+    second = frame_cache.load("test", [source_csv], lambda: build_frames(source_csv, calls))
+    assert len(calls) == 1
+    for name in first:
+        pd.testing.assert_frame_equal(first[name], second[name])
+
+
+def test_frame_cache_invalidation(tmp_path, source_csv):
+    calls = []
+    frame_cache = cache.FrameCache(str(tmp_path / "cache"))
+    frame_cache.load("test", [source_csv], lambda: build_frames(source_csv, calls))
+
+    # Touching the file without changing it keeps the entry
+    st = os.stat(source_csv)
+    os.utime(source_csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    frame_cache.load("test", [source_csv], lambda: build_frames(source_csv, calls))
+    assert len(calls) == 1
+
+    with open(source_csv, "a") as f:
+        f.write("BBB,2001-01-01,3.0\n")
+    frames = frame_cache.load("test", [source_csv], lambda: build_frames(source_csv, calls))
+    assert len(calls) == 2
+    assert len(frames["df"]) == 4
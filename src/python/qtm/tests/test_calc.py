@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.calc`."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import calc
+
+
+@pytest.fixture
+def panel_df():
+    """A small (LOCATION, TIME) panel with uneven series lengths."""
+    rows = []
+    rng = np.random.default_rng(0)
+    for loc, start, n in [("AAA", 1960, 30), ("BBB", 1975, 12), ("CCC", 2000, 1)]:
+        levels = np.cumprod(1 + rng.uniform(0, 0.2, size=(n, 2)), axis=0)
+        for i in range(n):
+            rows.append({"LOCATION": loc, "TIME": pd.Timestamp(f"{start + i}-01-01"),
+                         "M1": levels[i, 0], "CPI": levels[i, 1]})
+    return pd.DataFrame(rows).set_index(["LOCATION", "TIME"])
+
+
+def test_change_rates_matches_change_rate(panel_df):
+    rates = calc.change_rates(panel_df, ["M1", "CPI"])
+    assert list(rates.index) == ["AAA", "BBB", "CCC"]
+    for loc in rates.index:
+        for col in ["M1", "CPI"]:
+            years, rate = calc.change_rate(panel_df, loc, col)
+            assert rates.loc[loc, "years"] == years
+            assert rates.loc[loc, col] == pytest.approx(rate)
+        assert rates.loc[loc, "M1_first"] == panel_df.loc[loc].iloc[0]["M1"]
+        assert rates.loc[loc, "M1_last"] == panel_df.loc[loc].iloc[-1]["M1"]
+
+
+def test_lead_lag_matrix_matches_grouped_shift(panel_df):
+    ser = panel_df["CPI"]
+    groups = panel_df.index.get_level_values("LOCATION")
+    matrix = calc.lead_lag_matrix(ser, groups, range(-2, 4))
+    for k in range(-2, 4):
+        expected = ser.groupby(level="LOCATION").shift(-k)
+        np.testing.assert_array_equal(matrix[k].values, expected.values)
+
+
+def test_lead_lag_matrix_keeps_categories(panel_df):
+    ser = pd.qcut(panel_df["CPI"], 4, range(1, 5))
+    groups = panel_df.index.get_level_values("LOCATION")
+    matrix = calc.lead_lag_matrix(ser, groups, [0, 1])
+    assert matrix[0].dtype == ser.dtype
+    assert matrix[0].equals(ser)
+
+
+@pytest.mark.parametrize("num_q", [2, 4, 5])
+def test_quantile_codes_matches_qcut(panel_df, num_q):
+    values = panel_df[["M1", "CPI"]].round(1)
+    values.iloc[::7, 1] = np.nan
+    values = values.drop("CCC", level="LOCATION")
+    groups = values.index.get_level_values("LOCATION")
+    codes = calc.quantile_codes(values.values, groups, num_q)
+    for i, col in enumerate(values.columns):
+        expected = values[col].groupby(level="LOCATION").transform(
+            lambda s: pd.qcut(s, num_q, labels=False) + 1)
+        np.testing.assert_array_equal(codes[:, i], expected.fillna(0).values)
+
+
+def test_quantile_codes_rejects_duplicate_edges():
+    with pytest.raises(ValueError):
+        calc.quantile_codes([1.0, 1.0, 1.0, 2.0], ["A"] * 4, 4)
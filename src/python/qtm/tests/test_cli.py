@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+"""Tests for the `qtm` command line interface."""
+
+import json
+import os
+
+import pytest
+
+from qtm import cli
+
+BARRO_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "data", "barro", "barro-data-set.csv")
+
+
+@pytest.fixture
+def spec_path(tmp_path):
+    spec = {
+        "barro_path": os.path.abspath(BARRO_PATH),
+        "figures": [
+            {"name": "barro", "figure": "barro.xy_fig",
+             "params": {"xlabel": "M1", "ylabel": "CPI", "labeled_points": ["Brazil"]}},
+            {"name": "barro-error", "figure": "barro.xy_fig_with_error",
+             "params": {"xlabel": "M1", "ylabel": "CPI", "labeled_points": []}},
+            {"name": "broken", "figure": "barro.xy_fig", "params": {"no_such_param": 1}},
+        ]
+    }
+    path = tmp_path / "figures.json"
+    path.write_text(json.dumps(spec))
+    return str(path)
+
+
+@pytest.mark.skipif(not os.path.exists(BARRO_PATH), reason="needs the Barro data set")
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_render(tmp_path, spec_path, jobs):
+    out_dir = str(tmp_path / f"out-{jobs}")
+    status = cli.main(["render", spec_path, "-o", out_dir, "-j", str(jobs), "--dpi", "30", "--no-style"])
+    assert status == 1
+    assert sorted(os.listdir(out_dir)) == ["barro-error.png", "barro.png"]
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.episodes`."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import episodes
+
+
+@pytest.fixture
+def growth_df():
+    """A (LOCATION, TIME) panel of money growth and inflation, with some missing values."""
+    rng = np.random.default_rng(8)
+    dfs = []
+    for loc, n in [("AAA", 60), ("BBB", 45), ("CCC", 1), ("DDD", 30)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range("1960", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        m = rng.normal(8, 5, n)
+        dfs.append(pd.DataFrame({"c_m1": m, "c_cpi": 0.6 * m + rng.normal(0, 3, n)}, idx))
+    df = pd.concat(dfs)
+    df.iloc[[3, 20, 61], 1] = np.nan
+    df.iloc[[10, 40], 0] = np.nan
+    # Rows of a location need not be contiguous
+    return df.sample(frac=1, random_state=0)
+
+
+def naive_episodes(df, col, thresholds, min_duration, lookback):
+    rows = []
+    for loc, loc_df in df.sort_index().groupby(level=0):
+        loc_df = loc_df.loc[loc]
+        values = loc_df[col].values
+        for threshold in np.atleast_1d(thresholds(loc_df)):
+            i = 0
+            while i < len(values):
+                if not values[i] > threshold:
+                    i += 1
+                    continue
+                j = i
+                while j + 1 < len(values) and values[j + 1] > threshold:
+                    j += 1
+                run = loc_df.iloc[i:j + 1]
+                if j - i + 1 >= min_duration:
+                    rows.append((loc, threshold, run.index[0], run.index[-1], j - i + 1, run[col].max(),
+                                 run[col].idxmax(), loc_df["c_m1"].iloc[max(i - lookback, 0):i].mean()))
+                i = j + 1
+    columns = ["LOCATION", "threshold", "start", "end", "duration", "peak", "peak_time", "prior_c_m1"]
+    return pd.DataFrame(rows, columns=columns).sort_values(["LOCATION", "threshold", "start"])
+
+
+def test_run_bounds():
+    flags = np.array([1, 1, 0, 1, 1, 1, 0, 1], dtype=bool)
+    codes = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+    starts, ends = episodes.run_bounds(flags, codes)
+    assert list(starts) == [0, 3, 4, 7]
+    assert list(ends) == [1, 3, 5, 7]
+
+
+def test_group_quantiles_match_nanquantile(growth_df):
+    codes, locations = pd.factorize(growth_df.index.get_level_values(0), sort=True)
+    values = growth_df["c_cpi"].values
+    result = episodes.group_quantiles(values, codes, len(locations) + 1, 0.8)
+    for i in range(len(locations)):
+        assert result[i] == pytest.approx(np.nanquantile(values[codes == i], 0.8))
+    assert np.isnan(result[-1])
+
+
+@pytest.mark.parametrize("min_duration", [1, 3])
+def test_threshold_episodes_match_naive(growth_df, min_duration):
+    result = episodes.find_episodes(growth_df, "c_cpi", threshold=[5, 10], min_duration=min_duration,
+                                    money_col="c_m1", lookback=3)
+    expected = naive_episodes(growth_df, "c_cpi", lambda loc_df: [5, 10], min_duration, 3)
+    result = result.sort_values(["LOCATION", "threshold", "start"])
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_quantile_episodes_match_naive(growth_df):
+    result = episodes.find_episodes(growth_df, "c_m1", quantile=0.75, money_col="c_m1", lookback=2)
+    expected = naive_episodes(growth_df, "c_m1", lambda loc_df: loc_df["c_m1"].quantile(0.75), 1, 2)
+    assert (result["quantile"] == 0.75).all()
+    result = result.drop(columns="quantile").sort_values(["LOCATION", "threshold", "start"])
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_needs_one_kind_of_threshold(growth_df):
+    with pytest.raises(ValueError):
+        episodes.find_episodes(growth_df, "c_cpi")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.frames`."""
+
+import numpy as np
+import pandas as pd
+
+from qtm import frames
+
+
+def test_compact_frame():
+    n = 100
+    df = pd.DataFrame({"r2": np.linspace(0, 1, n), "r2cat": np.arange(n) % 4, "name": ["a", "b"] * (n // 2)},
+                      index=pd.Index(["TUR", "ISR", "USA", "MEX"] * (n // 4), name="LOCATION"))
+    compact = frames.compact_frame(df)
+    assert compact["r2"].dtype == np.float32
+    assert compact["r2cat"].dtype == np.uint8
+    assert isinstance(compact["name"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact.index, pd.CategoricalIndex)
+    assert (compact.loc["ISR", "r2cat"] == 1).all()
+    np.testing.assert_allclose(compact["r2"], df["r2"])
+    assert frames.memory_usage(compact) < frames.memory_usage(df)
+    assert df["r2"].dtype == np.float64
+
+
+def test_compact_frame_keeps_unique_labels():
+    df = pd.DataFrame({"shift": [-3, 0, 200]}, index=pd.Index(["TUR", "ISR", "USA"], name="LOCATION"))
+    compact = frames.compact_frame(df)
+    assert compact["shift"].dtype == np.int16
+    assert compact.index.dtype == object
+
+
+def test_memory_usage_ignores_lookups():
+    idx = pd.MultiIndex.from_product([["TUR", "ISR"], pd.date_range("2000", periods=3, freq="AS")])
+    df = pd.DataFrame({"r2": np.arange(6.0), "name": ["a", "bb"] * 3}, index=idx)
+    before = frames.memory_usage(df)
+    df.loc[("ISR", "2001-01-01")]
+    df.index.levels[0].get_loc("ISR")
+    assert frames.memory_usage(df) == before
+    assert frames.memory_usage(df["r2"]) == 6 * 8 + frames.index_memory_usage(idx)
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""Import-time checks for `qtm`: the computation and data modules must not load the plotting stack."""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+HEAVY_MODULES = ["matplotlib", "seaborn", "statsmodels"]
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(code):
+    env = dict(os.environ, PYTHONPATH=PACKAGE_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    return time.perf_counter() - start, out.stdout.strip()
+
+
+def loaded_heavy_modules(code):
+    check = f"import sys; {code}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return run_python(check)[1]
+
+
+@pytest.mark.parametrize("code", [
+    "import qtm; qtm.calc.pct_rate_to_yearly(1.0, 12)",
+    "import qtm.oecd; qtm.oecd.read_data",
+    "import qtm; qtm.oecd.Data('data/preprocess', 'M1')",
+    "import qtm; qtm.regression.grouped_ols",
+])
+def test_no_plotting_stack_on_import(code):
+    assert loaded_heavy_modules(code) == ""
+
+
+def test_plotting_stack_loads_on_use():
+    assert loaded_heavy_modules("import qtm; qtm.viz.sns.color_palette()") != ""
+
+
+def test_calc_import_time():
+    """Importing qtm for calc must cost a fraction of importing the plotting stack"""
+    calc_time = min(run_python("import qtm; qtm.calc")[0] for _ in range(3))
+    heavy_time = min(run_python("import seaborn, statsmodels.api")[0] for _ in range(3))
+    assert calc_time < 0.5 * heavy_time
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.oecd`."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import oecd
+from qtm.panel import Panel
+
+
+@pytest.fixture
+def growth_df():
+    """An annual (LOCATION, TIME) panel of money and CPI growth rates."""
+    rng = np.random.default_rng(1)
+    dfs = []
+    for loc, start, n in [("AAA", 1960, 40), ("BBB", 1970, 25), ("CCC", 1985, 30)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range(f"{start}", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        dfs.append(pd.DataFrame({"c_m1": rng.normal(8, 5, n), "c_cpi": rng.normal(5, 4, n)}, idx))
+    return pd.concat(dfs)
+
+
+def test_quantile_ts_summary_df_percentages(growth_df):
+    q_df = oecd.to_quantile_df(growth_df, "c_m1", "c_cpi", 10)
+    pp_df = oecd.quantile_ts_plot_df(q_df, "c_m1", "c_cpi", 4)
+    summary = oecd.quantile_ts_summary_df(pp_df, 7)
+    expected = []
+    for i, r in pp_df.iterrows():
+        if i[2] > 7:
+            expected.append((i[0], (r.astype(float) > 7).sum() / len(r)))
+    assert list(summary["LOCATION"]) == [e[0] for e in expected]
+    np.testing.assert_allclose(summary["percentage"], [e[1] for e in expected])
+
+
+def test_facet_ts_plot_label(growth_df):
+    assert oecd.facet_ts_plot_label(growth_df, "BBB") == "BBB | 1970 – 1994"
+    assert oecd.facet_ts_plot_label(Panel.from_frame(growth_df), "CCC") == "CCC | 1985 – 2014"
+
+
+def test_quantile_ts_lines_batches_artists(growth_df):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    q_df = oecd.to_quantile_df(growth_df, "c_m1", "c_cpi", 10)
+    pp_df = oecd.quantile_ts_plot_df(q_df, "c_m1", "c_cpi", 4)
+    fig, ax = plt.subplots()
+    oecd.quantile_ts_lines(ax, pp_df, "C0", "C1", 7)
+    oecd.quantile_ts_scatter(ax, pp_df, "C0", "C1", 7)
+    assert len(ax.lines) == 0
+    assert len(ax.collections) <= 3
+    segments = oecd.quantile_ts_segments(pp_df)
+    assert segments.shape == (len(pp_df), 4, 2)
+    np.testing.assert_array_equal(segments[..., 1], pp_df.astype(float).values)
+    plt.close(fig)
+
+
+def test_read_data_from_store(growth_df, tmp_path):
+    df = growth_df.copy()
+    for loc in ["OECD", "OECDE"]:
+        extra = growth_df.loc[["AAA"]].rename(index={"AAA": loc}, level="LOCATION")
+        df = pd.concat([df, extra])
+    df = df.sort_index()
+    csv_path = str(tmp_path / "m1-cpi_a.csv")
+    df.to_csv(csv_path)
+    Panel.from_frame(pd.read_csv(csv_path, parse_dates=["TIME"]).set_index(["LOCATION", "TIME"])).save(
+        str(tmp_path / "m1-cpi_a.panel"))
+    store_path = oecd.data_path(str(tmp_path), "m1-cpi_a")
+    assert store_path.endswith(".panel")
+    pd.testing.assert_frame_equal(oecd.read_data(store_path), oecd.read_data(csv_path))
+
+    Panel.from_frame(growth_df).save(str(tmp_path / "no-aggregates.panel"))
+    with pytest.raises(ValueError, match="OECDE, OECD"):
+        oecd.read_panel(str(tmp_path / "no-aggregates.panel"))
+
+
+PREPROCESS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "data", "preprocess")
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+def test_data_loads_frames_lazily():
+    data = oecd.Data(PREPROCESS_DIR, "M1")
+    assert "USA" in data.annual_df.index.get_level_values("LOCATION")
+    assert "annual_df_full" in data.__dict__
+    assert "monthly_df" not in data.__dict__ and "annual_reg_df" not in data.__dict__
+    assert data.max_inflation_df.index[0] in data.annual_panel
+
+    data.invalidate("annual_df_full")
+    assert not {"annual_df_full", "annual_df", "max_inflation_df", "annual_panel"} & set(data.__dict__)
+    assert len(data.annual_df) > 0
+
+    data.annual_df = data.annual_df.loc[["USA"]]
+    assert list(data.annual_panel.locations) == ["USA"]
+    with pytest.raises(ValueError):
+        data.invalidate("not_a_frame")
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+def test_data_panels_use_the_store(tmp_path):
+    csv_data = oecd.Data(PREPROCESS_DIR, "M1")
+    for name in ["m1-cpi_a", "m1-cpi_m"]:
+        df = pd.read_csv(os.path.join(PREPROCESS_DIR, f"{name}.csv"), parse_dates=["TIME"])
+        Panel.from_frame(df.set_index(["LOCATION", "TIME"])).save(str(tmp_path / f"{name}.panel"))
+    data = oecd.Data(str(tmp_path), "M1")
+    assert isinstance(data.monthly_panel.values, np.memmap)
+    # The panel is not built from a copy of the frame
+    assert "monthly_df" not in data.__dict__
+    pd.testing.assert_frame_equal(data.monthly_panel.to_frame(), csv_data.monthly_df)
+    pd.testing.assert_frame_equal(data.annual_panel.to_frame(), csv_data.annual_df)
+
+    data.annual_df = data.annual_df.loc[["USA"]]
+    assert list(data.annual_panel.locations) == ["USA"]
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+def test_cached_data_follows_assigned_frames(tmp_path):
+    cache_dir = str(tmp_path)
+    assert "TUR" in oecd.Data(PREPROCESS_DIR, "M1", cache_dir).max_inflation_df.index
+    data = oecd.Data(PREPROCESS_DIR, "M1", cache_dir)
+    data.annual_df_full = data.annual_df_full.drop(index="TUR")
+    assert "TUR" not in data.annual_df.index.get_level_values("LOCATION")
+    assert "TUR" not in data.max_inflation_df.index
+
+
+def test_data_episodes_include_max_inflation():
+    data = oecd.Data(PREPROCESS_DIR, "M1")
+    episodes_df = data.episodes_df(quantile=0.9)
+    # The highest inflation of every location is the peak of one of its episodes
+    peaks = episodes_df.groupby("LOCATION")["peak"].max()
+    pd.testing.assert_series_equal(peaks.sort_index(), data.max_inflation_df["c_cpi"].sort_index(),
+                                   check_names=False)
+    assert "prior_c_m1" in episodes_df.columns
+
+
+def test_combine_aggregates_keeps_one_cpi(growth_df):
+    df = growth_df.copy()
+    df["CPI"] = np.arange(len(df), dtype=float)
+    df["M1"] = 1.0
+    m1_df = df[["M1", "CPI", "c_m1", "c_cpi"]]
+    m3_df = df.rename(columns={"M1": "M3", "c_m1": "c_m3"})[["M3", "CPI", "c_m3", "c_cpi"]].drop(index="AAA")
+    m1_df = m1_df.drop(index="CCC")
+    combined = oecd.combine_aggregates([m1_df, m3_df])
+    assert list(combined.columns) == ["CPI", "c_cpi", "M1", "c_m1", "M3", "c_m3"]
+    assert len(combined) == len(df)
+    pd.testing.assert_frame_equal(oecd.aggregate_frame(combined, "M1"), m1_df)
+    pd.testing.assert_frame_equal(oecd.aggregate_frame(combined, "M3"), m3_df)
+    panel = Panel.from_frame(combined)
+    pd.testing.assert_frame_equal(oecd.aggregate_panel(panel, "M1").to_frame(), m1_df)
+    pd.testing.assert_frame_equal(oecd.aggregate_panel(panel, "M3").to_frame(), m3_df)
+
+    m3_df = m3_df.assign(CPI=m3_df["CPI"] + 1)
+    with pytest.raises(ValueError):
+        oecd.combine_aggregates([m1_df, m3_df])
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+def test_multi_data_views_match_data():
+    multi_data = oecd.MultiData(PREPROCESS_DIR, ["M1", "M3"])
+    for ma in ["M1", "M3"]:
+        data = oecd.Data(PREPROCESS_DIR, ma)
+        pd.testing.assert_frame_equal(multi_data[ma].annual_df, data.annual_df)
+        pd.testing.assert_frame_equal(multi_data[ma].max_inflation_df, data.max_inflation_df)
+    # The views share the arrays of the MultiData, with a single CPI column
+    assert multi_data["M1"].annual_panel.values is multi_data.annual_panel_full.values
+    assert multi_data["M3"].annual_panel.values is multi_data.annual_panel_full.values
+    assert "annual_df_full" not in multi_data["M1"].__dict__
+    multi_data.invalidate("annual_panel_full")
+    assert "annual_df" not in multi_data["M1"].__dict__
+
+
+def value_bytes(objs):
+    """Bytes of the distinct arrays holding the values of the loaded frames and panels of objs"""
+    arrays = {}
+    for obj in objs:
+        for name in oecd.LazyFrame.names(type(obj)):
+            loaded = obj.__dict__.get(name)
+            if isinstance(loaded, Panel):
+                held = [loaded.values]
+            elif isinstance(loaded, pd.DataFrame):
+                held = [loaded[col].values for col in loaded.columns]
+            else:
+                continue
+            for values in held:
+                while isinstance(values, np.ndarray) and isinstance(values.base, np.ndarray):
+                    values = values.base
+                if isinstance(values, np.ndarray):
+                    arrays[id(values)] = values.nbytes
+    return sum(arrays.values())
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+def test_multi_data_uses_less_memory_than_data():
+    multi_data = oecd.MultiData(PREPROCESS_DIR, ["M1", "M3"])
+    views = [multi_data["M1"], multi_data["M3"]]
+    separate = [oecd.Data(PREPROCESS_DIR, ma) for ma in ["M1", "M3"]]
+    for data in views + separate:
+        data.annual_df, data.annual_panel, data.monthly_df, data.monthly_panel, data.max_inflation_df
+    assert value_bytes([multi_data] + views) < value_bytes(separate)
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+def test_compact_data_memory_report():
+    data = oecd.Data(PREPROCESS_DIR, "M1")
+    compact_data = oecd.Data(PREPROCESS_DIR, "M1", compact=True)
+    for d in [data, compact_data]:
+        d.annual_df, d.annual_reg_df, d.annual_panel
+    report = data.memory_report()
+    compact_report = compact_data.memory_report()
+    assert list(report.index) == ["annual_df_full", "annual_df", "annual_reg_df", "annual_panel"]
+    assert (compact_report["bytes"] < report["bytes"]).all()
+    assert compact_data.annual_df["c_cpi"].dtype == np.float32
+    np.testing.assert_allclose(compact_data.annual_df["c_cpi"], data.annual_df["c_cpi"], rtol=1e-6)
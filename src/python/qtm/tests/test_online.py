@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.online`."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import online, preprocess
+
+
+@pytest.fixture
+def raw_df():
+    """Monthly M1 and CPI levels of a few locations, with some missing observations."""
+    rng = np.random.default_rng(11)
+    dfs = []
+    for loc, n in [("AAA", 60), ("BBB", 48), ("CCC", 36)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range("2000", periods=n, freq="MS")],
+                                         names=["LOCATION", "TIME"])
+        m = 100 * np.exp(np.cumsum(rng.normal(0.005, 0.01, n)))
+        cpi = 100 * np.exp(np.cumsum(0.5 * np.log(m / m[0]).clip(0) / n + rng.normal(0.002, 0.003, n)))
+        dfs.append(pd.DataFrame({"M1": m, "CPI": cpi}, idx))
+    df = pd.concat(dfs)
+    df.iloc[[10, 70], 0] = np.nan
+    return df
+
+
+def batch(raw_df):
+    m_df = preprocess.money_cpi_df(raw_df["M1"].dropna(), raw_df["CPI"].dropna(), "m1", "M")
+    return m_df, preprocess.money_cpi_reg_df(m_df, "c_m1")
+
+
+def assert_matches_batch(state, raw_df):
+    m_df, reg_df = batch(raw_df)
+    pd.testing.assert_frame_equal(state.frame(), m_df)
+    pd.testing.assert_frame_equal(state.reg_df(), reg_df, check_exact=False, rtol=1e-9)
+
+
+def test_merge_and_remove_stats():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"x": rng.normal(size=50), "y": rng.normal(size=50)})
+    first, rest, full = (online.array_stats(d["x"].values, d["y"].values) for d in [df[:30], df[30:], df])
+    assert online.merge_stats(first, rest) == pytest.approx(full)
+    assert online.remove_stats(full, rest) == pytest.approx(first)
+    assert online.remove_stats(full, full) == online.empty_stats()
+
+
+def test_appended_rows_match_batch(raw_df):
+    times = raw_df.index.get_level_values(1)
+    cutoff = pd.Timestamp("2002-06-01")
+    old, new = raw_df[times < cutoff], raw_df[times >= cutoff]
+    state = online.OnlineMoneyCpi.from_series(old["M1"].dropna(), old["CPI"].dropna(), "m1", "M")
+    assert_matches_batch(state, old)
+    for month, rows in new.groupby(level=1):
+        # CPI is released before money
+        state.append(rows[["CPI"]])
+        state.append(rows[["M1"]])
+    assert_matches_batch(state, raw_df)
+
+
+def test_revisions_and_new_locations(raw_df):
+    old = raw_df.drop("CCC", level=0)
+    state = online.OnlineMoneyCpi.from_series(old["M1"].dropna(), old["CPI"].dropna(), "m1", "M")
+    revised = raw_df.copy()
+    revised.iloc[5:8, 1] *= 1.01
+    # Fill in the missing observation of BBB, which adds back two growth rates
+    revised.iloc[70, 0] = revised.iloc[69, 0]
+    assert state.append(revised.iloc[np.r_[5:8, 70, 108:144]]) == ["AAA", "BBB", "CCC"]
+    assert_matches_batch(state, revised)
+
+
+def test_from_frame_continues_preprocessed_file(raw_df):
+    times = raw_df.index.get_level_values(1)
+    cutoff = pd.Timestamp("2003-01-01")
+    old_m_df, _ = batch(raw_df[times < cutoff])
+    state = online.OnlineMoneyCpi.from_frame(old_m_df, "m1", "M")
+    state.append(raw_df[times >= cutoff])
+    m_df, reg_df = batch(raw_df)
+    pd.testing.assert_frame_equal(state.frame(), m_df)
+    pd.testing.assert_frame_equal(state.reg_df(), reg_df, check_exact=False, rtol=1e-9)
+
+
+def test_levels_in_any_order(raw_df):
+    shuffled = raw_df.sample(frac=1, random_state=0)
+    state = online.OnlineMoneyCpi(shuffled, "m1", "M")
+    assert_matches_batch(state, raw_df)
+    times = raw_df.index.get_level_values(1)
+    state = online.OnlineMoneyCpi(shuffled[shuffled.index.get_level_values(1) < pd.Timestamp("2002-01-01")], "m1", "M")
+    state.append(raw_df[times >= pd.Timestamp("2002-01-01")].sample(frac=1, random_state=1))
+    assert_matches_batch(state, raw_df)
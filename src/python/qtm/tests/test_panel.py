@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.panel`."""
+
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import panel
+from qtm.panel import Panel
+
+
+@pytest.fixture
+def panel_df():
+    rng = np.random.default_rng(2)
+    dfs = []
+    for loc, start, n in [("BBB", 1970, 5), ("AAA", 1960, 8), ("CCC", 1985, 3)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range(f"{start}", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        dfs.append(pd.DataFrame({"M1": rng.normal(size=n), "CPI": rng.normal(size=n)}, idx))
+    return pd.concat(dfs)
+
+
+def test_round_trip(panel_df):
+    panel = Panel.from_frame(panel_df)
+    pd.testing.assert_frame_equal(panel.to_frame(), panel_df.sort_index())
+    assert len(panel) == len(panel_df)
+    assert list(panel.locations) == ["AAA", "BBB", "CCC"]
+
+
+def test_from_frame_sorts_by_time(panel_df):
+    shuffled = panel_df.sample(frac=1, random_state=3)
+    panel = Panel.from_frame(shuffled)
+    pd.testing.assert_frame_equal(panel.to_frame(), panel_df.sort_index())
+    for loc in ["AAA", "BBB", "CCC"]:
+        assert panel.loc[loc].index.is_monotonic_increasing
+        pd.testing.assert_frame_equal(panel.loc[loc], panel_df.loc[loc])
+
+
+def test_loc_matches_frame(panel_df):
+    panel = Panel.from_frame(panel_df)
+    for loc in ["AAA", "BBB", "CCC"]:
+        pd.testing.assert_frame_equal(panel.loc[loc], panel_df.loc[loc])
+        pd.testing.assert_frame_equal(panel.loc[loc, ["CPI"]], panel_df.loc[loc, ["CPI"]])
+        pd.testing.assert_frame_equal(panel.loc[loc, :], panel_df.loc[loc, :])
+    assert np.shares_memory(panel.loc["BBB"].values, panel.values)
+    assert np.shares_memory(panel.column("BBB", "CPI"), panel.values)
+
+
+def test_missing_location(panel_df):
+    panel = Panel.from_frame(panel_df)
+    assert "DDD" not in panel
+    with pytest.raises(KeyError):
+        panel.loc["DDD"]
+
+
+def test_store_round_trip(panel_df, tmp_path):
+    path = str(tmp_path / "m1-cpi_a.panel")
+    Panel.from_frame(panel_df).save(path)
+    assert panel.is_store(path)
+    stored = Panel.open(path)
+    assert isinstance(stored.values, np.memmap)
+    pd.testing.assert_frame_equal(stored.to_frame(), Panel.from_frame(panel_df).to_frame())
+    pd.testing.assert_frame_equal(stored.loc["BBB"], panel_df.loc["BBB"])
+
+
+def test_select(panel_df):
+    full = Panel.from_frame(panel_df)
+    selected = full.select(["CCC", "AAA"])
+    assert list(selected.locations) == ["CCC", "AAA"]
+    pd.testing.assert_frame_equal(selected.loc["AAA"], panel_df.loc["AAA"])
+    assert np.shares_memory(full.select(["AAA", "BBB"]).values, full.values)
+
+
+def test_where_shares_arrays(panel_df, tmp_path):
+    full = Panel.from_frame(panel_df)
+    mask = np.arange(len(full)) % 3 != 0
+    kept = full.where(mask)
+    expected = full.to_frame()[mask]
+    pd.testing.assert_frame_equal(kept.to_frame(), expected)
+    pd.testing.assert_frame_equal(kept.loc["BBB"], expected.loc["BBB"])
+    assert kept.values is full.values
+
+    path = str(tmp_path / "m1-cpi_a.panel")
+    full.save(path)
+    selected = Panel.open(path).where(mask).select(["CCC", "AAA"])
+    unpickled = pickle.loads(pickle.dumps(selected))
+    assert isinstance(unpickled.values, np.memmap)
+    pd.testing.assert_frame_equal(unpickled.to_frame(), selected.to_frame())
+
+
+def test_select_columns_shares_arrays(panel_df):
+    full = Panel.from_frame(panel_df)
+    full.values[0, 1] = np.nan
+    cpi = full.select_columns(["CPI"])
+    assert cpi.values is full.values
+    pd.testing.assert_frame_equal(cpi.to_frame(), full.to_frame()[["CPI"]])
+    kept = cpi.where(cpi.notna())
+    pd.testing.assert_frame_equal(kept.to_frame(), full.to_frame()[["CPI"]].dropna())
+    pd.testing.assert_frame_equal(kept.loc["BBB"], panel_df.loc["BBB", ["CPI"]])
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.preprocess`."""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import preprocess
+
+PREPROCESS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..", "data", "preprocess")
+
+
+def test_money_cpi_df_within_locations():
+    idx = pd.MultiIndex.from_product([["AAA", "BBB"], pd.date_range("2000", periods=3, freq="AS")],
+                                     names=["LOCATION", "TIME"])
+    m_ser = pd.Series([1.0, 2.0, 4.0, 10.0, 11.0, 12.1], idx, name="M1")
+    cpi_ser = pd.Series([1.0, 1.5, 3.0, 5.0, 5.0, 6.0], idx, name="CPI")
+    m_df = preprocess.money_cpi_df(m_ser, cpi_ser, "m1", "A")
+    # The first year of BBB has no growth rate, rather than one from the last year of AAA
+    assert list(m_df.index) == [idx[1], idx[2], idx[4], idx[5]]
+    np.testing.assert_allclose(m_df["c_m1"], [100, 100, 10, 10])
+    np.testing.assert_allclose(m_df["c_cpi"], [50, 100, 0, 20])
+
+
+@pytest.mark.skipif(not os.path.exists(os.path.join(PREPROCESS_DIR, "m1-cpi_a.csv")),
+                    reason="needs the preprocessed OECD data")
+@pytest.mark.parametrize("name, freq", [("m1-cpi_a", "A"), ("m3-cpi_a", "A"), ("m1-cpi_m", "M"), ("m3-cpi_m", "M")])
+def test_preprocessed_files_match_money_cpi_df(name, freq):
+    df = pd.read_csv(os.path.join(PREPROCESS_DIR, f"{name}.csv"), parse_dates=["TIME"])
+    df = df.set_index(["LOCATION", "TIME"])
+    money, col = df.columns[0], df.columns[2]
+    m_df = preprocess.money_cpi_df(df[money], df["CPI"], money.lower(), freq)
+    # Only the growth rates from a period that is in the file can be computed again from it
+    periods = df.index.get_level_values("TIME").to_period(freq)
+    months = periods.year * 12 + (periods.month if freq == "M" else 0)
+    locs = df.index.get_level_values("LOCATION")
+    step = 1 if freq == "M" else 12
+    follows = np.r_[False, (locs[1:] == locs[:-1]) & (np.diff(months) == step)]
+    pd.testing.assert_frame_equal(m_df.loc[df.index[follows]], df[follows], check_exact=False, rtol=1e-12)
+
+    # No location's first growth rates are from the levels of the location before it
+    first = np.flatnonzero(np.r_[True, locs[1:] != locs[:-1]])[1:]
+    levels = df[[money, "CPI"]].values
+    across = preprocess.annualized(100 * (levels[first] - levels[first - 1]) / levels[first - 1], freq)
+    assert not np.isclose(across, df[[col, "c_cpi"]].values[first]).all(axis=1).any()
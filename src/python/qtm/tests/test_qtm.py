@@ -5,7 +5,7 @@
 import pytest
 
 
-from qtm import qtm
+import qtm
 
 
 @pytest.fixture
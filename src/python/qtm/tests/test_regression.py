@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.regression`."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.formula.api as smf
+
+from qtm import regression, viz
+
+
+@pytest.fixture
+def growth_df():
+    """A (LOCATION, TIME) panel where c_cpi depends linearly on c_m1 plus noise."""
+    rng = np.random.default_rng(2)
+    dfs = []
+    for loc, slope, n in [("AAA", 0.8, 50), ("BBB", 1.2, 20), ("CCC", -0.3, 35)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range("1970", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        x = rng.normal(10, 4, n)
+        dfs.append(pd.DataFrame({"c_m1": x, "c_cpi": 2 + slope * x + rng.normal(0, 2, n)}, idx))
+    df = pd.concat(dfs)
+    df.iloc[3, 0] = np.nan
+    return df
+
+
+def test_grouped_ols_matches_statsmodels(growth_df):
+    fit = regression.grouped_ols(growth_df, "c_m1", "c_cpi")
+    assert list(fit.index) == ["AAA", "BBB", "CCC"]
+    for loc in fit.index:
+        lm = smf.ols("c_cpi ~ c_m1", data=growth_df.loc[loc]).fit()
+        assert fit.loc[loc, "n"] == lm.nobs
+        assert fit.loc[loc, "slope"] == pytest.approx(lm.params["c_m1"])
+        assert fit.loc[loc, "intercept"] == pytest.approx(lm.params["Intercept"])
+        assert fit.loc[loc, "r2"] == pytest.approx(lm.rsquared)
+        assert fit.loc[loc, "se_slope"] == pytest.approx(lm.bse["c_m1"])
+        assert fit.loc[loc, "se_intercept"] == pytest.approx(lm.bse["Intercept"])
+        resid = regression.grouped_residuals(growth_df, fit, "c_m1", "c_cpi").loc[loc].dropna()
+        np.testing.assert_allclose(resid.values, lm.resid.values)
+
+
+def test_lin_reg_matches_statsmodels(growth_df):
+    df = growth_df.loc["AAA"].dropna()
+    lin_reg = viz.LinReg(df, "c_m1", "c_cpi")
+    lin_reg.fit()
+    assert lin_reg.rsquared == pytest.approx(lin_reg.lm.rsquared)
+    assert lin_reg.slope == pytest.approx(lin_reg.lm.params["c_m1"])
+    np.testing.assert_allclose(lin_reg.predictions.values, lin_reg.lm.predict(lin_reg.preds_input).values)
+
+
+def test_rolling_ols_matches_statsmodels(growth_df):
+    fit = regression.rolling_ols(growth_df, "c_m1", "c_cpi", [5, 12])
+    assert fit.index.names == ["window", "LOCATION", "TIME"]
+    for window in [5, 12]:
+        for loc in ["AAA", "BBB"]:
+            loc_df = growth_df.loc[loc]
+            loc_fit = fit.loc[(window, loc)]
+            assert loc_fit["slope"].iloc[:window - 1].isna().all()
+            for end in [window, window + 3, len(loc_df)]:
+                window_df = loc_df.iloc[end - window:end].dropna()
+                row = loc_fit.iloc[end - 1]
+                if len(window_df) < window:
+                    assert np.isnan(row["slope"])
+                    continue
+                lm = smf.ols("c_cpi ~ c_m1", data=window_df).fit()
+                assert row["n"] == lm.nobs
+                assert row["slope"] == pytest.approx(lm.params["c_m1"])
+                assert row["intercept"] == pytest.approx(lm.params["Intercept"])
+                assert row["r2"] == pytest.approx(lm.rsquared)
+                assert row["se_slope"] == pytest.approx(lm.bse["c_m1"])
+
+
+def test_rolling_ols_min_periods(growth_df):
+    fit = regression.rolling_ols(growth_df, "c_m1", "c_cpi", 10, min_periods=3)
+    assert fit.index.names == ["LOCATION", "TIME"]
+    aaa = fit.loc["AAA"]
+    # Row 3 of AAA is missing, so the first windows have one observation fewer
+    assert list(aaa["n"].iloc[:6]) == [1, 2, 3, 3, 4, 5]
+    assert aaa["slope"].iloc[:2].isna().all() and aaa["slope"].iloc[2:].notna().all()
+    with pytest.raises(ValueError):
+        regression.rolling_ols(growth_df, "c_m1", "c_cpi", 0)
+
+
+def test_expanding_ols_ends_at_grouped_ols(growth_df):
+    fit = regression.expanding_ols(growth_df, "c_m1", "c_cpi")
+    full = regression.grouped_ols(growth_df, "c_m1", "c_cpi")
+    last = fit.groupby(level="LOCATION").tail(1).droplevel("TIME")
+    pd.testing.assert_frame_equal(last[full.columns], full, check_exact=False)
+    lm = smf.ols("c_cpi ~ c_m1", data=growth_df.loc["CCC"].iloc[:8]).fit()
+    assert fit.loc["CCC", "slope"].iloc[7] == pytest.approx(lm.params["c_m1"])
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.smooth`."""
+
+import numpy as np
+import pandas as pd
+import pytest
+import statsmodels.api as sm
+
+from qtm import smooth
+
+
+@pytest.mark.parametrize("frac, it", [(0.1, 0), (0.3, 3), (2/3, 1), (1.0, 3)])
+def test_lowess_matches_statsmodels(frac, it):
+    rng = np.random.default_rng(3)
+    x = rng.permutation(np.arange(60, dtype=float))
+    y = np.sin(x / 8) + rng.normal(0, 0.3, 60) + rng.standard_cauchy(60) * 0.1
+    expected = sm.nonparametric.lowess(y, x, frac=frac, it=it, return_sorted=False)
+    np.testing.assert_allclose(smooth.lowess_groups(y, x, frac=frac, it=it), expected, rtol=1e-10, atol=1e-12)
+
+
+def test_lowess_in_chunks(monkeypatch):
+    rng = np.random.default_rng(5)
+    x = np.arange(90, dtype=float)
+    y = np.cos(x / 10) + rng.normal(0, 0.3, 90)
+    groups = np.repeat(["AAA", "BBB", "CCC"], [50, 30, 10])
+    expected = smooth.lowess_groups(y, x, groups, frac=0.4, it=2)
+    # Windows of 20 points, in chunks of 3 rows that cross the group boundaries
+    monkeypatch.setattr(smooth, "WINDOW_BUDGET", 60)
+    np.testing.assert_allclose(smooth.lowess_groups(y, x, groups, frac=0.4, it=2), expected, rtol=1e-12)
+    np.testing.assert_allclose(smooth.lowess_groups(y[:50], x[:50], frac=0.4, it=2),
+                               sm.nonparametric.lowess(y[:50], x[:50], frac=0.4, it=2, return_sorted=False),
+                               rtol=1e-10, atol=1e-12)
+
+
+def test_lowess_panel_fills_memo():
+    rng = np.random.default_rng(4)
+    dfs = []
+    for loc, n in [("AAA", 40), ("BBB", 25)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range("1970", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        dfs.append(pd.DataFrame({"c_cpi": rng.normal(5, 3, n)}, idx))
+    df = pd.concat(dfs)
+    counts = df.groupby(level="LOCATION").size()
+    smooth.cache.clear()
+    fits = smooth.lowess_panel(df, ["c_cpi"], 3 / counts)
+    for loc in counts.index:
+        tdf = df.loc[loc]
+        expected = sm.nonparametric.lowess(tdf["c_cpi"], tdf.index, frac=3 / len(tdf), return_sorted=False)
+        np.testing.assert_allclose(fits.loc[loc, "c_cpi"].values, expected)
+        np.testing.assert_array_equal(smooth.lowess(tdf["c_cpi"], tdf.index, frac=3 / len(tdf)),
+                                      fits.loc[loc, "c_cpi"].values)
+    assert smooth.cache.hits == len(counts)
+    assert smooth.cache.misses == 0
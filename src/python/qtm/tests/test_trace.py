@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.trace`."""
+
+import json
+
+import pandas as pd
+
+from qtm import trace
+
+
+@trace.traced
+def _double(df):
+    return df * 2
+
+
+@trace.traced(name="outer")
+def _outer(df):
+    with trace.stage("inner", rows=3) as stage:
+        stage.add_rows(2)
+    return _double(_double(df))
+
+
+def test_traced_is_transparent_when_off():
+    df = pd.DataFrame({"x": [1.0, 2.0]})
+    assert trace.current() is None
+    pd.testing.assert_frame_equal(_outer(df), df * 4)
+    assert _double.__name__ == "_double"
+
+
+def test_tracing_records_stages(tmp_path):
+    df = pd.DataFrame({"x": range(5)})
+    with trace.tracing() as tracer:
+        _outer(df)
+        _outer(df)
+    assert trace.current() is None
+    report = tracer.report()
+    assert report["calls"] == 1
+    [outer] = report["children"]
+    assert (outer["name"], outer["calls"], outer["rows"]) == ("outer", 2, 10)
+    children = {child["name"]: child for child in outer["children"]}
+    assert children["inner"]["rows"] == 10
+    assert children["test_trace._double"]["calls"] == 4
+    assert outer["time"] >= children["inner"]["time"] + children["test_trace._double"]["time"]
+    assert report["time"] >= outer["time"]
+
+    path = tmp_path / "trace.json"
+    tracer.write_json(path)
+    assert json.loads(path.read_text()) == report
+    summary = tracer.flame_summary()
+    assert "    test_trace._double" in summary
+    assert all(line.startswith("total;outer") for line in tracer.collapsed().splitlines()[1:])
+
+
+def test_traced_records_failed_calls():
+    @trace.traced
+    def fail():
+        raise ValueError("failed")
+
+    with trace.tracing() as tracer:
+        try:
+            fail()
+        except ValueError:
+            pass
+        with trace.stage("after"):
+            pass
+    failed, after = tracer.report()["children"]
+    assert failed["name"].endswith("fail") and failed["calls"] == 1
+    # The failed stage was closed, so the next one is not nested in it
+    assert after["name"] == "after"
+
+
+def test_merge_adds_report_as_child():
+    with trace.tracing("worker") as worker:
+        _double(pd.DataFrame({"x": [1.0]}))
+    with trace.tracing() as tracer:
+        with trace.stage("render"):
+            tracer.merge(worker.report())
+            tracer.merge(worker.report())
+    [render] = tracer.report()["children"]
+    [merged] = render["children"]
+    assert merged["name"] == "worker"
+    assert merged["calls"] == 2
+    assert merged["children"][0]["calls"] == 2
+
+
+def test_data_methods_are_traced():
+    from qtm import oecd
+    for name in ["plot_summary", "annual_ts_fig", "quantile_ts_df", "lead_lag_df", "episodes_df", "quantile_ts_fig"]:
+        assert hasattr(getattr(oecd.Data, name), "__wrapped__"), name
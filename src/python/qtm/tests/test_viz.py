@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.viz`."""
+
+import numpy as np
+import pandas as pd
+
+from qtm import viz
+
+
+def test_minmax_indices_keeps_extremes_and_gaps():
+    rng = np.random.default_rng(0)
+    x = pd.date_range("1960", periods=5000, freq="D")
+    y = rng.normal(size=len(x))
+    y[100] = np.nan
+    idx = viz.minmax_indices(x, y, 50)
+    assert len(idx) <= 4 * 50 + 1
+    assert np.all(np.diff(idx) > 0)
+    assert 100 in idx
+    assert np.nanargmax(y) in idx and np.nanargmin(y) in idx
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+
+
+def test_minmax_indices_short_series_unchanged():
+    np.testing.assert_array_equal(viz.minmax_indices(np.arange(10), np.arange(10), 5), np.arange(10))
+
+
+def test_overlap_groups_counts():
+    x = np.array([0.0, 0.01, 1.0, 1.0, np.nan, 0.0])
+    y = np.array([0.0, 0.0, 1.0, 1.0, 1.0, 0.02])
+    idx, counts = viz.overlap_groups(x, y, 10, 10)
+    np.testing.assert_array_equal(idx, [0, 2])
+    np.testing.assert_array_equal(counts, [3, 2])
+
+
+def test_stacked_alpha():
+    np.testing.assert_allclose(viz.stacked_alpha(0.5, [1, 2]), [0.5, 0.75])
+    np.testing.assert_allclose(viz.stacked_alpha(None, [3]), [1.0])
+
+
+def test_decimated_layers_follow_output_dpi():
+    import io
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    rng = np.random.default_rng(1)
+    x = pd.date_range("1960", periods=5000, freq="D")
+    y = rng.normal(size=len(x))
+    fig, ax = plt.subplots(figsize=(4, 3), dpi=50)
+    line, = viz.decimated_plot(ax, x, y, color="C1", label="line")
+    scatter = viz.decimated_scatter(ax, x, y, alpha=0.1, s=15, color="C0")
+    fig.tight_layout()
+    fig.savefig(io.BytesIO(), dpi=50)
+    low = len(line.get_xdata())
+    fig.savefig(io.BytesIO(), dpi=200)
+    assert low < len(line.get_xdata()) < len(x)
+    assert np.nanargmax(y) in np.flatnonzero(np.isin(x, line.get_xdata()))
+    assert len(scatter.get_offsets()) < len(x)
+    assert not scatter.get_rasterized()
+    np.testing.assert_allclose(scatter.get_facecolor()[:, 3].min(), 0.1)
+    plt.close(fig)
+
+
+def test_sparse_layers_are_drawn_as_they_are():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    x = pd.date_range("1960", periods=60, freq="AS")
+    y = np.zeros(len(x))
+    fig, ax = plt.subplots()
+    line, = viz.decimated_plot(ax, x, y)
+    scatter = viz.decimated_scatter(ax, x, y, alpha=0.7, s=30, color="C0")
+    assert type(line).__name__ == "Line2D" and len(line.get_xdata()) == len(x)
+    assert type(scatter).__name__ == "PathCollection" and len(scatter.get_offsets()) == len(x)
+    plt.close(fig)
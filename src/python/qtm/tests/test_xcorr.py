@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""Tests for `qtm.xcorr`."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from qtm import xcorr
+
+
+@pytest.fixture
+def lagged_df():
+    """A (LOCATION, TIME) panel where c_cpi follows c_m1 with a location-specific lag."""
+    rng = np.random.default_rng(4)
+    dfs = []
+    for loc, lag, n in [("AAA", 2, 60), ("BBB", 5, 45), ("CCC", 0, 30)]:
+        idx = pd.MultiIndex.from_product([[loc], pd.date_range("1960", periods=n, freq="AS")],
+                                         names=["LOCATION", "TIME"])
+        # c_cpi[t] follows c_m1[t - lag]
+        m = rng.normal(5, 3, n + lag)
+        cpi = 1 + 0.8 * m[:n] + rng.normal(0, 1, n)
+        dfs.append(pd.DataFrame({"c_m1": m[lag:], "c_cpi": cpi}, idx))
+    df = pd.concat(dfs)
+    df.iloc[[4, 50], 0] = np.nan
+    df.iloc[70, 1] = np.nan
+    return df
+
+
+def test_lead_lag_corr_matches_shifted_corr(lagged_df):
+    corr = xcorr.lead_lag_corr(lagged_df, "c_m1", "c_cpi", 8, min_periods=5)
+    assert list(corr.columns) == list(range(-8, 9))
+    for loc in corr.index:
+        loc_df = lagged_df.loc[loc]
+        for lag in corr.columns:
+            expected = loc_df["c_m1"].corr(loc_df["c_cpi"].shift(-lag), min_periods=5)
+            assert corr.loc[loc, lag] == pytest.approx(expected, abs=1e-10, nan_ok=True)
+
+
+def test_best_lag_finds_the_lag(lagged_df):
+    corr = xcorr.lead_lag_corr(lagged_df, "c_m1", "c_cpi", 10)
+    best = xcorr.best_lag(corr.loc[:, 0:])
+    assert best["lag"].to_dict() == {"AAA": 2, "BBB": 5, "CCC": 0}
+    assert (best["corr"] > 0.8).all()
+    assert (xcorr.best_lag(-corr, absolute=True)["lag"] == xcorr.best_lag(corr)["lag"]).all()
+
+
+def test_lead_lag_corr_short_series(lagged_df):
+    corr = xcorr.lead_lag_corr(lagged_df, "c_cpi", "c_m1", 100, min_periods=40)
+    assert corr.columns.max() == 59
+    assert corr.loc["CCC"].isna().all()
+    assert "CCC" not in xcorr.best_lag(corr).index